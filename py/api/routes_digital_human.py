@@ -5,7 +5,6 @@
 """
 from __future__ import annotations
 
-import asyncio
 import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -18,10 +17,27 @@ from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel, Field
 
 from py.function.config_loader import load_config
-from py.services.digital_human_service import DigitalHumanService, WAVESPEED_BALANCE_URL
+from py.function.rate_limit import rate_limiter_stats
+from py.function.task_runner import TaskRunner
+from py.services.circuit_breaker import (
+    PROBE_RECHECK_SECONDS,
+    CircuitOpenError,
+    circuit_breaker_stats,
+    open_circuit_delay,
+)
+from py.services.digital_human_service import STAGE_PROVIDERS, DigitalHumanService, WAVESPEED_BALANCE_URL
+from py.services.finalization_queue import finalization_queue
 from py.services.storage_service import StorageService
 from py.services.history_service import HistoryService
-from py.services.task_manager import TaskManager
+from py.services.http_pool import http_pool
+from py.services.io_executor import AsyncCharacters, AsyncHistory, AsyncStorage, io_executor
+from py.services.job_memo import JobMemo
+from py.services.job_scheduler import JobScheduler
+from py.services.prediction_poller import poll_multiplexer, poll_stats
+from py.services.service_cache import ServiceCache
+from py.services.task_log_sink import task_log_sink
+from py.services.webhook_hub import webhook_hub
+from py.services.task_manager import create_task_manager
 from py.exceptions import ExternalAPIError
 from py.services.character_repository import CharacterRepository
 
@@ -31,13 +47,16 @@ router = APIRouter(prefix="/api", tags=["digital-human"])
 # -----------------------------------------------------------------------------
 # 依赖实例（共享 TaskManager + StorageService，确保 task.json/状态一致）
 # -----------------------------------------------------------------------------
-task_manager = TaskManager()
 try:
     _LOADED_CONFIG = load_config()
 except Exception as exc:  # noqa: BLE001
     print(f"[WARN] 加载 config.yaml 失败，改用环境变量: {exc}")
     _LOADED_CONFIG = None
 
+task_manager = create_task_manager(
+    (_LOADED_CONFIG.workflow if _LOADED_CONFIG else {}).get("task_store")
+)
+
 storage_cfg = _LOADED_CONFIG.storage if _LOADED_CONFIG else {}
 
 storage_service = StorageService(
@@ -52,6 +71,8 @@ storage_service = StorageService(
     final_video_name=storage_cfg.get("final_video_name", os.getenv("DIGITAL_HUMAN_FINAL_VIDEO_NAME", "digital_human.mp4")),
     task_dir_pattern=storage_cfg.get("task_dir_pattern", os.getenv("DIGITAL_HUMAN_TASK_DIR_PATTERN", "ren_%m%d%H%M")),
     video_mirror_targets=storage_cfg.get("video_mirrors"),
+    link_methods=storage_cfg.get("link_methods"),
+    log_sink=task_log_sink,
 )
 history_service = HistoryService(storage_service)
 UPLOAD_DIR = storage_service.output_root / "uploads"
@@ -62,9 +83,21 @@ UPLOAD_PUBLIC_BASE = os.getenv(
 character_repository = CharacterRepository()
 MAX_CHARACTER_IMAGE_SIZE = 10 * 1024 * 1024
 
+def _build_digital_human_service(wavespeed_key: str) -> DigitalHumanService:
+    """按 API Key 创建数字人服务实例。"""
+    return DigitalHumanService(
+        wavespeed_key=wavespeed_key,
+        minimax_key=wavespeed_key,  # MiniMax TTS 也通过 Wavespeed 调用，使用同一个 Key
+        storage_service=storage_service,
+        task_manager=task_manager,
+        loaded_config=_LOADED_CONFIG,
+        http_pool=http_pool,
+    )
+
+
 def get_digital_human_service(wavespeed_key: str) -> DigitalHumanService:
     """
-    创建数字人服务实例（每次请求动态创建）
+    获取数字人服务实例（同一 API Key 复用缓存实例）
 
     Args:
         wavespeed_key: 用户提供的 Wavespeed API Key
@@ -72,15 +105,150 @@ def get_digital_human_service(wavespeed_key: str) -> DigitalHumanService:
     Returns:
         DigitalHumanService 实例
     """
-    return DigitalHumanService(
-        wavespeed_key=wavespeed_key,
-        minimax_key=wavespeed_key,  # MiniMax TTS 也通过 Wavespeed 调用，使用同一个 Key
-        storage_service=storage_service,
-        task_manager=task_manager,
-        loaded_config=_LOADED_CONFIG,
+    return service_cache.get(wavespeed_key)
+
+
+async def _run_digital_human_job(job_id: str, payload: Dict[str, Any]) -> None:
+    """调度器 worker 执行单个数字人任务。"""
+    params = dict(payload)
+    api_key = params.pop("wavespeed_api_key")
+    fingerprint = params.pop("fingerprint", None)
+    try:
+        # 使用用户提供的 API Key 创建服务实例
+        service = get_digital_human_service(wavespeed_key=api_key)
+        await service.generate_digital_human(job_id=job_id, **params)
+    except CircuitOpenError as exc:
+        # 供应商熔断不是任务本身的失败：重新排队，至少等到冷却结束（半开探测在途时
+        # 等一个复查间隔）再从断点继续；不依赖 hold_queue，避免快速失败—立即重排的空转
+        task_manager.update_status(job_id, "queued", f"{exc.message}，任务已重新排队")
+        job_scheduler.submit(
+            job_id,
+            {**payload, "resume": True},
+            delay=max(exc.retry_after, PROBE_RECHECK_SECONDS),
+        )
+        return
+    except Exception as exc:  # noqa: BLE001
+        task_manager.update_status(job_id, "failed", f"生成失败: {exc}")
+        return
+    if fingerprint and (await AsyncStorage(storage_service).load_metadata(job_id)).get("status") == "finished":
+        job_memo.record(fingerprint, job_id)
+
+
+def _resume_interrupted_job(job_id: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    服务重启时，上次运行中的任务排到队首，从 task.json 断点继续。
+
+    task.json 已 finished（崩溃发生在最终落盘之后、队列落盘之前）时任务视为完成，
+    不再入队，避免重跑与重复计费。
+    """
+    meta = storage_service.load_metadata(job_id)
+    if meta.get("status") == "finished":
+        task_manager.update_status(job_id, "finished", "✅ 数字人视频生成完成")
+        video_path = (meta.get("assets") or {}).get("video_path")
+        if video_path:
+            task_manager.set_result_path(job_id, video_path)
+        return None
+    task_manager.update_status(job_id, "queued", "服务已重启，任务将从断点继续")
+    return {**payload, "resume": True}
+
+
+def _job_providers(payload: Dict[str, Any]) -> set[str]:
+    """
+    排队任务会调用的供应商：语音与唇同步总是需要，prompt 模式另需 Seedream 生成头像
+
+    按请求参数判断，不读取断点：断点续跑的任务即使某阶段已完成也按全部阶段计算。
+    """
+    providers = {STAGE_PROVIDERS["speech"], STAGE_PROVIDERS["video"]}
+    if payload.get("avatar_mode") == "prompt":
+        providers.add(STAGE_PROVIDERS["avatar"])
+    return providers
+
+
+def _job_hold_delay(payload: Dict[str, Any]) -> float:
+    """调度器暂缓单个任务的秒数：仅看该任务会调用的供应商是否熔断"""
+    return open_circuit_delay(_job_providers(payload))
+
+
+runner_cfg = (_LOADED_CONFIG.workflow if _LOADED_CONFIG else {}).get("task_runner") or {}
+_circuit_cfg = (_LOADED_CONFIG.runtime if _LOADED_CONFIG else {}).get("circuit_breaker") or {}
+service_cache_cfg = runner_cfg.get("service_cache") or {}
+service_cache: ServiceCache[DigitalHumanService] = ServiceCache(
+    _build_digital_human_service,
+    max_entries=int(service_cache_cfg.get("max_entries", 32)),
+    idle_seconds=float(service_cache_cfg.get("idle_seconds", 1800)) or None,
+)
+job_scheduler = JobScheduler(
+    handler=_run_digital_human_job,
+    max_parallel=int(runner_cfg.get("max_parallel_tasks") or 2),
+    queue_path=runner_cfg.get("queue_file") or os.getenv("DIGITAL_HUMAN_QUEUE_FILE", "temp/job_queue.json"),
+    on_interrupted=_resume_interrupted_job,
+    # 任务要调用的供应商熔断时暂缓该任务出队，其他任务照常执行
+    hold=_job_hold_delay if _circuit_cfg.get("hold_queue", True) else None,
+)
+reuse_enabled = bool(runner_cfg.get("reuse_finished_jobs", True))
+job_memo = JobMemo(
+    index_path=runner_cfg.get("memo_file") or os.getenv("DIGITAL_HUMAN_MEMO_FILE", "temp/job_fingerprints.json"),
+)
+
+
+def _has_pending_finalization(meta: Dict[str, Any]) -> bool:
+    return (
+        (meta.get("assets") or {}).get("publish_state") == "pending"
+        or (meta.get("billing") or {}).get("reconcile_state") == "pending"
     )
 
 
+def _mark_billing_interrupted(meta: Dict[str, Any]) -> Dict[str, Any]:
+    meta.setdefault("billing", {})["reconcile_state"] = "interrupted"
+    return meta
+
+
+async def _recover_pending_finalization() -> None:
+    """
+    启动时扫描 task.json，接续上次进程未完成的收尾步骤。
+
+    发布只依赖本地文件，重新提交到收尾队列；余额对账需要用户的 API Key（不落盘），
+    且重启后余额已无法对应到单个任务，标记为 interrupted 保留 balance_before。
+    """
+    storage_io = AsyncStorage(storage_service)
+    records = await storage_io.scan_metadata(_has_pending_finalization)
+    if not records:
+        return
+    # 仅用于发布收尾，不调用任何供应商客户端
+    publisher = TaskRunner(None, None, None, storage_service, task_manager, finalizer=finalization_queue)
+    for job_id, record in records:
+        if (record.get("billing") or {}).get("reconcile_state") == "pending":
+            record = await storage_io.update_metadata(job_id, _mark_billing_interrupted)
+            await storage_io.append_log(job_id, "⚠️ 服务重启，余额对账未完成", level="WARNING")
+        publisher.requeue_publish(job_id, record)
+
+
+async def start_background_services() -> None:
+    """应用启动时调用：创建共享 HTTP 连接池与集中轮询服务，配置收尾队列、文件 I/O 线程池与日志写入器，接续未完成的收尾步骤，启动调度器并恢复持久化队列。"""
+    runtime_cfg = _LOADED_CONFIG.runtime if _LOADED_CONFIG else {}
+    await http_pool.start(runtime_cfg.get("http_pool"))
+    io_executor.configure(runtime_cfg.get("io_executor"))
+    task_log_sink.configure(runtime_cfg.get("task_log"))
+    task_log_sink.start()
+    poll_multiplexer.start((runtime_cfg.get("polling") or {}).get("multiplexer"), http_pool=http_pool)
+    webhook_cfg = dict(((_LOADED_CONFIG.merged if _LOADED_CONFIG else {}).get("wavespeed") or {}).get("webhook") or {})
+    webhook_cfg["secret"] = webhook_cfg.get("secret") or os.getenv("WAVESPEED_WEBHOOK_SECRET")
+    webhook_hub.configure(webhook_cfg)
+    finalization_queue.configure(runner_cfg.get("finalization"))
+    await _recover_pending_finalization()
+    job_scheduler.start()
+
+
+async def stop_background_services() -> None:
+    """应用关闭时调用。"""
+    await job_scheduler.stop()
+    await finalization_queue.stop()
+    await task_log_sink.stop()
+    await poll_multiplexer.stop()
+    await http_pool.close()
+    io_executor.shutdown()
+
+
 def _resolve_upload_file_path(upload_url: Optional[str]) -> Optional[str]:
     """根据上传 URL 推导本地路径，若无法映射则返回原始值。"""
     if not upload_url:
@@ -122,6 +290,7 @@ class CreateTaskRequest(BaseModel):
     mask_image: Optional[str] = Field(None, description="蒙版图片URL")
     character_id: Optional[str] = Field(None, description="可选角色ID")
     wavespeed_api_key: str = Field(..., min_length=10, description="Wavespeed API Key（必填）")
+    reuse_cached: bool = Field(True, description="请求与已完成任务完全一致时直接复用其结果")
 
 
 class TaskResponse(BaseModel):
@@ -141,6 +310,7 @@ class TaskResponse(BaseModel):
     logs: Optional[list[str]] = None
     links: Dict[str, str] = Field(default_factory=dict)
     character: Optional[Dict[str, Any]] = None
+    queue_position: Optional[int] = None
 
 
 class HistoryVideoItem(BaseModel):
@@ -178,6 +348,10 @@ class CharacterResponse(BaseModel):
     created_by: Optional[str] = None
 
 
+class ResumeTaskRequest(BaseModel):
+    wavespeed_api_key: str = Field(..., min_length=10, description="Wavespeed API Key（必填）")
+
+
 class WavespeedBalanceRequest(BaseModel):
     wavespeed_api_key: str = Field(..., min_length=10, description="Wavespeed 控制台生成的 API Key")
 
@@ -198,7 +372,7 @@ async def get_wavespeed_balance(payload: WavespeedBalanceRequest) -> WavespeedBa
         raise HTTPException(status_code=400, detail="缺少 Wavespeed API Key")
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_pool.client(timeout=10.0) as client:
             response = await client.get(
                 WAVESPEED_BALANCE_URL,
                 headers={"Authorization": f"Bearer {api_key}"},
@@ -241,7 +415,7 @@ async def create_task(req: CreateTaskRequest):
     character_payload: Optional[Dict[str, Any]] = None
     if req.character_id:
         try:
-            character_internal = character_repository.get_internal(req.character_id)
+            character_internal = await AsyncCharacters(character_repository).get_internal(req.character_id)
             character_payload = {
                 key: character_internal.get(key)
                 for key in ["id", "name", "appearance", "voice", "image_url", "image_path", "tags", "source"]
@@ -292,35 +466,72 @@ async def create_task(req: CreateTaskRequest):
         if char_voice_id:
             req.voice_id = char_voice_id
 
-    async def _runner():
-        try:
-            # 使用用户提供的 API Key 创建服务实例
-            service = get_digital_human_service(wavespeed_key=api_key)
-            await service.generate_digital_human(
+    params = {
+        "avatar_mode": resolved_mode,
+        "avatar_prompt": avatar_prompt,
+        "avatar_upload_path": avatar_local_path,
+        "speech_text": req.speech_text,
+        "voice_id": req.voice_id,
+        "resolution": req.resolution,
+        "speed": req.speed,
+        "pitch": req.pitch,
+        "emotion": req.emotion,
+        "seed": req.seed,
+        "mask_image": req.mask_image,
+        "character": character_payload,
+    }
+    # 上传头像按内容哈希，读取文件放到 I/O 线程池；按 API Key 隔离复用范围
+    fingerprint = await io_executor.run(
+        "job_memo.fingerprint", job_memo.fingerprint, params, tenant=api_key,
+    )
+    if req.reuse_cached and reuse_enabled:
+        source_job_id = job_memo.lookup(fingerprint)
+        record = (
+            await io_executor.run(
+                "job_memo.materialize_alias",
+                job_memo.materialize_alias, storage_service, fingerprint, source_job_id, job_id,
+            )
+            if source_job_id else None
+        )
+        if record:
+            message = f"✅ 已复用任务 {source_job_id} 的结果"
+            task_manager.update_status(job_id, "finished", message)
+            video_path = (record.get("assets") or {}).get("video_path")
+            if video_path:
+                task_manager.set_result_path(job_id, video_path)
+            return TaskResponse(
                 job_id=job_id,
-                avatar_mode=resolved_mode,
-                avatar_prompt=avatar_prompt,
-                avatar_upload_path=avatar_local_path,
-                speech_text=req.speech_text,
-                voice_id=req.voice_id,
-                resolution=req.resolution,
-                speed=req.speed,
-                pitch=req.pitch,
-                emotion=req.emotion,
-                seed=req.seed,
-                mask_image=req.mask_image,
-                character=character_payload,
+                status="finished",
+                message=message,
+                avatar_url=record.get("avatar_url"),
+                audio_url=record.get("audio_url"),
+                video_url=record.get("video_url"),
+                cost=0.0,
+                duration=record.get("duration"),
+                stages=record.get("stages"),
+                assets=record.get("assets"),
+                trace_id=record.get("trace_id"),
+                config_hash=record.get("config_hash"),
+                links={"self": f"/api/tasks/{job_id}"},
+                character=record.get("character"),
             )
-        except Exception as exc:  # noqa: BLE001
-            task_manager.update_status(job_id, "failed", f"生成失败: {exc}")
 
-    asyncio.create_task(_runner())
+    queue_position = job_scheduler.submit(job_id, {
+        "wavespeed_api_key": api_key,
+        "fingerprint": fingerprint,
+        **params,
+    })
+    if queue_position:
+        message = f"任务已加入队列，当前排队位置: {queue_position}"
+    else:
+        message = "任务已创建，开始生成数字人视频..."
 
     return TaskResponse(
         job_id=job_id,
         status="pending",
-        message="任务已创建，开始生成数字人视频...",
+        message=message,
         links={"self": f"/api/tasks/{job_id}"},
+        queue_position=queue_position or None,
     )
 
 
@@ -331,7 +542,7 @@ async def get_task_status(job_id: str):
     if not summary:
         raise HTTPException(status_code=404, detail="任务不存在")
 
-    meta = storage_service.load_metadata(job_id)
+    meta = await AsyncStorage(storage_service).load_metadata(job_id)
     status = meta.get("status") if meta else summary.get("status")
     assets = dict((meta or {}).get("assets") or {})
     if job_id:
@@ -359,13 +570,92 @@ async def get_task_status(job_id: str):
         logs=(meta or {}).get("logs"),
         character=character_payload,
         links={"self": f"/api/tasks/{job_id}"},
+        queue_position=job_scheduler.queue_position(job_id) or None,
+    )
+
+
+@router.post("/tasks/{job_id}/resume", response_model=TaskResponse)
+async def resume_task(job_id: str, req: ResumeTaskRequest):
+    """从 task.json 中最后完成的阶段继续执行中断/失败的任务。"""
+    api_key = req.wavespeed_api_key.strip()
+    if not api_key or len(api_key) < 10:
+        raise HTTPException(
+            status_code=400,
+            detail="请提供有效的 Wavespeed API Key（至少10个字符）"
+        )
+    if not task_manager.get_task(job_id):
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job_scheduler.is_running(job_id) or job_scheduler.queue_position(job_id) is not None:
+        raise HTTPException(status_code=409, detail="任务正在执行或排队中")
+
+    meta = await AsyncStorage(storage_service).load_metadata(job_id)
+    if not meta or not meta.get("params"):
+        raise HTTPException(status_code=409, detail="任务没有可恢复的断点，请重新创建")
+    if meta.get("status") == "finished":
+        raise HTTPException(status_code=409, detail="任务已完成，无需恢复")
+
+    fingerprint = await io_executor.run(
+        "job_memo.fingerprint", job_memo.fingerprint, meta["params"], tenant=api_key,
+    )
+    task_manager.update_status(job_id, "queued", "任务已加入队列，等待从断点继续")
+    queue_position = job_scheduler.submit(job_id, {
+        **meta["params"],
+        "wavespeed_api_key": api_key,
+        "fingerprint": fingerprint,
+        "resume": True,
+    })
+    stages = meta.get("stages") or {}
+    return TaskResponse(
+        job_id=job_id,
+        status="pending",
+        message="任务将从断点继续执行",
+        stages=stages,
+        trace_id=meta.get("trace_id"),
+        links={"self": f"/api/tasks/{job_id}"},
+        queue_position=queue_position or None,
     )
 
 
+@router.post("/webhooks/wavespeed")
+async def wavespeed_webhook(request: Request, token: str = ""):
+    """WaveSpeed 预测完成回调：校验 token 与签名后唤醒等待中的阶段。"""
+    body = await request.body()
+    if not webhook_hub.verify_signature(request.headers, body):
+        raise HTTPException(status_code=401, detail="Webhook 签名校验失败")
+    try:
+        payload = await request.json()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Webhook 数据格式错误") from exc
+    data = payload.get("data") if isinstance(payload, dict) and isinstance(payload.get("data"), dict) else payload
+    prediction_id = data.get("id") if isinstance(data, dict) else None
+    if not token or not prediction_id:
+        raise HTTPException(status_code=400, detail="缺少 token 或预测 ID")
+    if not webhook_hub.deliver(str(prediction_id), token, data):
+        raise HTTPException(status_code=403, detail="Webhook token 不匹配")
+    return {"accepted": True}
+
+
+@router.get("/system/stats")
+async def get_system_stats() -> Dict[str, Any]:
+    """运行时统计：HTTP 连接池、任务调度器、服务实例缓存、结果轮询、收尾队列、文件 I/O 与任务日志。"""
+    return {
+        "http_pool": http_pool.stats(),
+        "scheduler": job_scheduler.stats(),
+        "services": service_cache.stats(),
+        "polling": {**poll_stats.snapshot(), "multiplexer": poll_multiplexer.stats()},
+        "webhooks": webhook_hub.stats(),
+        "rate_limits": rate_limiter_stats(),
+        "circuits": circuit_breaker_stats(),
+        "finalization": finalization_queue.stats(),
+        "io": io_executor.stats(),
+        "task_logs": task_log_sink.stats(),
+    }
+
+
 @router.get("/history/videos", response_model=HistoryVideoResponse)
 async def list_history_videos(limit: int = 50):
     """返回公开目录中可访问的历史视频列表。"""
-    records = history_service.list_recent_videos(limit=limit)
+    records = await AsyncHistory(history_service).list_recent_videos(limit=limit)
     items = [HistoryVideoItem(**record) for record in records]
     return HistoryVideoResponse(count=len(items), items=items)
 
@@ -387,7 +677,7 @@ async def upload_avatar(file: UploadFile):
 
     unique_name = f"{uuid4().hex}{suffix}"
     dest_path = UPLOAD_DIR / unique_name
-    dest_path.write_bytes(contents)
+    await io_executor.run("uploads.write", dest_path.write_bytes, contents)
 
     public_url = f"{UPLOAD_PUBLIC_BASE}/{unique_name}"
     return {"url": public_url, "path": str(dest_path)}
@@ -402,7 +692,7 @@ async def list_characters(
 ):
     """返回预制+用户角色列表。"""
     repo_status = None if status == "all" else status
-    return character_repository.list_characters(
+    return await AsyncCharacters(character_repository).list_characters(
         status=repo_status,
         source=source,
         limit=limit,
@@ -415,7 +705,7 @@ async def list_characters(
 async def get_character_asset(asset_path: str):
     """返回角色图库中的原始图片文件。"""
     try:
-        resolved_path = Path(character_repository.resolve_asset_path(asset_path))
+        resolved_path = Path(await AsyncCharacters(character_repository).resolve_asset_path(asset_path))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
@@ -448,7 +738,7 @@ async def create_character(
         raise HTTPException(status_code=400, detail="角色图片需小于10MB")
     voice_payload = {"zh": voice_zh, "prompt": voice_prompt, "voice_id": voice_id}
     try:
-        record = character_repository.create_character(
+        record = await AsyncCharacters(character_repository).create_character(
             name=name,
             appearance={"zh": appearance_zh, "en": appearance_en},
             voice=voice_payload,
@@ -493,7 +783,7 @@ async def update_character(
         voice_payload = {"zh": voice_zh, "prompt": voice_prompt, "voice_id": voice_id}
 
     try:
-        record = character_repository.update_character(
+        record = await AsyncCharacters(character_repository).update_character(
             character_id,
             name=name,
             appearance=appearance_payload,
@@ -514,7 +804,7 @@ async def update_character(
 async def delete_character(character_id: str):
     """禁用指定角色。"""
     try:
-        record = character_repository.disable_character(character_id)
+        record = await AsyncCharacters(character_repository).disable_character(character_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail="角色不存在") from exc
     return {"status": "ok", "character": record}
@@ -547,4 +837,9 @@ def register_exception_handlers(app: FastAPI) -> None:
     app.add_exception_handler(ExternalAPIError, handle_external_api_error)
 
 
-__all__ = ["router", "register_exception_handlers"]
+__all__ = [
+    "router",
+    "register_exception_handlers",
+    "start_background_services",
+    "stop_background_services",
+]
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -12,12 +13,27 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from py.api.routes_digital_human import (
     register_exception_handlers,
     router as digital_human_router,
+    start_background_services,
+    stop_background_services,
 )
+from py.services.circuit_breaker import circuit_breaker_stats
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """启动任务调度器（恢复持久化队列），关闭时停止 worker。"""
+    await start_background_services()
+    try:
+        yield
+    finally:
+        await stop_background_services()
+
 
 app = FastAPI(
     title="Digital Human API",
     description="WaveSpeed 数字人生成服务",
     version="1.0.0",
+    lifespan=lifespan,
 )
 app.include_router(digital_human_router)
 register_exception_handlers(app)
@@ -49,8 +65,10 @@ app.add_middleware(LegacyCORSHeaderMiddleware)
 
 @app.get("/api/health")
 async def health_check():
-    """最小化健康检查接口，方便 Nginx/监控探活。"""
-    return JSONResponse({"status": "ok"})
+    """最小化健康检查接口，方便 Nginx/监控探活；附带各供应商熔断状态（熔断时仍返回 200）。"""
+    circuits = circuit_breaker_stats()
+    degraded = any(item["state"] != "closed" for item in circuits.values())
+    return JSONResponse({"status": "degraded" if degraded else "ok", "circuits": circuits})
 
 
 RESOURCE_PIC_DIR = Path(
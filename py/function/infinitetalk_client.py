@@ -6,18 +6,35 @@ from __future__ import annotations
 
 import asyncio
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
 import httpx
 
 from py.exceptions import ExternalAPIError
+from py.function.rate_limit import get_rate_limiter
+from py.services.downloader import stream_download
+from py.services.http_pool import HttpClientPool, http_pool as default_http_pool
+from py.services.prediction_poller import PredictionPoller
+from py.services.webhook_hub import WebhookHub, webhook_hub as default_webhook_hub
 
 
 class InfiniteTalkClient:
     """Wavespeed Infinitetalk API 的极简封装。"""
 
-    def __init__(self, api_key: str, base_url: str = "https://api.wavespeed.ai/api/v3"):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.wavespeed.ai/api/v3",
+        http_pool: Optional[HttpClientPool] = None,
+        polling_cfg: Optional[Dict[str, Any]] = None,
+        webhooks: Optional[WebhookHub] = None,
+        rate_limits: Optional[Dict[str, Any]] = None,
+    ):
         self.api_key = api_key
+        self.limiter = get_rate_limiter("infinitetalk", api_key, rate_limits)
+        self.http = http_pool or default_http_pool
+        self.poller = PredictionPoller(self.http, polling_cfg)
+        self.webhooks = webhooks or default_webhook_hub
         self.base_url = base_url
         self.endpoint = "wavespeed-ai/infinitetalk"
         self.headers = {
@@ -25,12 +42,24 @@ class InfiniteTalkClient:
             "Content-Type": "application/json",
         }
 
-    async def submit(self, endpoint: str, payload: Dict[str, Any]) -> str:
-        """提交任务到 Wavespeed API。"""
+    async def submit(
+        self,
+        endpoint: str,
+        payload: Dict[str, Any],
+        webhook_token: Optional[str] = None,
+    ) -> str:
+        """提交任务到 Wavespeed API；webhook_token 非空时附带回调地址。"""
         url = f"{self.base_url}/{endpoint}"
+        if self.limiter:
+            await self.limiter.acquire()
         try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.post(url, headers=self.headers, json=payload)
+            async with self.http.client(timeout=60) as client:
+                response = await client.post(
+                    url,
+                    headers=self.headers,
+                    json=payload,
+                    params=self.webhooks.submit_params(webhook_token),
+                )
                 if not response.is_success:
                     raise ExternalAPIError.from_response(
                         provider="infinitetalk",
@@ -75,70 +104,55 @@ class InfiniteTalkClient:
     async def wait_for_result(
         self,
         task_id: str,
-        max_wait: int = 600,
-        poll_interval: int = 5,
+        max_wait: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        webhook: Optional[asyncio.Future] = None,
     ) -> Dict[str, Any]:
-        """轮询任务状态，直至完成或失败。"""
-        status_url = f"{self.base_url}/predictions/{task_id}/result"
-        start = asyncio.get_event_loop().time()
-        try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                while asyncio.get_event_loop().time() - start < max_wait:
-                    try:
-                        response = await client.get(status_url, headers=self.headers)
-                        if not response.is_success:
-                            raise ExternalAPIError.from_response(
-                                provider="infinitetalk",
-                                response=response,
-                                message="查询 Infinitetalk 任务状态失败",
-                            )
-                        data = self._unwrap_response(response.json())
-                    except httpx.RequestError:
-                        await asyncio.sleep(poll_interval)
-                        continue
-
-                    state = data.get("state") or data.get("status")
-                    if state == "completed":
-                        output = data.get("output") or {}
-                        outputs = data.get("outputs") or []
-                        if not output and outputs:
-                            output = {
-                                "video_url": outputs[0],
-                                "duration": data.get("duration")
-                                or data.get("executionTime", 0) / 1000.0,
-                            }
-                        if not output:
-                            raise ExternalAPIError(
-                                provider="infinitetalk",
-                                message="任务完成但无输出",
-                                status_code=200,
-                                response_data=data,
-                            )
-                        return output
-                    if state == "failed":
-                        error = data.get("error", "未知错误")
-                        raise ExternalAPIError(
-                            provider="infinitetalk",
-                            message=f"Infinitetalk 任务失败: {error}",
-                            status_code=200,
-                            response_data=data,
-                        )
-                    await asyncio.sleep(poll_interval)
-        except ExternalAPIError:
-            raise
-        except Exception as exc:  # noqa: BLE001
+        """
+        轮询任务状态，直至完成或失败。
+
+        Args:
+            task_id: 任务ID
+            max_wait: 最长等待秒数，默认取 runtime.polling.max_wait_seconds.video
+            poll_interval: 固定轮询间隔，默认按配置指数退避
+            webhook: 回调 future，到达即返回，轮询仅作兜底
+        """
+        policy = self.poller.policy("video")
+        if max_wait is not None:
+            policy.timeout = float(max_wait)
+        if poll_interval is not None:
+            policy.initial_interval = policy.max_interval = float(poll_interval)
+        data = await self.poller.poll(
+            self.prediction_url(task_id),
+            provider="infinitetalk",
+            kind="video",
+            headers=self.headers,
+            label="Infinitetalk",
+            policy=policy,
+            unwrap=self._unwrap_response,
+            webhook=webhook,
+        )
+
+        output = data.get("output") or {}
+        outputs = data.get("outputs") or []
+        if not output and outputs:
+            output = {
+                "video_url": outputs[0],
+                "duration": data.get("duration")
+                or data.get("executionTime", 0) / 1000.0,
+            }
+        if not output:
             raise ExternalAPIError(
                 provider="infinitetalk",
-                message=f"轮询 Infinitetalk 任务未知错误: {exc}",
-                status_code=0,
-                original_exception=exc,
-            ) from exc
+                message="任务完成但无输出",
+                status_code=200,
+                response_data=data,
+            )
+        return output
 
-        raise ExternalAPIError(
-            provider="infinitetalk",
-            message=f"等待 Infinitetalk 任务完成超时 ({max_wait}秒)",
-            status_code=408,
-        )
+    def prediction_url(self, task_id: str) -> str:
+        """预测结果查询地址。"""
+        return f"{self.base_url}/predictions/{task_id}/result"
 
     @staticmethod
     def _unwrap_response(resp: Dict[str, Any]) -> Dict[str, Any]:
@@ -150,41 +164,15 @@ class InfiniteTalkClient:
         return resp
 
     async def download(self, url: str, target: Path) -> Path:
-        """下载唇同步视频到本地。"""
-        target.parent.mkdir(parents=True, exist_ok=True)
-        try:
-            async with httpx.AsyncClient(timeout=120) as client:
-                response = await client.get(url)
-                if not response.is_success:
-                    raise ExternalAPIError(
-                        provider="infinitetalk",
-                        message=f"下载 Infinitetalk 视频失败: {url}",
-                        status_code=response.status_code,
-                    )
-                target.write_bytes(response.content)
-        except httpx.TimeoutException as exc:
-            raise ExternalAPIError(
-                provider="infinitetalk",
-                message="下载 Infinitetalk 视频超时",
-                status_code=408,
-                original_exception=exc,
-            ) from exc
-        except httpx.RequestError as exc:
-            raise ExternalAPIError(
-                provider="infinitetalk",
-                message=f"下载 Infinitetalk 视频网络错误: {exc}",
-                status_code=0,
-                original_exception=exc,
-            ) from exc
-        except ExternalAPIError:
-            raise
-        except Exception as exc:  # noqa: BLE001
-            raise ExternalAPIError(
-                provider="infinitetalk",
-                message=f"保存 Infinitetalk 视频失败: {exc}",
-                status_code=0,
-                original_exception=exc,
-            ) from exc
+        """流式下载唇同步视频到本地（断线按 Range 续传，完成后原子替换）。"""
+        await stream_download(
+            self.http,
+            url,
+            target,
+            provider="infinitetalk",
+            label=" Infinitetalk 视频",
+            timeout=120,
+        )
         return target
 
     def _calculate_cost(self, duration: float, resolution: str) -> float:
@@ -203,8 +191,19 @@ class InfiniteTalkClient:
         seed: int = 42,
         mask_image: Optional[str] = None,
         prompt: Optional[str] = None,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+        resume_prediction: Optional[Dict[str, Any]] = None,
+        output_path: Optional[Path] = None,
     ) -> Dict[str, Any]:
-        """封装完整的唇同步生成流程。"""
+        """
+        封装完整的唇同步生成流程。
+
+        Args:
+            output_path: 视频保存路径（通常为任务目录的 TaskPaths.video_path）；
+                未提供时保存到 output/<task_id>/digital_human.mp4
+            on_submitted: 提交成功后立即回调 {"provider_task_id", "poll_url"}，供调用方持久化
+            resume_prediction: 之前已提交的预测（含 provider_task_id），直接续接轮询而不重新提交
+        """
         payload = {
             "image": image_url,
             "audio": audio_url,
@@ -218,8 +217,15 @@ class InfiniteTalkClient:
         if prompt:
             payload["prompt"] = prompt
 
-        task_id = await self.submit(self.endpoint, payload)
-        result = await self.wait_for_result(task_id, max_wait=600, poll_interval=5)
+        task_id = (resume_prediction or {}).get("provider_task_id")
+        webhook = None
+        if not task_id:
+            token = self.webhooks.new_token()
+            task_id = await self.submit(self.endpoint, payload, webhook_token=token)
+            webhook = self.webhooks.register(task_id, token)
+            if on_submitted:
+                on_submitted({"provider_task_id": task_id, "poll_url": self.prediction_url(task_id)})
+        result = await self.wait_for_result(task_id, webhook=webhook)
 
         video_url = result.get("video_url")
         if not video_url:
@@ -230,7 +236,7 @@ class InfiniteTalkClient:
                 response_data=result,
             )
 
-        video_path = Path(f"output/{task_id}/digital_human.mp4")
+        video_path = Path(output_path) if output_path else Path(f"output/{task_id}/digital_human.mp4")
         await self.download(video_url, video_path)
 
         duration = result.get("duration", 0)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务 ID 分配器。
+
+默认使用 ULID 风格的 ID：`aka-` + 26 位 Crockford Base32（小写），
+前 10 位为毫秒时间戳、后 16 位为 80bit 随机数：
+- O(1) 分配，无需探测已有任务；
+- 字典序即创建时间顺序；
+- 同一毫秒内单进程单调递增，多进程依靠 80bit 随机数避免碰撞。
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+_CROCKFORD = "0123456789abcdefghjkmnpqrstvwxyz"
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(_CROCKFORD[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+class UlidJobIdAllocator:
+    """
+    时间有序、单调的任务 ID 分配器。
+
+    Args:
+        prefix: ID 前缀（默认 `aka-`）
+        clock: 返回毫秒时间戳的函数，测试时可替换
+    """
+
+    def __init__(
+        self,
+        prefix: str = "aka-",
+        clock: Optional[Callable[[], int]] = None,
+    ):
+        self.prefix = prefix
+        self._clock = clock or (lambda: time.time_ns() // 1_000_000)
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def allocate(self) -> str:
+        """分配一个新的任务 ID。"""
+        with self._lock:
+            now_ms = self._clock()
+            if now_ms <= self._last_ms:
+                # 同一毫秒（或时钟回拨）：沿用上一次时间戳，随机部分 +1 保证单调
+                now_ms = self._last_ms
+                random_part = self._last_random + 1
+                if random_part > _RANDOM_MAX:
+                    now_ms += 1
+                    random_part = int.from_bytes(os.urandom(10), "big")
+            else:
+                random_part = int.from_bytes(os.urandom(10), "big")
+            self._last_ms = now_ms
+            self._last_random = random_part
+        return f"{self.prefix}{_encode(now_ms, 10)}{_encode(random_part, 16)}"
+
+    __call__ = allocate
+
+
+__all__ = ["UlidJobIdAllocator"]
@@ -1,13 +1,36 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""简易异步限流器。"""
+"""
+异步令牌桶限流器。
+
+每分钟 / 每天两个令牌桶，acquire 为 O(1)：在锁内按连续补充速率预留令牌
+（不足时令牌记为负数，即排队中的预约），算出需要等待的时间后释放锁再 sleep，
+等待期间不阻塞其他协程，也按请求到达顺序放行。
+"""
 
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import threading
 import time
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass
+class _Bucket:
+    capacity: float
+    rate: float  # 每秒补充的令牌数
+    tokens: float = 0.0
+    updated: float = 0.0
+
+    def reserve(self, now: float) -> float:
+        """预留一个令牌，返回需等待的秒数"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
 
 
 @dataclass
@@ -15,10 +38,18 @@ class RateLimiter:
     max_per_minute: Optional[int] = None
     max_per_day: Optional[int] = None
     name: str = "limiter"
+    _buckets: list = field(default_factory=list, init=False, repr=False)
 
     def __post_init__(self) -> None:
-        self._lock = asyncio.Lock()
-        self._events: list[float] = []
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        for limit, period in ((self.max_per_minute, 60.0), (self.max_per_day, 86400.0)):
+            if limit:
+                self._buckets.append(_Bucket(float(limit), limit / period, float(limit), now))
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
 
     async def __aenter__(self):
         await self.acquire()
@@ -27,37 +58,79 @@ class RateLimiter:
     async def __aexit__(self, exc_type, exc, tb):
         return False
 
-    async def acquire(self) -> None:
-        async with self._lock:
-            now = time.time()
-            self._trim(now)
-            while not self._can_proceed(now):
-                await asyncio.sleep(1)
-                now = time.time()
-                self._trim(now)
-            self._events.append(now)
-
-    def _trim(self, now: float) -> None:
-        minute_ago = now - 60
-        day_ago = now - 86400
-        self._events = [t for t in self._events if t >= day_ago]
-        # minute constraint implicitly handled in _can_proceed
-        if self.max_per_minute is None:
-            return
-        self._events = [t for t in self._events if t >= minute_ago]
-
-    def _can_proceed(self, now: float) -> bool:
-        if self.max_per_minute is not None:
-            minute_ago = now - 60
-            recent_min = len([t for t in self._events if t >= minute_ago])
-            if recent_min >= self.max_per_minute:
-                return False
-        if self.max_per_day is not None:
-            day_ago = now - 86400
-            recent_day = len([t for t in self._events if t >= day_ago])
-            if recent_day >= self.max_per_day:
-                return False
-        return True
-
-
-__all__ = ["RateLimiter"]
+    async def acquire(self) -> float:
+        """获取一次调用许可，返回实际等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max((bucket.reserve(now) for bucket in self._buckets), default=0.0)
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_per_minute": self.max_per_minute,
+                "max_per_day": self.max_per_day,
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+            }
+
+
+# provider -> config.yaml rate_limits 中的配置键
+PROVIDER_LIMIT_KEYS = {
+    "seedream": "image_generation",
+    "minimax": "speech_generation",
+    "infinitetalk": "video_generation",
+}
+
+_LIMITERS: Dict[Tuple[str, str], RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(
+    provider: str,
+    api_key: str,
+    rate_limits: Optional[Dict[str, Any]] = None,
+) -> Optional[RateLimiter]:
+    """
+    按 provider + API Key 获取进程内共享的限流器
+
+    Args:
+        provider: seedream / minimax / infinitetalk
+        api_key: 调用方 API Key（仅以哈希参与索引）
+        rate_limits: config.yaml 的 rate_limits 配置块
+
+    Returns:
+        未配置限额时返回 None
+    """
+    cfg = (rate_limits or {}).get(PROVIDER_LIMIT_KEYS.get(provider, provider)) or {}
+    per_minute = cfg.get("max_requests_per_minute")
+    per_day = cfg.get("max_requests_per_day")
+    if not per_minute and not per_day:
+        return None
+    key = (provider, hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16])
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None or (limiter.max_per_minute, limiter.max_per_day) != (per_minute, per_day):
+            limiter = RateLimiter(per_minute, per_day, name=f"{provider}:{key[1][:8]}")
+            _LIMITERS[key] = limiter
+        return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """所有限流器的等待统计"""
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+__all__ = ["RateLimiter", "get_rate_limiter", "rate_limiter_stats", "PROVIDER_LIMIT_KEYS"]
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段 DAG 执行器。
+
+每个阶段声明依赖（depends_on）及重试/超时策略，执行器在依赖满足后
+立即并发启动该阶段；任一阶段最终失败时取消其余运行中的阶段并抛出原异常。
+执行完成后返回各阶段耗时与关键路径，便于统一度量与优化端到端延迟。
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+StageCallable = Callable[[Any], Awaitable[Any]]
+
+
+@dataclass
+class StageSpec:
+    """
+    阶段声明。
+
+    Args:
+        name: 阶段名（图内唯一）
+        run: 阶段执行函数，接收执行上下文
+        depends_on: 依赖的阶段名
+        retries: 失败后的重试次数（0 表示不重试）
+        retry_delay: 首次重试前等待秒数
+        backoff: 重试等待的倍增系数
+        timeout: 单次执行超时（秒），None 表示不限
+    """
+
+    name: str
+    run: StageCallable
+    depends_on: tuple[str, ...] = ()
+    retries: int = 0
+    retry_delay: float = 0.0
+    backoff: float = 2.0
+    timeout: Optional[float] = None
+
+
+@dataclass
+class StageTiming:
+    started_at: float
+    finished_at: float = 0.0
+    attempts: int = 0
+
+    @property
+    def seconds(self) -> float:
+        return max(self.finished_at - self.started_at, 0.0)
+
+
+@dataclass
+class GraphReport:
+    """一次执行的耗时统计。"""
+
+    timings: Dict[str, StageTiming] = field(default_factory=dict)
+    critical_path: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": {
+                name: {"seconds": round(t.seconds, 3), "attempts": t.attempts}
+                for name, t in self.timings.items()
+            },
+            "critical_path": list(self.critical_path),
+        }
+
+
+class StageGraph:
+    """由 StageSpec 组成的有向无环图。"""
+
+    def __init__(self, stages: Iterable[StageSpec] = ()):
+        self._stages: Dict[str, StageSpec] = {}
+        for spec in stages:
+            self.add(spec)
+
+    def add(self, spec: StageSpec) -> None:
+        """添加阶段；同名阶段会被替换。"""
+        self._stages[spec.name] = spec
+
+    def remove(self, name: str) -> None:
+        self._stages.pop(name, None)
+
+    def get(self, name: str) -> Optional[StageSpec]:
+        return self._stages.get(name)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._stages)
+
+    def validate(self) -> List[str]:
+        """校验依赖并返回拓扑序；存在未知依赖或环时抛出 ValueError。"""
+        for spec in self._stages.values():
+            for dep in spec.depends_on:
+                if dep not in self._stages:
+                    raise ValueError(f"阶段 {spec.name} 依赖未知阶段: {dep}")
+        order: List[str] = []
+        done: set[str] = set()
+        remaining = dict(self._stages)
+        while remaining:
+            ready = [n for n, s in remaining.items() if all(d in done for d in s.depends_on)]
+            if not ready:
+                raise ValueError(f"阶段依赖存在环: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                done.add(name)
+                remaining.pop(name)
+        return order
+
+    async def execute(
+        self,
+        ctx: Any,
+        *,
+        skip: Iterable[str] = (),
+        on_start: Optional[Callable[[str], None]] = None,
+        on_complete: Optional[Callable[[str], None]] = None,
+        on_retry: Optional[Callable[[str, int, BaseException], None]] = None,
+    ) -> GraphReport:
+        """
+        执行整张图。
+
+        Args:
+            ctx: 传给每个阶段的上下文
+            skip: 视为已完成、不再执行的阶段
+            on_start / on_complete: 阶段开始/完成回调（同步调用，完成回调先于后继阶段启动）
+            on_retry: 阶段重试回调，参数为 (阶段名, 已重试次数, 异常)
+        """
+        self.validate()
+        report = GraphReport()
+        completed: set[str] = {name for name in skip if name in self._stages}
+        running: Dict[asyncio.Future, str] = {}
+
+        def _launch_ready() -> None:
+            active = set(running.values())
+            for name, spec in self._stages.items():
+                if name in completed or name in active:
+                    continue
+                if all(dep in completed for dep in spec.depends_on):
+                    report.timings[name] = StageTiming(started_at=time.monotonic())
+                    if on_start:
+                        on_start(name)
+                    future = asyncio.ensure_future(self._run_stage(spec, ctx, report, on_retry))
+                    running[future] = name
+
+        try:
+            _launch_ready()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    future.result()
+                    report.timings[name].finished_at = time.monotonic()
+                    completed.add(name)
+                    if on_complete:
+                        on_complete(name)
+                _launch_ready()
+        except BaseException:
+            for future in running:
+                future.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            raise
+
+        report.critical_path = self._critical_path(report)
+        return report
+
+    async def _run_stage(
+        self,
+        spec: StageSpec,
+        ctx: Any,
+        report: GraphReport,
+        on_retry: Optional[Callable[[str, int, BaseException], None]],
+    ) -> Any:
+        delay = spec.retry_delay
+        attempt = 0
+        while True:
+            report.timings[spec.name].attempts = attempt + 1
+            try:
+                if spec.timeout:
+                    return await asyncio.wait_for(spec.run(ctx), timeout=spec.timeout)
+                return await spec.run(ctx)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                if attempt >= spec.retries:
+                    raise
+                attempt += 1
+                if on_retry:
+                    on_retry(spec.name, attempt, exc)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                delay *= spec.backoff
+
+    def _critical_path(self, report: GraphReport) -> List[str]:
+        """从最后完成的阶段沿“最晚完成的依赖”回溯得到关键路径。"""
+        timed = {n: t for n, t in report.timings.items() if t.finished_at}
+        if not timed:
+            return []
+        current: Optional[str] = max(timed, key=lambda n: timed[n].finished_at)
+        path: List[str] = []
+        while current:
+            path.append(current)
+            deps = [d for d in self._stages[current].depends_on if d in timed]
+            current = max(deps, key=lambda d: timed[d].finished_at) if deps else None
+        return list(reversed(path))
+
+
+__all__ = ["StageSpec", "StageGraph", "GraphReport", "StageTiming"]
@@ -5,23 +5,35 @@
 
 将数字人生成流程拆分为 avatar/speech/video 三个阶段，
 并负责写入 task.json、更新状态机、成本统计以及公共资源发布。
+
+各阶段以 StageGraph 声明依赖：avatar 与 speech 互不依赖，默认并行执行
+（assets_generating），两者均就绪（assets_ready）后进入 video，最后 publish。
+新增阶段（如缩略图）只需 add_stage 声明依赖，无需改动主流程。
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from dataclasses import dataclass, field, asdict
 from datetime import datetime, timezone
 from enum import Enum
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from uuid import uuid4
 
+from py.function.stage_graph import StageGraph, StageSpec
+from py.services.circuit_breaker import CircuitBreaker
+from py.services.finalization_queue import FinalizationQueue
+from py.services.io_executor import AsyncStorage
 from py.services.storage_service import StorageService, TaskPaths
 from py.services.task_manager import TaskManager
 
 
 class TaskStatus(str, Enum):
     PENDING = "pending"
+    ASSETS_GENERATING = "assets_generating"
+    ASSETS_READY = "assets_ready"
     AVATAR_GENERATING = "avatar_generating"
     AVATAR_READY = "avatar_ready"
     SPEECH_GENERATING = "speech_generating"
@@ -32,7 +44,19 @@ class TaskStatus(str, Enum):
 
 
 ALLOWED_TRANSITIONS: Dict[TaskStatus, set[TaskStatus]] = {
-    TaskStatus.PENDING: {TaskStatus.AVATAR_GENERATING, TaskStatus.FAILED},
+    TaskStatus.PENDING: {
+        TaskStatus.AVATAR_GENERATING,
+        TaskStatus.ASSETS_GENERATING,
+        TaskStatus.FAILED,
+        # 断点恢复：跳过已完成阶段
+        TaskStatus.ASSETS_READY,
+        TaskStatus.SPEECH_GENERATING,
+        TaskStatus.VIDEO_RENDERING,
+    },
+    # 并行模式：avatar 与 speech 同时进行
+    TaskStatus.ASSETS_GENERATING: {TaskStatus.ASSETS_READY, TaskStatus.FAILED},
+    TaskStatus.ASSETS_READY: {TaskStatus.VIDEO_RENDERING, TaskStatus.FAILED},
+    # 串行模式
     TaskStatus.AVATAR_GENERATING: {TaskStatus.AVATAR_READY, TaskStatus.FAILED},
     TaskStatus.AVATAR_READY: {TaskStatus.SPEECH_GENERATING, TaskStatus.FAILED},
     TaskStatus.SPEECH_GENERATING: {TaskStatus.SPEECH_READY, TaskStatus.FAILED},
@@ -73,6 +97,7 @@ class StageState:
     message: str = ""
     retries: int = 0
     provider_task_id: Optional[str] = None
+    poll_url: Optional[str] = None
     output_url: Optional[str] = None
     artifact_path: Optional[str] = None
 
@@ -102,6 +127,41 @@ class TaskRecord:
     config_hash: Optional[str] = None
     logs: list[str] = field(default_factory=list)
 
+    @classmethod
+    def from_serializable(cls, payload: Dict[str, Any]) -> "TaskRecord":
+        """由 task.json 数据重建记录（用于断点恢复）。"""
+        try:
+            status = TaskStatus(payload.get("status"))
+        except ValueError:
+            status = TaskStatus.PENDING
+        stage_fields = set(StageState.__dataclass_fields__)
+        stages = {name: StageState() for name in ("avatar", "speech", "video")}
+        for name, stage in (payload.get("stages") or {}).items():
+            if isinstance(stage, dict):
+                stages[name] = StageState(**{k: v for k, v in stage.items() if k in stage_fields})
+        now = datetime.now(timezone.utc).isoformat()
+        return cls(
+            job_id=payload["job_id"],
+            status=status,
+            created_at=payload.get("created_at") or now,
+            updated_at=payload.get("updated_at") or now,
+            params=dict(payload.get("params") or {}),
+            trace_id=payload.get("trace_id") or f"trace-{uuid4().hex[:12]}",
+            duration=payload.get("duration"),
+            stages=stages,
+            cost=float(payload.get("cost") or 0.0),
+            cost_breakdown={
+                "avatar": 0.0,
+                "speech": 0.0,
+                "video": 0.0,
+                **(payload.get("cost_breakdown") or {}),
+            },
+            assets=dict(payload.get("assets") or {}),
+            error=payload.get("error"),
+            config_hash=payload.get("config_hash"),
+            logs=list(payload.get("logs") or []),
+        )
+
     def as_serializable(self) -> Dict[str, Any]:
         payload = asdict(self)
         payload["status"] = self.status.value
@@ -116,12 +176,35 @@ class TaskRecord:
         return payload
 
 
+TERMINAL_STATUSES = {TaskStatus.FINISHED, TaskStatus.FAILED}
+# 阶段产物就绪时立即落盘，作为断点
+CHECKPOINT_STATUSES = {
+    TaskStatus.AVATAR_READY,
+    TaskStatus.SPEECH_READY,
+    TaskStatus.ASSETS_READY,
+}
+
+STAGE_POLICY_KEYS = {"retries", "retry_delay", "backoff", "timeout"}
+
+
 @dataclass
 class TaskContext:
     job_id: str
     request: TaskRequest
     paths: TaskPaths
     record: TaskRecord
+    parallel_assets: bool = False
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    # 任务落盘后交给收尾队列的步骤 (name, step, on_failure)
+    deferred: List[Tuple[str, Callable[[], Awaitable[Any]], Callable[[Exception], Awaitable[None]]]] = field(
+        default_factory=list
+    )
+    dirty: bool = False
+    last_flush: float = 0.0
+    flush_handle: Optional[asyncio.TimerHandle] = None
+    # 在 I/O 线程池中进行的 task.json 写入；首个写入错误在任务结束时抛出
+    pending_writes: Set[asyncio.Task] = field(default_factory=set)
+    write_error: Optional[BaseException] = None
 
 
 class TaskRunner:
@@ -139,23 +222,58 @@ class TaskRunner:
         ] = None,
         logger: Optional[logging.Logger] = None,
         config_hash: Optional[str] = None,
+        persist_interval: float = 0.5,
+        parallel_assets: bool = True,
+        stage_policies: Optional[Dict[str, Dict[str, Any]]] = None,
+        circuit_breakers: Optional[Dict[str, CircuitBreaker]] = None,
+        finalizer: Optional[FinalizationQueue] = None,
     ):
+        """
+        Args:
+            parallel_assets: 是否并行执行 avatar 与 speech 阶段（False 时按原顺序串行）
+            stage_policies: 各阶段重试/超时策略，如 {"video": {"timeout": 900, "retries": 1}}
+            circuit_breakers: 阶段名 -> 对应供应商的熔断器；熔断期间该阶段立即失败
+            finalizer: 收尾队列；提供时视频发布/镜像复制移到任务完成之后异步执行
+            persist_interval: task.json 最小写入间隔（秒）；期间的变更合并为一次写入，
+                终态与阶段完成时总是立即写入
+        """
         self.avatar_client = avatar_client
         self.voice_client = voice_client
         self.video_client = video_client
         self.storage = storage_service
+        # 复制 / 发布等慢速文件操作在 I/O 线程池中执行
+        self.storage_io = AsyncStorage(storage_service)
         self.task_manager = task_manager
         self.avatar_upload_handler = avatar_upload_handler
         self.logger = logger or logging.getLogger("TaskRunner")
         self.config_hash = config_hash
-
-    async def run(self, job_id: str, request: TaskRequest) -> Dict[str, Any]:
-        """执行完整数字人流水线，返回序列化的 task.json 数据。"""
+        self.persist_interval = max(0.0, persist_interval)
+        self.parallel_assets = parallel_assets
+        self.circuit_breakers = circuit_breakers or {}
+        self.finalizer = finalizer
+        self.graph = self._build_graph(stage_policies or {})
+
+    async def run(
+        self, job_id: str, request: TaskRequest, resume: bool = False
+    ) -> Dict[str, Any]:
+        """
+        执行完整数字人流水线，返回序列化的 task.json 数据。
+
+        Args:
+            resume: 为 True 且 task.json 存在时，从已完成阶段之后继续执行，
+                复用已生成的头像/音频 URL 与已计入的成本；task.json 已 finished 时
+                不再执行，直接返回已有结果
+        """
+        if resume:
+            finished = await self.finished_result(job_id)
+            if finished is not None:
+                return finished
+        checkpoint = await self._load_checkpoint(job_id) if resume else None
         ctx = TaskContext(
             job_id=job_id,
             request=request,
             paths=self.storage.prepare_task_paths(job_id),
-            record=self._init_record(job_id, request),
+            record=checkpoint or self._init_record(job_id, request),
         )
         if ctx.request.character:
             sanitized = self._sanitize_character(ctx.request.character)
@@ -166,21 +284,57 @@ class TaskRunner:
                 f"🎭 使用角色 {sanitized.get('name') or sanitized.get('id')}",
             )
         try:
-            self._validate_config_hash(job_id)
-            self._set_status(ctx, TaskStatus.PENDING, "任务已创建，等待执行")
-            await self.run_step_avatar(ctx)
-            await self.run_step_speech(ctx)
-            await self.run_step_video(ctx)
+            await self._validate_config_hash(job_id)
+            completed = self._completed_stages(ctx) if checkpoint else set()
+            if checkpoint:
+                self._reset_for_resume(ctx, completed)
+            else:
+                self._set_status(ctx, TaskStatus.PENDING, "任务已创建，等待执行")
+            ctx.parallel_assets = self.parallel_assets
+            if ctx.parallel_assets and {"avatar", "speech"} <= completed:
+                ctx.parallel_assets = False
+                self._set_status(ctx, TaskStatus.ASSETS_READY, "✅ 头像与语音均已就绪")
+            elif ctx.parallel_assets:
+                self._set_status(ctx, TaskStatus.ASSETS_GENERATING, "正在并行生成头像与语音...")
+            report = await self.graph.execute(
+                ctx,
+                skip=completed,
+                on_complete=lambda name: self._on_stage_complete(ctx, name),
+                on_retry=lambda name, attempt, exc: self._on_stage_retry(ctx, name, attempt, exc),
+            )
+            ctx.record.assets["stage_timings"] = report.as_dict()
             self._mark_finished(ctx)
         except Exception as exc:  # noqa: BLE001
             self._mark_failed(ctx, exc)
             raise
-
+        finally:
+            self._flush(ctx)
+            self.storage.close_log(job_id)
+            await self._drain_writes(ctx)
+
+        # 终态已落盘后再提交收尾步骤，避免其回写被任务自身的最终写入覆盖
+        for name, step, on_failure in ctx.deferred:
+            self.finalizer.submit(job_id, name, step, on_failure=on_failure)
         return ctx.record.as_serializable()
 
+    def add_stage(
+        self,
+        name: str,
+        run: Callable[[TaskContext], Awaitable[Any]],
+        depends_on: tuple[str, ...] = (),
+        **policy: Any,
+    ) -> None:
+        """注册额外阶段（如缩略图），依赖满足后与其他阶段并发执行。"""
+        self.graph.add(StageSpec(name=name, run=run, depends_on=tuple(depends_on), **policy))
+        try:
+            self.graph.validate()
+        except ValueError:
+            self.graph.remove(name)
+            raise
+
     async def run_step_avatar(self, ctx: TaskContext) -> None:
         """生成或上传头像，并更新 avatar 阶段状态。"""
-        self._set_status(ctx, TaskStatus.AVATAR_GENERATING, "正在生成头像...")
+        self._enter_stage(ctx, "avatar", TaskStatus.AVATAR_GENERATING, "正在生成头像...")
         req = ctx.request
 
         if req.avatar_mode == "upload":
@@ -191,13 +345,19 @@ class TaskRunner:
             )
             cost = 0.0
         else:
-            avatar_result = await self.avatar_client.generate_images(
-                prompts=[req.avatar_prompt],
-                resolution="1024x1024",
-                num_images=1,
+            avatar_result = await self._call_provider(
+                ctx,
+                "avatar",
+                lambda **hooks: self.avatar_client.generate_images(
+                    prompts=[req.avatar_prompt],
+                    resolution="1024x1024",
+                    num_images=1,
+                    **hooks,
+                ),
             )
             avatar_url = avatar_result[0]["url"]
-            cost = 0.03  # Rough estimate for Seedream
+            # Rough estimate for Seedream；命中头像缓存不产生费用
+            cost = 0.0 if avatar_result[0].get("cache_hit") else 0.03
 
         self._update_stage(
             ctx,
@@ -209,20 +369,25 @@ class TaskRunner:
         ctx.record.assets["avatar_url"] = avatar_url
         ctx.record.assets["wave_avatar_url"] = avatar_url
         self._increase_cost(ctx, "avatar", cost)
-        self._set_status(ctx, TaskStatus.AVATAR_READY, f"✅ 头像生成完成: {avatar_url}")
+        self._leave_stage(ctx, TaskStatus.AVATAR_READY, f"✅ 头像生成完成: {avatar_url}")
 
     async def run_step_speech(self, ctx: TaskContext) -> None:
         """调用语音服务生成播报音频并写入任务目录。"""
-        self._set_status(ctx, TaskStatus.SPEECH_GENERATING, "正在生成语音...")
+        self._enter_stage(ctx, "speech", TaskStatus.SPEECH_GENERATING, "正在生成语音...")
         req = ctx.request
 
-        voice_result = await self.voice_client.generate_voice(
-            text=req.speech_text,
-            voice_id=req.voice_id,
-            speed=req.speed,
-            pitch=req.pitch,
-            emotion=req.emotion,
-            output_path=ctx.paths.speech_path,
+        voice_result = await self._call_provider(
+            ctx,
+            "speech",
+            lambda **hooks: self.voice_client.generate_voice(
+                text=req.speech_text,
+                voice_id=req.voice_id,
+                speed=req.speed,
+                pitch=req.pitch,
+                emotion=req.emotion,
+                output_path=ctx.paths.speech_path,
+                **hooks,
+            ),
         )
 
         self._increase_cost(ctx, "speech", voice_result.get("cost", 0.0))
@@ -231,75 +396,82 @@ class TaskRunner:
             ctx.record.duration = duration
             ctx.record.assets["duration"] = duration
         duration_value = duration if duration is not None else 0.0
+        cache_note = "，命中缓存" if voice_result.get("cache_hit") else ""
         self._update_stage(
             ctx,
             "speech",
             state="completed",
-            message=f"语音生成完成 ({duration_value:.1f}s)",
+            message=f"语音生成完成 ({duration_value:.1f}s{cache_note})",
             output_url=voice_result.get("audio_url"),
             artifact_path=str(ctx.paths.speech_path),
         )
         ctx.record.assets["audio_url"] = voice_result.get("audio_url")
         ctx.record.assets["audio_path"] = voice_result.get("audio_path")
         ctx.record.assets["wave_audio_url"] = voice_result.get("audio_url")
-        self._set_status(
-            ctx,
-            TaskStatus.SPEECH_READY,
-            "✅ 语音生成完成",
-        )
+        self._leave_stage(ctx, TaskStatus.SPEECH_READY, "✅ 语音生成完成")
 
     async def run_step_video(self, ctx: TaskContext) -> None:
-        """调用唇同步服务生成最终数字人视频并执行发布。"""
+        """调用唇同步服务生成最终数字人视频，直接下载到任务目录。"""
         self._set_status(ctx, TaskStatus.VIDEO_RENDERING, "正在生成数字人视频...")
         req = ctx.request
         avatar_url = ctx.record.assets.get("avatar_url") or ctx.record.stages["avatar"].output_url
         audio_url = ctx.record.assets.get("audio_url") or ctx.record.stages["speech"].output_url
 
-        video_result = await self.video_client.generate_video(
-            image_url=avatar_url,
-            audio_url=audio_url,
-            resolution=req.resolution,
-            seed=req.seed,
-            mask_image=req.mask_image,
+        video_result = await self._call_provider(
+            ctx,
+            "video",
+            lambda **hooks: self.video_client.generate_video(
+                image_url=avatar_url,
+                audio_url=audio_url,
+                resolution=req.resolution,
+                seed=req.seed,
+                mask_image=req.mask_image,
+                output_path=ctx.paths.video_path,
+                **hooks,
+            ),
         )
 
+        # 视频客户端直接写入任务目录；仅当返回其他位置的文件时才复制进来
         provider_path = video_result.get("video_path")
         local_path = ctx.paths.video_path
         if provider_path:
             provider_path = Path(provider_path)
             if provider_path.exists():
-                self.storage.copy_into_task(provider_path, local_path)
-
-        publish_info = None
-        try:
-            publish_info = self.storage.publish_video(ctx.job_id, local_path)
-        except (FileNotFoundError, PermissionError) as exc:
-            # 发布到对象存储失败不影响任务完成（视频已在本地生成）
-            self.logger.warning(f"⚠️ 视频发布到公共目录失败: {exc}")
-            publish_info = None
+                await self.storage_io.copy_into_task(provider_path, local_path)
 
         self._increase_cost(ctx, "video", video_result.get("cost", 0.0))
+        ctx.outputs["video"] = video_result
+
+    async def run_step_publish(self, ctx: TaskContext) -> None:
+        """
+        发布最终视频到公共目录/镜像，并解析对外 URL。
+
+        配置了 finalizer 时不在关键路径上复制：先以供应商 URL（或本地 URL）完成任务，
+        发布在任务落盘后由收尾队列执行，完成后回写 task.json。
+        """
+        video_result = ctx.outputs.get("video") or {}
+        avatar_url = ctx.record.assets.get("avatar_url") or ctx.record.stages["avatar"].output_url
+        local_path = ctx.paths.video_path
         provider_video_url = video_result.get("video_url")
-        mirror_locations = (publish_info or {}).get("mirrors") or []
-        resolved_video_url = (publish_info or {}).get("url") or provider_video_url
-        if not resolved_video_url:
-            for mirror in mirror_locations:
-                mirror_url = mirror.get("url")
-                if mirror_url:
-                    resolved_video_url = mirror_url
-                    break
 
-        # 如果没有公开URL，回退到本地 Nginx URL
-        if not resolved_video_url:
-            import os
-            base_url = os.getenv("DIGITAL_HUMAN_PUBLIC_URL", "http://172.236.130.10:16000")
-            resolved_video_url = f"{base_url.rstrip('/')}/output/{ctx.job_id}/{self.storage.final_video_name}"
+        publish_info = None
+        if self.finalizer is not None:
+            ctx.record.assets["publish_state"] = "pending"
+            ctx.deferred.append((
+                "publish",
+                lambda: self._finalize_publish(ctx.job_id, local_path, provider_video_url),
+                lambda exc: self._on_publish_failed(ctx.job_id, exc),
+            ))
+        else:
+            try:
+                publish_info = await self.storage_io.publish_video(ctx.job_id, local_path)
+            except (FileNotFoundError, PermissionError) as exc:
+                # 发布到对象存储失败不影响任务完成（视频已在本地生成）
+                self.logger.warning(f"⚠️ 视频发布到公共目录失败: {exc}")
+                publish_info = None
 
-        ctx.record.assets["video_url"] = resolved_video_url
+        self._apply_publish_info(ctx.record.assets, ctx.job_id, publish_info, provider_video_url)
         ctx.record.assets["video_path"] = str(local_path)
-        ctx.record.assets["public_video_path"] = (publish_info or {}).get("path")
-        if mirror_locations:
-            ctx.record.assets["video_mirrors"] = mirror_locations
         ctx.record.assets["avatar_url"] = avatar_url
         ctx.record.assets["wave_video_url"] = provider_video_url
         ctx.record.assets["local_video_url"] = f"/output/{ctx.job_id}/{self.storage.final_video_name}"
@@ -326,7 +498,105 @@ class TaskRunner:
                 ctx.record.assets["video_stage_seconds"] = max(elapsed, 0.0)
             except ValueError:
                 pass
-        self._persist(ctx)
+        self._persist(ctx, force=True)
+
+    def _apply_publish_info(
+        self,
+        assets: Dict[str, Any],
+        job_id: str,
+        publish_info: Optional[Dict[str, Any]],
+        provider_video_url: Optional[str],
+    ) -> None:
+        """按发布结果解析对外视频 URL：公共目录 > 供应商 URL > 镜像 > 本地 Nginx。"""
+        mirror_locations = (publish_info or {}).get("mirrors") or []
+        resolved_video_url = (publish_info or {}).get("url") or provider_video_url
+        if not resolved_video_url:
+            for mirror in mirror_locations:
+                mirror_url = mirror.get("url")
+                if mirror_url:
+                    resolved_video_url = mirror_url
+                    break
+
+        # 如果没有公开URL，回退到本地 Nginx URL
+        if not resolved_video_url:
+            import os
+            base_url = os.getenv("DIGITAL_HUMAN_PUBLIC_URL", "http://172.236.130.10:16000")
+            resolved_video_url = f"{base_url.rstrip('/')}/output/{job_id}/{self.storage.final_video_name}"
+
+        assets["video_url"] = resolved_video_url
+        assets["public_video_path"] = (publish_info or {}).get("path")
+        if mirror_locations:
+            assets["video_mirrors"] = mirror_locations
+        if (publish_info or {}).get("method"):
+            assets["publish_method"] = publish_info["method"]
+
+    async def _finalize_publish(
+        self, job_id: str, local_path: Path, provider_video_url: Optional[str]
+    ) -> None:
+        """收尾队列中执行的发布：复制到公共目录/镜像后回写 task.json。"""
+        if not local_path.exists():
+            # 本地视频不存在时重试无意义，保留供应商 URL
+            publish_info, state = None, "skipped"
+            self.logger.warning(f"⚠️ 视频发布到公共目录失败: {local_path} 不存在")
+        else:
+            publish_info, state = await self.storage_io.publish_video(job_id, local_path), "completed"
+
+        def apply(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if not record:
+                return None
+            assets = record.setdefault("assets", {})
+            self._apply_publish_info(assets, job_id, publish_info, provider_video_url)
+            assets["publish_state"] = state
+            record["video_url"] = assets["video_url"]
+            video_stage = (record.get("stages") or {}).get("video")
+            if isinstance(video_stage, dict):
+                video_stage["output_url"] = assets["video_url"]
+            record["updated_at"] = datetime.now(timezone.utc).isoformat()
+            return record
+
+        # 读-改-写持有任务写锁，与余额对账等其他收尾步骤互不覆盖
+        record = await self.storage_io.update_metadata(job_id, apply)
+        if publish_info and record:
+            self.storage.append_log(job_id, f"📦 视频已发布: {record['assets']['video_url']}")
+            self.storage.close_log(job_id)
+
+    async def _on_publish_failed(self, job_id: str, error: Exception) -> None:
+        """发布重试耗尽：保留供应商 / 本地 URL，仅记录失败。"""
+
+        def mark_failed(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if not record:
+                return None
+            record.setdefault("assets", {})["publish_state"] = "failed"
+            return record
+
+        await self.storage_io.update_metadata(job_id, mark_failed)
+        self.storage.append_log(job_id, f"⚠️ 视频发布到公共目录失败: {error}", level="WARNING")
+        self.storage.close_log(job_id)
+
+    def requeue_publish(self, job_id: str, record: Dict[str, Any]) -> bool:
+        """
+        进程重启后重新提交未完成的发布（task.json 中 publish_state 仍为 pending 的已完成任务）。
+
+        Returns:
+            是否已提交到收尾队列
+        """
+        assets = record.get("assets") or {}
+        if (
+            self.finalizer is None
+            or record.get("status") != TaskStatus.FINISHED.value
+            or assets.get("publish_state") != "pending"
+            or not assets.get("video_path")
+        ):
+            return False
+        local_path = Path(assets["video_path"])
+        provider_video_url = assets.get("wave_video_url")
+        self.finalizer.submit(
+            job_id,
+            "publish",
+            lambda: self._finalize_publish(job_id, local_path, provider_video_url),
+            on_failure=lambda exc: self._on_publish_failed(job_id, exc),
+        )
+        return True
 
     # ------------------------------------------------------------------ #
     # 内部辅助方法
@@ -346,6 +616,131 @@ class TaskRunner:
         record.assets["text_length"] = len(speech_text)
         return record
 
+    async def _call_provider(
+        self,
+        ctx: TaskContext,
+        stage: str,
+        call: Callable[..., Awaitable[Any]],
+    ) -> Any:
+        """
+        调用外部预测服务：提交后立即持久化预测 ID/轮询地址；
+        断点中存在未完成的预测时先续接轮询，续接失败再重新提交。
+        配置了熔断器时只有提交经熔断器放行：on_submitted 回调（含同步返回结果时的
+        空字典回调）即视为供应商已应答并记成功，之后的轮询/下载失败不计入熔断统计；
+        未回调而返回（命中缓存、没有请求供应商）时只归还探测名额。
+        续接已提交的预测不经过熔断器。
+        """
+        breaker = self.circuit_breakers.get(stage)
+
+        async def guarded(resume_prediction: Optional[Dict[str, Any]]) -> Any:
+            if breaker is None or resume_prediction:
+                return await call(on_submitted=on_submitted, resume_prediction=resume_prediction)
+            submitted = False
+
+            def on_breaker_submitted(info: Dict[str, Any]) -> None:
+                nonlocal submitted
+                submitted = True
+                breaker.record_success()
+                on_submitted(info)
+
+            breaker.before_call()
+            try:
+                result = await call(on_submitted=on_breaker_submitted, resume_prediction=None)
+            except BaseException as exc:
+                if not submitted:
+                    breaker.record_error(exc)
+                raise
+            if not submitted:
+                # 没有请求供应商（命中缓存）：归还探测名额，不影响统计
+                breaker.release_probe()
+            return result
+
+        def on_submitted(info: Dict[str, Any]) -> None:
+            if not (info.get("provider_task_id") or info.get("poll_url")):
+                return
+            self._update_stage(
+                ctx,
+                stage,
+                provider_task_id=info.get("provider_task_id"),
+                poll_url=info.get("poll_url"),
+            )
+            self._persist(ctx, force=True)
+
+        pending = self._pending_prediction(ctx, stage)
+        if pending:
+            self._log(
+                ctx,
+                f"[{stage}] 续接已提交的预测: {pending.get('provider_task_id') or pending.get('poll_url')}",
+            )
+            try:
+                return await guarded(pending)
+            except Exception as exc:  # noqa: BLE001
+                self._log(ctx, f"[{stage}] 续接预测失败，重新提交: {exc}", level="WARNING")
+                self._update_stage(ctx, stage, provider_task_id=None, poll_url=None)
+        return await guarded(None)
+
+    @staticmethod
+    def _pending_prediction(ctx: TaskContext, stage: str) -> Optional[Dict[str, Any]]:
+        """未完成阶段中已提交的预测（用于重启后续接）。"""
+        state = ctx.record.stages.get(stage)
+        if not state or state.state == "completed":
+            return None
+        if not (state.provider_task_id or state.poll_url):
+            return None
+        return {"provider_task_id": state.provider_task_id, "poll_url": state.poll_url}
+
+    async def finished_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        task.json 已处于 finished 时返回其内容，并同步任务管理器状态为 finished
+
+        用于崩溃发生在最终落盘之后、调度队列落盘之前的情况：任务实际已完成，
+        不能从头重跑（会再次计费）。
+        """
+        meta = await self.storage_io.load_metadata(job_id)
+        if not isinstance(meta, dict) or meta.get("status") != TaskStatus.FINISHED.value:
+            return None
+        self.task_manager.update_status(job_id, TaskStatus.FINISHED.value, "✅ 数字人视频生成完成")
+        video_path = (meta.get("assets") or {}).get("video_path")
+        if video_path:
+            self.task_manager.set_result_path(job_id, video_path)
+        return meta
+
+    async def _load_checkpoint(self, job_id: str) -> Optional[TaskRecord]:
+        """读取 task.json 作为断点；不存在或已完成时返回 None。"""
+        meta = await self.storage_io.load_metadata(job_id)
+        if not isinstance(meta, dict) or not meta.get("job_id"):
+            return None
+        if meta.get("status") == TaskStatus.FINISHED.value:
+            return None
+        return TaskRecord.from_serializable(meta)
+
+    def _completed_stages(self, ctx: TaskContext) -> set[str]:
+        """断点中已完成且产物可用的阶段。"""
+        completed = set()
+        for name in self.graph.names:
+            stage = ctx.record.stages.get(name)
+            if stage and stage.state == "completed" and stage.output_url:
+                completed.add(name)
+        # video 阶段在发布完成后才标记 completed
+        if "video" in completed:
+            completed.add("publish")
+        return completed
+
+    def _reset_for_resume(self, ctx: TaskContext, completed: set[str]) -> None:
+        """断点恢复：清除上次的错误与未完成阶段状态，从 pending 重新推进。"""
+        ctx.record.error = None
+        for name, stage in ctx.record.stages.items():
+            if name not in completed and stage.state != "pending":
+                stage.state = "pending"
+        for name in ctx.record.cost_breakdown:
+            if name not in completed:
+                ctx.record.cost_breakdown[name] = 0.0
+        ctx.record.cost = sum(ctx.record.cost_breakdown.values())
+        # 上次中断时的状态已失效，直接重置而非状态转换
+        ctx.record.status = TaskStatus.PENDING
+        skipped = "、".join(sorted(completed)) or "无"
+        self._set_status(ctx, TaskStatus.PENDING, f"♻️ 从断点恢复，跳过已完成阶段: {skipped}")
+
     def _increase_cost(self, ctx: TaskContext, stage: str, value: float) -> None:
         ctx.record.cost_breakdown[stage] = ctx.record.cost_breakdown.get(stage, 0.0) + value
         ctx.record.cost = sum(ctx.record.cost_breakdown.values())
@@ -373,7 +768,60 @@ class TaskRunner:
         if message:
             self._log(ctx, message, level=level)
         self.task_manager.update_status(ctx.job_id, status.value, message)
-        self._persist(ctx)
+        self._persist(
+            ctx,
+            force=status in TERMINAL_STATUSES or status in CHECKPOINT_STATUSES,
+        )
+
+    def _build_graph(self, policies: Dict[str, Dict[str, Any]]) -> StageGraph:
+        """声明默认阶段图；串行模式下 speech 依赖 avatar。"""
+        speech_deps: tuple[str, ...] = () if self.parallel_assets else ("avatar",)
+        specs = [
+            ("avatar", self.run_step_avatar, ()),
+            ("speech", self.run_step_speech, speech_deps),
+            ("video", self.run_step_video, ("avatar", "speech")),
+            ("publish", self.run_step_publish, ("video",)),
+        ]
+        return StageGraph(
+            StageSpec(
+                name=name,
+                run=run,
+                depends_on=deps,
+                **{k: v for k, v in (policies.get(name) or {}).items() if k in STAGE_POLICY_KEYS},
+            )
+            for name, run, deps in specs
+        )
+
+    def _on_stage_complete(self, ctx: TaskContext, name: str) -> None:
+        """并行模式下 avatar 与 speech 均完成时推进为 assets_ready。"""
+        if not ctx.parallel_assets or name not in ("avatar", "speech"):
+            return
+        if all(ctx.record.stages[s].state == "completed" for s in ("avatar", "speech")):
+            ctx.parallel_assets = False
+            self._set_status(ctx, TaskStatus.ASSETS_READY, "✅ 头像与语音均已就绪")
+
+    def _on_stage_retry(
+        self, ctx: TaskContext, name: str, attempt: int, error: BaseException
+    ) -> None:
+        self._update_stage(ctx, name, retries=attempt)
+        self._log(ctx, f"[{name}] 第 {attempt} 次重试: {error}", level="WARNING")
+
+    def _enter_stage(
+        self, ctx: TaskContext, stage: str, status: TaskStatus, message: str
+    ) -> None:
+        """阶段开始：串行模式推进整体状态，并行模式仅更新阶段状态。"""
+        if ctx.parallel_assets:
+            self._update_stage(ctx, stage, state="running", message=message)
+        else:
+            self._set_status(ctx, status, message)
+
+    def _leave_stage(self, ctx: TaskContext, status: TaskStatus, message: str) -> None:
+        """阶段完成：并行模式下整体状态保持 assets_generating，仅落盘断点。"""
+        if ctx.parallel_assets:
+            self._log(ctx, message)
+            self._persist(ctx, force=True)
+        else:
+            self._set_status(ctx, status, message)
 
     def _update_stage(self, ctx: TaskContext, stage: str, **kwargs: Any) -> None:
         stage_state = ctx.record.stages.get(stage) or StageState()
@@ -401,8 +849,66 @@ class TaskRunner:
             level="ERROR",
         )
 
-    def _persist(self, ctx: TaskContext) -> None:
-        self.storage.save_metadata(ctx.job_id, ctx.record.as_serializable())
+    def _persist(self, ctx: TaskContext, force: bool = False) -> None:
+        """标记记录已变更；距上次写入不足 persist_interval 时延迟合并写入。"""
+        ctx.dirty = True
+        elapsed = time.monotonic() - ctx.last_flush
+        if force or elapsed >= self.persist_interval:
+            self._flush(ctx)
+            return
+        if ctx.flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中（同步调用）时直接写入
+            self._flush(ctx)
+            return
+        ctx.flush_handle = loop.call_later(
+            self.persist_interval - elapsed, self._flush, ctx
+        )
+
+    def _flush(self, ctx: TaskContext) -> None:
+        """
+        将脏记录写入 task.json。
+
+        在事件循环中时只做序列化快照，写入交给 I/O 线程池并持有任务写锁：
+        同一任务的写入按提交顺序完成，也不会与收尾步骤的读-改-写交错。
+        """
+        if ctx.flush_handle is not None:
+            ctx.flush_handle.cancel()
+            ctx.flush_handle = None
+        if not ctx.dirty:
+            return
+        ctx.dirty = False
+        ctx.last_flush = time.monotonic()
+        payload = ctx.record.as_serializable()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.storage.save_metadata(ctx.job_id, payload)
+            return
+        task = loop.create_task(self._write_metadata(ctx.job_id, payload))
+        ctx.pending_writes.add(task)
+        task.add_done_callback(lambda done: self._on_write_done(ctx, done))
+
+    async def _write_metadata(self, job_id: str, payload: Dict[str, Any]) -> None:
+        async with self.storage_io.metadata_lock(job_id):
+            await self.storage_io.save_metadata(job_id, payload)
+
+    @staticmethod
+    def _on_write_done(ctx: TaskContext, task: asyncio.Task) -> None:
+        ctx.pending_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None and ctx.write_error is None:
+            ctx.write_error = task.exception()
+
+    async def _drain_writes(self, ctx: TaskContext) -> None:
+        """等待该任务在途的 task.json 写入完成；有写入失败时抛出首个错误。"""
+        if ctx.pending_writes:
+            await asyncio.gather(*list(ctx.pending_writes), return_exceptions=True)
+        if ctx.write_error is not None:
+            error, ctx.write_error = ctx.write_error, None
+            raise error
 
     def _log(self, ctx: TaskContext, message: str, level: str = "INFO") -> None:
         log_message = message.strip()
@@ -423,11 +929,11 @@ class TaskRunner:
             trace_id=ctx.record.trace_id,
         )
 
-    def _validate_config_hash(self, job_id: str) -> None:
+    async def _validate_config_hash(self, job_id: str) -> None:
         """确保任务使用的配置哈希与当前加载的配置一致。"""
         if not self.config_hash:
             return
-        existing = self.storage.load_metadata(job_id)
+        existing = await self.storage_io.load_metadata(job_id)
         existing_hash = existing.get("config_hash") if isinstance(existing, dict) else None
         if existing_hash and existing_hash != self.config_hash:
             raise RuntimeError(
@@ -0,0 +1,246 @@
+"""
+产物缓存 - 磁盘持久化、内容寻址、按容量 LRU 淘汰
+
+用于复用外部生成结果（TTS 音频、头像图片等）：
+- key 为规范化请求参数的 SHA-256，同参数请求命中后直接复制文件
+- 总容量超出 max_bytes 时淘汰最久未访问条目；可选 TTL（外部 URL 有有效期）
+- 维护 hits / misses 计数，便于观察命中率
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    path: Path
+    size: int
+    meta: Dict[str, Any] = field(default_factory=dict)
+    created_at: float = 0.0
+    last_access: float = 0.0
+
+
+class ArtifactCache:
+    """磁盘产物缓存"""
+
+    INDEX_FILE = "index.json"
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None,
+        name: str = "cache",
+    ):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存文件总大小上限
+            ttl_seconds: 条目有效期；None 表示不过期
+            name: 缓存名称（日志/统计用）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(**fields: Any) -> str:
+        """由请求参数生成缓存 key（字段顺序无关）"""
+        canonical = json.dumps(fields, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """查找条目；命中时刷新 LRU 位置"""
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry and (self._expired(entry) or not entry.path.exists()):
+                self._remove(key)
+                self._save_index()
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry.last_access = time.time()
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        key: str,
+        source: Union[str, Path],
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Optional[CacheEntry]:
+        """将文件复制进缓存；源文件不存在时返回 None"""
+        source_path = Path(source)
+        if not source_path.is_file():
+            return None
+        target = self.cache_dir / key[:2] / f"{key}{source_path.suffix}"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.tmp")
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, target)
+
+        now = time.time()
+        entry = CacheEntry(
+            key=key,
+            path=target,
+            size=target.stat().st_size,
+            meta=dict(meta or {}),
+            created_at=now,
+            last_access=now,
+        )
+        with self.lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key).size
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            self._evict()
+            self._save_index()
+        return entry
+
+    def copy_to(self, entry: CacheEntry, target: Union[str, Path]) -> Path:
+        """将缓存文件复制到目标路径"""
+        target_path = Path(target)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(entry.path, target_path)
+        return target_path
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return bool(self.ttl_seconds) and time.time() - entry.created_at > self.ttl_seconds
+
+    def _evict(self):
+        """淘汰过期条目，再按 LRU 淘汰直至容量达标（调用方持有锁）"""
+        for key in [k for k, e in self._entries.items() if self._expired(e)]:
+            self._remove(key)
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if not entry:
+            return
+        self._total_bytes -= entry.size
+        try:
+            entry.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self):
+        index_path = self.cache_dir / self.INDEX_FILE
+        if not index_path.exists():
+            return
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            raw = json.loads(content) if content else []
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"警告：缓存索引加载失败，将重建 - {e}")
+            return
+        entries = []
+        for item in raw if isinstance(raw, list) else []:
+            try:
+                entry = CacheEntry(
+                    key=item['key'],
+                    path=self.cache_dir / item['file'],
+                    size=int(item['size']),
+                    meta=item.get('meta') or {},
+                    created_at=float(item.get('created_at') or 0.0),
+                    last_access=float(item.get('last_access') or 0.0),
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+            if entry.path.exists():
+                entries.append(entry)
+        for entry in sorted(entries, key=lambda e: e.last_access):
+            self._entries[entry.key] = entry
+            self._total_bytes += entry.size
+
+    def _save_index(self):
+        """原子写入索引（调用方持有锁）"""
+        index_path = self.cache_dir / self.INDEX_FILE
+        tmp_path = index_path.with_suffix('.json.tmp')
+        payload = [
+            {
+                'key': e.key,
+                'file': str(e.path.relative_to(self.cache_dir)),
+                'size': e.size,
+                'meta': e.meta,
+                'created_at': e.created_at,
+                'last_access': e.last_access,
+            }
+            for e in self._entries.values()
+        ]
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+
+_CACHES: Dict[str, ArtifactCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_artifact_cache(
+    name: str,
+    cache_cfg: Optional[Dict[str, Any]] = None,
+    base_dir: Union[str, Path] = "temp/cache",
+) -> Optional[ArtifactCache]:
+    """
+    按名称获取进程内共享的缓存实例
+
+    Args:
+        name: 缓存名称（同时作为子目录名），如 tts / avatar
+        cache_cfg: {enabled, max_mb, ttl_hours}；enabled 为 false 时返回 None
+        base_dir: 缓存根目录
+    """
+    cfg = cache_cfg or {}
+    if not cfg.get('enabled', True):
+        return None
+    cache_dir = Path(base_dir) / name
+    key = str(cache_dir.resolve())
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            ttl_hours = cfg.get('ttl_hours')
+            cache = ArtifactCache(
+                cache_dir,
+                max_bytes=int(float(cfg.get('max_mb', 512)) * 1024 * 1024),
+                ttl_seconds=float(ttl_hours) * 3600 if ttl_hours else None,
+                name=name,
+            )
+            _CACHES[key] = cache
+        return cache
+
+
+__all__ = ["ArtifactCache", "CacheEntry", "get_artifact_cache"]
@@ -0,0 +1,266 @@
+"""
+熔断器 - 按供应商（seedream / minimax / infinitetalk）隔离故障
+
+统计窗口内的可重试失败（ExternalAPIError.is_retryable()、网络错误、超时），
+达到阈值后熔断：后续调用立即失败（或由调度器暂缓出队），不再占用 worker
+等待超时与重试；冷却期结束后进入半开状态，放行少量探测请求，成功则恢复，
+失败则重新熔断。
+
+熔断器只保护「提交预测」这一步：提交成功即说明供应商可用，之后的轮询与下载
+耗时（最长数分钟）既不占用半开探测名额，也不计入失败统计。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, TypeVar
+
+from py.exceptions import ExternalAPIError
+
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 半开且探测名额已满时，调度器重新检查的间隔（秒）
+PROBE_RECHECK_SECONDS = 1.0
+
+
+class CircuitOpenError(ExternalAPIError):
+    """熔断期间的快速失败"""
+
+    def __init__(self, provider: str, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            provider=provider,
+            message=f"{provider} 服务异常已熔断，约 {int(retry_after) + 1} 秒后重试",
+            status_code=503,
+        )
+
+    def is_retryable(self) -> bool:
+        # 熔断本身不应触发调用方的立即重试
+        return False
+
+
+def is_breaker_failure(exc: BaseException) -> bool:
+    """可重试的服务端错误、网络错误（status 0）与超时（408）计为熔断失败"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, ExternalAPIError):
+        return exc.is_retryable() or exc.status_code in (0, 408)
+    return isinstance(exc, TimeoutError)
+
+
+class CircuitBreaker:
+    """单个供应商的熔断器"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        window_seconds: float = 60.0,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        """
+        Args:
+            name: 供应商名
+            failure_threshold: 窗口内失败次数达到该值时熔断
+            window_seconds: 失败统计窗口
+            recovery_timeout: 熔断后多久进入半开状态
+            half_open_max_calls: 半开状态同时放行的探测请求数
+        """
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.window_seconds = window_seconds
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, int(half_open_max_calls))
+        self.lock = threading.Lock()
+        self._state = CLOSED
+        self._failures: Deque[float] = deque()
+        self._opened_at = 0.0
+        self._probes = 0
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            return self._current_state(time.monotonic())
+
+    def retry_after(self) -> float:
+        """熔断剩余秒数；未熔断时为 0"""
+        with self.lock:
+            now = time.monotonic()
+            if self._current_state(now) != OPEN:
+                return 0.0
+            return max(self._opened_at + self.recovery_timeout - now, 0.0)
+
+    def admission_delay(self) -> float:
+        """
+        新调用需要等待的秒数：熔断中为剩余冷却时间；半开且探测名额已满时为
+        PROBE_RECHECK_SECONDS（等探测结果）；其余为 0
+        """
+        with self.lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == OPEN:
+                return max(self._opened_at + self.recovery_timeout - now, 0.0)
+            if state == HALF_OPEN and self._probes >= self.half_open_max_calls:
+                return PROBE_RECHECK_SECONDS
+            return 0.0
+
+    def before_call(self) -> None:
+        """调用前检查；熔断中抛出 CircuitOpenError"""
+        with self.lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._state = HALF_OPEN
+                self._probes += 1
+                return
+            self.rejected += 1
+            remaining = max(self._opened_at + self.recovery_timeout - now, 0.0)
+        raise CircuitOpenError(self.name, remaining)
+
+    def record_success(self) -> None:
+        with self.lock:
+            # 仅在探测成功恢复时清空窗口；闭合状态下的成功不抵消窗口内的失败
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._probes = 0
+                self._failures.clear()
+
+    def record_failure(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._trip(now)
+                return
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window_seconds:
+                self._failures.popleft()
+            if len(self._failures) >= self.failure_threshold:
+                self._trip(now)
+
+    def record_error(self, exc: BaseException) -> None:
+        """按异常类型更新统计：服务端故障计为失败，客户端错误视为服务可达，取消则归还探测名额"""
+        if is_breaker_failure(exc):
+            self.record_failure()
+        elif isinstance(exc, Exception):
+            # 参数错误等客户端错误说明服务可达，不计入失败
+            self.record_success()
+        else:
+            self.release_probe()
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """在熔断保护下执行调用"""
+        self.before_call()
+        try:
+            result = await func()
+        except BaseException as exc:
+            self.record_error(exc)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            return {
+                "state": state,
+                "recent_failures": len(self._failures),
+                "failure_threshold": self.failure_threshold,
+                "retry_after": round(max(self._opened_at + self.recovery_timeout - now, 0.0), 1)
+                if state == OPEN else 0.0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+    def _current_state(self, now: float) -> str:
+        """OPEN 冷却结束后视为 HALF_OPEN（调用方持有锁）"""
+        if self._state == OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _trip(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self._failures.clear()
+        self.trips += 1
+
+    def release_probe(self) -> None:
+        """调用被取消或未实际请求供应商（如命中缓存）时归还半开探测名额"""
+        with self.lock:
+            if self._state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_circuit_breaker(provider: str, cfg: Optional[Dict[str, Any]] = None) -> Optional[CircuitBreaker]:
+    """
+    获取进程内共享的供应商熔断器
+
+    Args:
+        provider: 供应商名
+        cfg: runtime.circuit_breaker 配置 {enabled, failure_threshold, window_seconds,
+            recovery_timeout, half_open_max_calls}；enabled 为 false 时返回 None
+    """
+    cfg = cfg or {}
+    if not cfg.get("enabled", True):
+        return None
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                provider,
+                failure_threshold=int(cfg.get("failure_threshold", 5)),
+                window_seconds=float(cfg.get("window_seconds", 60)),
+                recovery_timeout=float(cfg.get("recovery_timeout", 30)),
+                half_open_max_calls=int(cfg.get("half_open_max_calls", 1)),
+            )
+            _BREAKERS[provider] = breaker
+        return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+def open_circuit_delay(providers: Optional[Iterable[str]] = None) -> float:
+    """
+    调度器暂缓出队的秒数：providers（默认全部供应商）中最长的 admission_delay
+
+    半开状态下探测请求在途时也继续暂缓，避免冷却结束瞬间放出全部排队任务、
+    除探测外其余任务都因 CircuitOpenError 失败。
+
+    Args:
+        providers: 任务会调用的供应商；只有这些供应商熔断时才暂缓该任务
+    """
+    wanted = None if providers is None else set(providers)
+    with _BREAKERS_LOCK:
+        breakers = [b for name, b in _BREAKERS.items() if wanted is None or name in wanted]
+    return max((breaker.admission_delay() for breaker in breakers), default=0.0)
+
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "circuit_breaker_stats",
+    "get_circuit_breaker",
+    "is_breaker_failure",
+    "open_circuit_delay",
+]
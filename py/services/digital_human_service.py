@@ -8,24 +8,39 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
-import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
-import httpx
 
 from py.function.infinitetalk_client import InfiniteTalkClient
 from py.function.task_runner import TaskRequest, TaskRunner
 from py.exceptions import ExternalAPIError
 from py.function.config_loader import load_config, LoadedConfig
+from py.function.rate_limit import get_rate_limiter
+from py.services.artifact_cache import ArtifactCache, get_artifact_cache
+from py.services.circuit_breaker import get_circuit_breaker
+from py.services.downloader import stream_download
+from py.services.finalization_queue import FinalizationQueue, finalization_queue as default_finalization_queue
+from py.services.http_pool import HttpClientPool, http_pool as default_http_pool
+from py.services.io_executor import AsyncStorage
 from py.services.minimax_tts_service import MiniMaxTTSService
+from py.services.prediction_poller import PredictionPoller
 from py.services.storage_service import StorageService
+from py.services.task_log_sink import task_log_sink
 from py.services.task_manager import TaskManager
+from py.services.webhook_hub import WebhookHub, webhook_hub as default_webhook_hub
 
 
 WAVESPEED_BALANCE_URL = "https://api.wavespeed.ai/api/v3/balance"
 
+# TaskRunner 阶段 -> 外部供应商（熔断器按供应商共享）
+STAGE_PROVIDERS = {
+    "avatar": "seedream",
+    "speech": "minimax",
+    "video": "infinitetalk",
+}
+
 
 class DigitalHumanService:
     """数字人生成服务。"""
@@ -37,11 +52,14 @@ class DigitalHumanService:
         storage_service: Optional[StorageService] = None,
         task_manager: Optional[TaskManager] = None,
         loaded_config: Optional[LoadedConfig] = None,
+        http_pool: Optional[HttpClientPool] = None,
+        webhooks: Optional[WebhookHub] = None,
+        finalizer: Optional[FinalizationQueue] = None,
     ):
         self.task_manager = task_manager or TaskManager()
         self.wavespeed_key = wavespeed_key
-        self.voice_client = MiniMaxTTSService(minimax_key)
-        self.infinitetalk_client = InfiniteTalkClient(wavespeed_key)
+        self.http = http_pool or default_http_pool
+        self.webhooks = webhooks or default_webhook_hub
         self.logger = logging.getLogger("DigitalHumanService")
         self.loaded_config = loaded_config
         if self.loaded_config is None:
@@ -50,6 +68,18 @@ class DigitalHumanService:
             except Exception as exc:  # noqa: BLE001
                 self.logger.warning("加载 config.yaml 失败：%s", exc)
                 self.loaded_config = None
+        polling_cfg = (self.loaded_config.runtime if self.loaded_config else {}).get("polling")
+        self.poller = PredictionPoller(self.http, polling_cfg)
+        rate_limits = self.loaded_config.rate_limits if self.loaded_config else {}
+        self.image_limiter = get_rate_limiter("seedream", wavespeed_key, rate_limits)
+        self.avatar_cache = self._artifact_cache("avatar")
+        self.infinitetalk_client = InfiniteTalkClient(
+            wavespeed_key,
+            http_pool=self.http,
+            polling_cfg=polling_cfg,
+            webhooks=self.webhooks,
+            rate_limits=rate_limits,
+        )
         if storage_service:
             self.storage = storage_service
         else:
@@ -66,7 +96,19 @@ class DigitalHumanService:
                 final_video_name=storage_cfg.get("final_video_name", os.getenv("DIGITAL_HUMAN_FINAL_VIDEO_NAME", "digital_human.mp4")),
                 task_dir_pattern=storage_cfg.get("task_dir_pattern", os.getenv("DIGITAL_HUMAN_TASK_DIR_PATTERN", "ren_%m%d%H%M")),
                 video_mirror_targets=storage_cfg.get("video_mirrors"),
+                link_methods=storage_cfg.get("link_methods"),
+                log_sink=task_log_sink,
             )
+        self.storage_io = AsyncStorage(self.storage)
+        self.voice_client = MiniMaxTTSService(
+            minimax_key,
+            cache=self._artifact_cache("tts"),
+            http_pool=self.http,
+            polling_cfg=polling_cfg,
+            webhooks=self.webhooks,
+            rate_limits=rate_limits,
+            publisher=self.storage_io,
+        )
 
         # avatar_client 默认指向自身（以便测试 mock generate_images）
         self.avatar_client = self
@@ -74,6 +116,13 @@ class DigitalHumanService:
         async def upload_handler(task_id: str, upload_path: Optional[str], target_path: Path) -> str:
             return await self._handle_avatar_upload(task_id, upload_path, target_path)
 
+        workflow_cfg = self.loaded_config.workflow if self.loaded_config else {}
+        runner_cfg = (workflow_cfg or {}).get("task_runner") or {}
+        finalization_cfg = runner_cfg.get("finalization") or {}
+        # 发布与余额对账默认在任务完成后由收尾队列异步执行
+        self.finalizer = finalizer or (
+            default_finalization_queue if finalization_cfg.get("background", True) else None
+        )
         self.task_runner = TaskRunner(
             avatar_client=self.avatar_client,
             voice_client=self.voice_client,
@@ -83,16 +132,56 @@ class DigitalHumanService:
             avatar_upload_handler=upload_handler,
             logger=logging.getLogger("TaskRunner"),
             config_hash=self.loaded_config.config_hash if self.loaded_config else None,
+            parallel_assets=bool(runner_cfg.get("parallel_assets", True)),
+            stage_policies=runner_cfg.get("stages"),
+            circuit_breakers=self._circuit_breakers(),
+            finalizer=self.finalizer,
         )
 
+    def _circuit_breakers(self) -> Dict[str, Any]:
+        """按 runtime.circuit_breaker 配置获取各阶段供应商的熔断器。"""
+        runtime_cfg = self.loaded_config.runtime if self.loaded_config else {}
+        breaker_cfg = (runtime_cfg or {}).get("circuit_breaker") or {}
+        breakers = {}
+        for stage, provider in STAGE_PROVIDERS.items():
+            breaker = get_circuit_breaker(provider, breaker_cfg)
+            if breaker is not None:
+                breakers[stage] = breaker
+        return breakers
+
+    def _artifact_cache(self, name: str) -> Optional[ArtifactCache]:
+        """按 storage.cache 配置获取共享产物缓存；未配置时不启用。"""
+        storage_cfg = self.loaded_config.storage if self.loaded_config else {}
+        cache_cfg = (storage_cfg or {}).get("cache") or {}
+        if name not in cache_cfg:
+            return None
+        try:
+            return get_artifact_cache(
+                name,
+                cache_cfg.get(name),
+                base_dir=cache_cfg.get("dir") or "temp/cache",
+            )
+        except OSError as exc:
+            self.logger.warning("初始化 %s 缓存失败：%s", name, exc)
+            return None
+
     async def generate_images(
         self,
         prompts: list,
         resolution: str = "1024x1024",
         num_images: int = 1,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+        resume_prediction: Optional[Dict[str, Any]] = None,
         **kwargs,
     ) -> list:
-        """调用 Seedream 生成头像，返回包含 URL/尺寸的字典列表。"""
+        """
+        调用 Seedream 生成头像，返回包含 URL/尺寸的字典列表。
+
+        on_submitted 在拿到预测轮询地址后立即回调；提交响应直接带回结果时以空字典回调，
+        告知调用方供应商已应答（熔断器据此记成功）。resume_prediction 含 poll_url 时
+        直接续接轮询之前提交的预测，不再重新提交。
+        单张生成时先查头像缓存，命中则直接返回已发布的 URL，不请求 Seedream。
+        """
         width, height = map(int, resolution.lower().split("x"))
         payload = {
             "prompt": prompts[0] if prompts else "",
@@ -103,16 +192,47 @@ class DigitalHumanService:
             "guidance_scale": 4.5,
         }
 
+        cache_key = None
+        if self.avatar_cache is not None and num_images == 1 and not resume_prediction:
+            cache_key = self._avatar_cache_key(payload)
+            entry = self.avatar_cache.get(cache_key)
+            if entry and entry.meta.get("url"):
+                return [{
+                    "url": entry.meta["url"],
+                    "width": width,
+                    "height": height,
+                    "path": str(entry.path),
+                    "cache_hit": True,
+                }]
+
+        if resume_prediction and resume_prediction.get("poll_url"):
+            final_data = await self._poll_wavespeed_prediction(
+                resume_prediction["poll_url"], provider="seedream"
+            )
+            image_url = self._extract_output_url(final_data, key="image_url")
+            if not image_url:
+                raise ExternalAPIError(
+                    provider="seedream",
+                    status_code=200,
+                    message="Seedream 未返回 image_url",
+                    response_data=final_data,
+                )
+            return [{"url": image_url, "width": width, "height": height}]
+
         headers = {
             "Authorization": f"Bearer {self.wavespeed_key}",
             "Content-Type": "application/json",
         }
 
-        async with httpx.AsyncClient(timeout=120) as client:
+        webhook_token = self.webhooks.new_token()
+        if self.image_limiter:
+            await self.image_limiter.acquire()
+        async with self.http.client(timeout=120) as client:
             response = await client.post(
                 "https://api.wavespeed.ai/api/v3/bytedance/seedream-v4",
                 json=payload,
                 headers=headers,
+                params=self.webhooks.submit_params(webhook_token),
             )
             if not response.is_success:
                 raise ExternalAPIError(
@@ -125,6 +245,9 @@ class DigitalHumanService:
             data = self._unwrap_wavespeed_result(raw)
 
             image_url = self._extract_output_url(data, key="image_url")
+            if image_url and on_submitted:
+                # 同步返回结果：没有预测 ID，只告知调用方供应商已应答
+                on_submitted({})
             if not image_url:
                 poll_url = (data.get("urls") or {}).get("get") or data.get("result_url")
                 if not poll_url:
@@ -134,8 +257,12 @@ class DigitalHumanService:
                         message="Seedream 响应缺少 image_url",
                         response_data=raw,
                     )
+                if on_submitted:
+                    on_submitted({"provider_task_id": data.get("id"), "poll_url": poll_url})
                 final_data = await self._poll_wavespeed_prediction(
-                    poll_url, provider="seedream"
+                    poll_url,
+                    provider="seedream",
+                    webhook=self.webhooks.register(data.get("id"), webhook_token),
                 )
                 image_url = self._extract_output_url(final_data, key="image_url")
             if not image_url:
@@ -145,7 +272,45 @@ class DigitalHumanService:
                     message="Seedream 未返回 image_url",
                     response_data=raw,
                 )
-            return [{"url": image_url, "width": width, "height": height}]
+        if cache_key:
+            image_url = await self._cache_avatar(cache_key, image_url)
+        return [{"url": image_url, "width": width, "height": height}]
+
+    @staticmethod
+    def _avatar_cache_key(payload: Dict[str, Any]) -> str:
+        """头像缓存 key：规范化提示词 + 分辨率与生成参数"""
+        prompt = " ".join(str(payload.get("prompt") or "").split())
+        return ArtifactCache.make_key(model="bytedance/seedream-v4", **{**payload, "prompt": prompt})
+
+    async def _cache_avatar(self, cache_key: str, image_url: str) -> str:
+        """
+        下载生成的头像写入缓存，并发布到公共目录获得长期有效的 URL。
+
+        缓存失败不影响主流程，返回可用的头像 URL（优先已发布 URL）。
+        """
+        tmp_path = self.avatar_cache.cache_dir / f".{cache_key}.download.png"
+        try:
+            await stream_download(
+                self.http, image_url, tmp_path, provider="wavespeed", label="头像", timeout=60,
+            )
+            public_url = None
+            try:
+                publish_info = await self.storage_io.publish_task_asset(
+                    "avatar-cache", tmp_path, asset_dir="cache", filename=f"{cache_key}.png"
+                )
+                public_url = (publish_info or {}).get("url")
+            except (OSError, PermissionError) as exc:
+                self.logger.warning("发布缓存头像失败：%s", exc)
+            self.avatar_cache.put(cache_key, tmp_path, {
+                "url": public_url or image_url,
+                "provider_url": image_url,
+            })
+            return public_url or image_url
+        except (ExternalAPIError, OSError) as exc:
+            self.logger.warning("写入头像缓存失败：%s", exc)
+            return image_url
+        finally:
+            tmp_path.unlink(missing_ok=True)
 
     async def generate_digital_human(
         self,
@@ -162,8 +327,9 @@ class DigitalHumanService:
         seed: int = 42,
         mask_image: Optional[str] = None,
         character: Optional[Dict[str, Any]] = None,
+        resume: bool = False,
     ) -> Dict:
-        """公开的数字人生成入口，返回最新的 task.json 数据。"""
+        """公开的数字人生成入口，返回最新的 task.json 数据。resume=True 时从断点继续。"""
         request = TaskRequest(
             avatar_mode=avatar_mode,
             avatar_prompt=avatar_prompt,
@@ -178,17 +344,45 @@ class DigitalHumanService:
             mask_image=mask_image,
             character=character,
         )
+        if resume:
+            # 已完成的任务不重跑、不重新对账
+            finished = await self.task_runner.finished_result(job_id)
+            if finished is not None:
+                return finished
         before_balance = await self._safe_fetch_balance(job_id, phase="before")
 
         try:
-            result = await self.task_runner.run(job_id, request)
+            result = await self.task_runner.run(job_id, request, resume=resume)
         except Exception:
-            after_balance = await self._safe_fetch_balance(job_id, phase="after")
-            self._finalize_billing(job_id, before_balance, after_balance)
+            await self._schedule_billing(job_id, before_balance)
             raise
 
+        if self.finalizer is not None:
+            await self._schedule_billing(job_id, before_balance)
+            return result
         after_balance = await self._safe_fetch_balance(job_id, phase="after")
-        return self._finalize_billing(job_id, before_balance, after_balance, base_record=result)
+        return await self._finalize_billing(job_id, before_balance, after_balance, base_record=result)
+
+    async def _schedule_billing(self, job_id: str, before_balance: Optional[float]) -> None:
+        """任务结束后的余额对账：有收尾队列时异步执行，否则立即执行。"""
+        async def reconcile() -> None:
+            after_balance = await self._safe_fetch_balance(job_id, phase="after")
+            await self._finalize_billing(job_id, before_balance, after_balance, reconcile_state="completed")
+            self.storage.close_log(job_id)
+
+        if self.finalizer is None:
+            await reconcile()
+            return
+        # 对账状态先落盘：进程在对账完成前退出时，启动扫描据此发现未完成的对账
+        await self._apply_billing_updates(
+            job_id, {"balance_before": before_balance}, reconcile_state="pending"
+        )
+        self.finalizer.submit(
+            job_id,
+            "billing",
+            reconcile,
+            on_failure=lambda exc: self._apply_billing_updates(job_id, {}, reconcile_state="failed"),
+        )
 
     async def _handle_avatar_upload(
         self,
@@ -202,43 +396,27 @@ class DigitalHumanService:
 
         source_path = Path(upload_path)
         if source_path.exists():
-            self.storage.copy_into_task(source_path, target_path)
-            return self._publish_avatar_asset(task_id, target_path)
+            await self.storage_io.copy_into_task(source_path, target_path)
+            return await self._publish_avatar_asset(task_id, target_path)
 
         if upload_path.startswith(("http://", "https://")):
-            try:
-                async with httpx.AsyncClient(timeout=60) as client:
-                    response = await client.get(upload_path)
-                if not response.is_success:
-                    raise ExternalAPIError(
-                        provider="avatar_upload",
-                        status_code=response.status_code,
-                        message=f"下载头像失败: {upload_path}",
-                    )
-            except httpx.TimeoutException as exc:
-                raise ExternalAPIError(
-                    provider="avatar_upload",
-                    status_code=408,
-                    message="下载头像超时",
-                ) from exc
-            except httpx.RequestError as exc:
-                raise ExternalAPIError(
-                    provider="avatar_upload",
-                    status_code=0,
-                    message=f"下载头像网络错误: {exc}",
-                ) from exc
-
-            target_path.parent.mkdir(parents=True, exist_ok=True)
-            target_path.write_bytes(response.content)
-            return self._publish_avatar_asset(task_id, target_path)
+            await stream_download(
+                self.http,
+                upload_path,
+                target_path,
+                provider="avatar_upload",
+                label="头像",
+                timeout=60,
+            )
+            return await self._publish_avatar_asset(task_id, target_path)
 
         raise FileNotFoundError(f"头像文件不存在: {upload_path}")
 
-    def _publish_avatar_asset(self, task_id: str, local_path: Path) -> str:
+    async def _publish_avatar_asset(self, task_id: str, local_path: Path) -> str:
         """复制头像到 /mnt/www/output/<task_id>/ 并返回公网 URL。"""
         publish_info = None
         try:
-            publish_info = self.storage.publish_task_asset(
+            publish_info = await self.storage_io.publish_task_asset(
                 task_id, local_path, asset_dir="output", filename="avatar.png"
             )
         except PermissionError:
@@ -299,7 +477,7 @@ class DigitalHumanService:
             return None
 
         headers = {"Authorization": f"Bearer {self.wavespeed_key}"}
-        async with httpx.AsyncClient(timeout=timeout) as client:
+        async with self.http.client(timeout=timeout) as client:
             response = await client.get(WAVESPEED_BALANCE_URL, headers=headers)
         response.raise_for_status()
         payload = response.json()
@@ -328,14 +506,15 @@ class DigitalHumanService:
                     continue
         return None
 
-    def _finalize_billing(
+    async def _finalize_billing(
         self,
         job_id: str,
         before_balance: Optional[float],
         after_balance: Optional[float],
         base_record: Optional[Dict[str, Any]] = None,
+        reconcile_state: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """写入余额快照以及实际花费。"""
+        """写入余额快照以及实际花费；reconcile_state 记录后台对账进度。"""
         updates: Dict[str, Optional[float]] = {}
         if before_balance is not None:
             updates["balance_before"] = before_balance
@@ -349,10 +528,10 @@ class DigitalHumanService:
                 actual_cost = 0.0
             updates["actual_cost"] = actual_cost
 
-        if not updates:
-            return base_record or self.storage.load_metadata(job_id)
+        if not updates and reconcile_state is None:
+            return base_record or await self.storage_io.load_metadata(job_id)
 
-        record = self._apply_billing_updates(job_id, base_record, updates)
+        record = await self._apply_billing_updates(job_id, updates, reconcile_state)
         if actual_cost is not None:
             before_text = f"{before_balance:.4f}" if before_balance is not None else "?"
             after_text = f"{after_balance:.4f}" if after_balance is not None else "?"
@@ -362,31 +541,33 @@ class DigitalHumanService:
             )
         return record
 
-    def _apply_billing_updates(
+    async def _apply_billing_updates(
         self,
         job_id: str,
-        base_record: Optional[Dict[str, Any]],
         updates: Dict[str, Optional[float]],
+        reconcile_state: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """合并计费信息并回写 task.json。"""
-        record = dict(base_record or self.storage.load_metadata(job_id))
-        if not record:
-            record = {"job_id": job_id}
-        billing = dict(record.get("billing") or {})
-        billing.setdefault("currency", "USD")
-
-        for key, value in updates.items():
-            if value is not None:
-                billing[key] = value
-        billing["updated_at"] = datetime.now(timezone.utc).isoformat()
-        record["billing"] = billing
-
-        actual_cost = updates.get("actual_cost")
-        if actual_cost is not None:
-            record["cost"] = actual_cost
+        """在任务写锁内合并计费信息并回写 task.json（与收尾发布互不覆盖）。"""
 
-        self.storage.save_metadata(job_id, record)
-        return record
+        def apply(record: Dict[str, Any]) -> Dict[str, Any]:
+            record = record or {"job_id": job_id}
+            billing = dict(record.get("billing") or {})
+            billing.setdefault("currency", "USD")
+
+            for key, value in updates.items():
+                if value is not None:
+                    billing[key] = value
+            if reconcile_state is not None:
+                billing["reconcile_state"] = reconcile_state
+            billing["updated_at"] = datetime.now(timezone.utc).isoformat()
+            record["billing"] = billing
+
+            actual_cost = updates.get("actual_cost")
+            if actual_cost is not None:
+                record["cost"] = actual_cost
+            return record
+
+        return await self.storage_io.update_metadata(job_id, apply)
 
     @staticmethod
     def _unwrap_wavespeed_result(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -412,47 +593,15 @@ class DigitalHumanService:
         self,
         poll_url: str,
         provider: str,
+        webhook: Optional[asyncio.Future] = None,
     ) -> Dict[str, Any]:
-        """轮询 WaveSpeed 预测结果。"""
+        """轮询 WaveSpeed 预测结果；提供 webhook future 时回调到达即返回。"""
         headers = {"Authorization": f"Bearer {self.wavespeed_key}"}
-        start = time.time()
-        async with httpx.AsyncClient(timeout=30) as client:
-            while time.time() - start < 300:
-                try:
-                    response = await client.get(poll_url, headers=headers)
-                except httpx.TimeoutException:
-                    await asyncio.sleep(3)
-                    continue
-                except httpx.RequestError as exc:
-                    raise ExternalAPIError(
-                        provider=provider,
-                        status_code=0,
-                        message=f"轮询 {provider} 任务失败: {exc}",
-                    ) from exc
-
-                if not response.is_success:
-                    raise ExternalAPIError.from_response(
-                        provider=provider,
-                        response=response,
-                        message=f"轮询 {provider} 任务失败",
-                    )
-
-                data = self._unwrap_wavespeed_result(response.json())
-                status = data.get("status")
-                if status in {"completed", "succeeded"}:
-                    return data
-                if status == "failed":
-                    raise ExternalAPIError(
-                        provider=provider,
-                        status_code=200,
-                        message=f"{provider} 任务失败: {data.get('error', 'unknown error')}",
-                        response_data=data,
-                    )
-                await asyncio.sleep(3)
-
-        raise ExternalAPIError(
+        return await self.poller.poll(
+            poll_url,
             provider=provider,
-            status_code=408,
-            message="轮询 WaveSpeed 任务超时",
-            response_data={"url": poll_url},
+            kind="image",
+            headers=headers,
+            unwrap=self._unwrap_wavespeed_result,
+            webhook=webhook,
         )
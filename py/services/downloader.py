@@ -0,0 +1,169 @@
+"""
+流式下载 - 分块写入临时文件，断线后按 HTTP Range 续传，校验后原子替换
+
+替代 response.content + write_bytes：峰值内存与文件大小无关，
+产物直接写到任务目录的最终路径（同目录 .part 临时文件 + os.replace），
+不会留下半截文件，也无需再从中间目录复制一次。
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+from py.exceptions import ExternalAPIError
+
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+def _part_path(target: Path) -> Path:
+    return target.with_name(f".{target.name}.part")
+
+
+def _total_size(response: httpx.Response) -> Optional[int]:
+    """响应对应的完整文件大小；未知时返回 None"""
+    if response.status_code == 206:
+        match = _CONTENT_RANGE.match(response.headers.get("content-range", ""))
+        if match and match.group(3) != "*":
+            return int(match.group(3))
+        return None
+    length = response.headers.get("content-length")
+    return int(length) if length and length.isdigit() else None
+
+
+async def stream_download(
+    http: Any,
+    url: str,
+    target: Path,
+    *,
+    provider: str,
+    label: str = "文件",
+    timeout: float = 120,
+    max_attempts: int = 3,
+    backoff_seconds: float = 1.0,
+    expected_size: Optional[int] = None,
+    expected_sha256: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    流式下载到 target
+
+    Args:
+        http: HttpClientPool（提供 client(timeout=...) 异步上下文）
+        url: 下载地址
+        target: 最终文件路径
+        provider: 出错时 ExternalAPIError 的 provider
+        label: 错误信息中的资源名称（如 "Infinitetalk 视频"）
+        max_attempts: 网络中断 / 内容不完整时的最大尝试次数（续传）
+        expected_size: 期望字节数；未提供时以 Content-Length / Content-Range 为准
+        expected_sha256: 期望的 SHA-256（十六进制）
+
+    Returns:
+        {"path", "size", "sha256", "resumed"}
+
+    Raises:
+        ExternalAPIError: HTTP 错误、超时、网络错误或校验失败
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    part = _part_path(target)
+    part.unlink(missing_ok=True)
+    # 临时文件只包含本次写入的数据，摘要随写入增量计算，续传时无需重读
+    digest = hashlib.sha256()
+    resumed = 0
+    last_exc: Optional[Exception] = None
+
+    for attempt in range(1, max(1, max_attempts) + 1):
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            async with http.client(timeout=timeout) as client:
+                async with client.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 416 and offset:
+                        # 服务端不接受续传位置：丢弃临时文件从头下载
+                        part.unlink(missing_ok=True)
+                        digest = hashlib.sha256()
+                        continue
+                    if not response.is_success:
+                        raise ExternalAPIError(
+                            provider=provider,
+                            message=f"下载{label}失败: {url}",
+                            status_code=response.status_code,
+                        )
+                    if response.status_code != 206 and offset:
+                        # 服务端忽略了 Range，返回完整内容
+                        offset = 0
+                        digest = hashlib.sha256()
+                    elif offset:
+                        resumed += 1
+                    total = _total_size(response) or expected_size
+                    with open(part, "ab" if offset else "wb") as f:
+                        # 按网络到达的分块写入，断线前收到的数据都已落盘，可续传
+                        async for chunk in response.aiter_bytes():
+                            f.write(chunk)
+                            digest.update(chunk)
+            size = part.stat().st_size
+            if total is not None and size < total:
+                raise httpx.ReadError(f"内容不完整: {size}/{total} 字节")
+        except ExternalAPIError:
+            part.unlink(missing_ok=True)
+            raise
+        except httpx.HTTPError as exc:
+            last_exc = exc
+            if attempt < max_attempts:
+                if backoff_seconds:
+                    await asyncio.sleep(backoff_seconds * attempt)
+                continue
+            part.unlink(missing_ok=True)
+            if isinstance(exc, httpx.TimeoutException):
+                raise ExternalAPIError(
+                    provider=provider,
+                    message=f"下载{label}超时",
+                    status_code=408,
+                    original_exception=exc,
+                ) from exc
+            raise ExternalAPIError(
+                provider=provider,
+                message=f"下载{label}网络错误: {exc}",
+                status_code=0,
+                original_exception=exc,
+            ) from exc
+        except OSError as exc:
+            part.unlink(missing_ok=True)
+            raise ExternalAPIError(
+                provider=provider,
+                message=f"保存{label}失败: {exc}",
+                status_code=0,
+                original_exception=exc,
+            ) from exc
+        break
+    else:
+        part.unlink(missing_ok=True)
+        raise ExternalAPIError(
+            provider=provider,
+            message=f"下载{label}失败: {last_exc or url}",
+            status_code=0,
+            original_exception=last_exc,
+        )
+
+    size = part.stat().st_size
+    sha256 = digest.hexdigest()
+    if (expected_size is not None and size != expected_size) or (
+        expected_sha256 and sha256 != expected_sha256.lower()
+    ):
+        part.unlink(missing_ok=True)
+        raise ExternalAPIError(
+            provider=provider,
+            message=f"下载{label}校验失败: {url}",
+            status_code=0,
+            response_data={"size": size, "sha256": sha256},
+        )
+    os.replace(part, target)
+    return {"path": target, "size": size, "sha256": sha256, "resumed": resumed}
+
+
+__all__ = ["stream_download"]
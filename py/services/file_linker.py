@@ -0,0 +1,121 @@
+"""
+零拷贝发布 - 按 hardlink → reflink → copy_file_range → copy 的顺序放置文件
+
+发布目录与任务目录通常在同一文件系统（/mnt/www），硬链接只需一次元数据操作；
+跨设备时依次尝试写时复制克隆（FICLONE，btrfs/xfs）、内核态拷贝
+（copy_file_range / sendfile），最后才退回 shutil.copy2。
+目标先以临时名创建再原子替换，已存在的发布文件不会被截断或写坏。
+
+注意：硬链接与源文件共享 inode，源文件只能以「写新文件 + rename」的方式更新
+（任务产物与下载均如此），不能原地改写。
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+from uuid import uuid4
+
+
+logger = logging.getLogger(__name__)
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+DEFAULT_METHODS = ("hardlink", "reflink", "copy_file_range", "copy")
+
+
+def _hardlink(source: Path, destination: Path) -> None:
+    os.link(source, destination)
+
+
+def _reflink(source: Path, destination: Path) -> None:
+    if not sys.platform.startswith("linux"):
+        raise OSError("reflink 仅支持 Linux")
+    import fcntl
+
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, destination)
+
+
+def _copy_file_range(source: Path, destination: Path) -> None:
+    copy_range = getattr(os, "copy_file_range", None)
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            if copy_range is not None:
+                sent = copy_range(src.fileno(), dst.fileno(), remaining)
+            else:
+                sent = os.sendfile(dst.fileno(), src.fileno(), None, remaining)
+            if sent == 0:
+                break
+            remaining -= sent
+    if remaining > 0:
+        raise OSError(f"内核拷贝提前结束，剩余 {remaining} 字节")
+    shutil.copystat(source, destination)
+
+
+def _copy(source: Path, destination: Path) -> None:
+    shutil.copy2(source, destination)
+
+
+_METHODS: Dict[str, Callable[[Path, Path], None]] = {
+    "hardlink": _hardlink,
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+    "copy": _copy,
+}
+
+
+def link_or_copy(
+    source: Path,
+    destination: Path,
+    methods: Optional[Iterable[str]] = None,
+) -> str:
+    """
+    将 source 放置到 destination，返回实际使用的方式
+
+    Args:
+        source: 源文件
+        destination: 目标路径（已存在时被原子替换）
+        methods: 依次尝试的方式，默认 DEFAULT_METHODS；无论是否列出，最后总会退回 copy
+
+    Returns:
+        "hardlink" / "reflink" / "copy_file_range" / "copy"
+
+    Raises:
+        FileNotFoundError: 源文件不存在
+        OSError: 所有方式均失败
+    """
+    source = Path(source)
+    destination = Path(destination)
+    if not source.is_file():
+        raise FileNotFoundError(source)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    candidates = [m for m in (methods or DEFAULT_METHODS) if m in _METHODS]
+    if "copy" not in candidates:
+        candidates.append("copy")
+    tmp_path = destination.with_name(f".{destination.name}.{uuid4().hex[:8]}.tmp")
+    try:
+        for method in candidates:
+            try:
+                _METHODS[method](source, tmp_path)
+            except OSError as exc:
+                tmp_path.unlink(missing_ok=True)
+                if method == "copy":
+                    raise
+                logger.debug("%s 放置 %s 失败，尝试下一种方式: %s", method, destination, exc)
+                continue
+            os.replace(tmp_path, destination)
+            return method
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    raise OSError(f"无法放置文件: {destination}")
+
+
+__all__ = ["DEFAULT_METHODS", "link_or_copy"]
@@ -0,0 +1,159 @@
+"""
+收尾队列 - 把发布、镜像复制与余额对账移出任务关键路径
+
+视频生成完成、有可播放的 URL（供应商 URL 或本地 URL）后任务即标记为 finished；
+复制到公共目录 / 镜像、任务结束后的余额查询等收尾工作交给后台队列，
+按有限并发执行、失败按指数退避重试，完成后回写 task.json。
+慢速挂载盘（/mnt/www）或余额接口抖动不再拖慢用户可见的完成时间。
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+
+FinalizeStep = Callable[[], Awaitable[Any]]
+FailureHandler = Callable[[Exception], Optional[Awaitable[None]]]
+
+
+class FinalizationQueue:
+    """有界并发的后台收尾任务队列"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 2,
+        max_attempts: int = 3,
+        backoff_seconds: float = 5.0,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            max_concurrency: 同时执行的收尾任务数
+            max_attempts: 每个收尾任务的最大尝试次数
+            backoff_seconds: 重试退避起点（逐次翻倍）
+        """
+        self.logger = logger or logging.getLogger("FinalizationQueue")
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_seconds = backoff_seconds
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def configure(self, cfg: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Args:
+            cfg: workflow.task_runner.finalization 配置 {max_concurrency, max_attempts, backoff_seconds}
+        """
+        cfg = cfg or {}
+        self.max_concurrency = max(1, int(cfg.get("max_concurrency", self.max_concurrency)))
+        self.max_attempts = max(1, int(cfg.get("max_attempts", self.max_attempts)))
+        self.backoff_seconds = float(cfg.get("backoff_seconds", self.backoff_seconds))
+        self._semaphore = None
+
+    def submit(
+        self,
+        job_id: str,
+        name: str,
+        step: FinalizeStep,
+        on_failure: Optional[FailureHandler] = None,
+    ) -> asyncio.Task:
+        """
+        提交收尾任务（需在事件循环中调用）
+
+        Args:
+            job_id: 所属任务 ID（用于日志）
+            name: 收尾步骤名，如 "publish" / "billing"
+            step: 无参协程函数，每次重试重新调用
+            on_failure: 重试耗尽后以最后一次异常调用（可为协程函数）
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = None
+        task = loop.create_task(
+            self._run(job_id, name, step, on_failure),
+            name=f"finalize-{name}-{job_id}",
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的收尾任务完成；超时返回 False"""
+        pending = [task for task in self._tasks if not task.done()]
+        if not pending:
+            return True
+        done, not_done = await asyncio.wait(pending, timeout=timeout)
+        return not not_done
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """应用关闭时调用：在 timeout 内等待收尾完成，其余取消。"""
+        if await self.drain(timeout):
+            return
+        pending = [task for task in self._tasks if not task.done()]
+        self.logger.warning("关闭时仍有 %d 个收尾任务未完成，已取消", len(pending))
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": sum(1 for task in self._tasks if not task.done()),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def _run(
+        self,
+        job_id: str,
+        name: str,
+        step: FinalizeStep,
+        on_failure: Optional[FailureHandler],
+    ) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.running += 1
+            try:
+                for attempt in range(1, self.max_attempts + 1):
+                    try:
+                        await step()
+                    except Exception as exc:  # noqa: BLE001
+                        if attempt < self.max_attempts:
+                            self.retried += 1
+                            delay = self.backoff_seconds * (2 ** (attempt - 1))
+                            self.logger.warning(
+                                "任务 %s 收尾步骤 %s 失败（第 %d 次），%.1f 秒后重试: %s",
+                                job_id, name, attempt, delay, exc,
+                            )
+                            await asyncio.sleep(delay)
+                            continue
+                        self.failed += 1
+                        self.logger.error("任务 %s 收尾步骤 %s 最终失败: %s", job_id, name, exc)
+                        if on_failure:
+                            try:
+                                outcome = on_failure(exc)
+                                if inspect.isawaitable(outcome):
+                                    await outcome
+                            except Exception as hook_exc:  # noqa: BLE001
+                                self.logger.error("收尾失败回调异常: %s", hook_exc)
+                        return
+                    self.completed += 1
+                    return
+            finally:
+                self.running -= 1
+
+
+finalization_queue = FinalizationQueue()
+
+
+__all__ = ["FinalizationQueue", "finalization_queue"]
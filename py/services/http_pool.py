@@ -0,0 +1,137 @@
+"""
+共享 HTTP 连接池 - 应用级 httpx.AsyncClient，复用 keep-alive / HTTP/2 连接
+
+WaveSpeed 提交、轮询、下载都指向少数几个主机，每次新建 AsyncClient
+都要重新 DNS + TCP + TLS 握手。应用启动时创建一个共享客户端，关闭时释放；
+未启动（脚本、单元测试）时 client() 退化为按次创建的临时客户端，行为不变。
+"""
+from __future__ import annotations
+
+import importlib.util
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+
+class _PooledClient:
+    """共享客户端的轻量代理：为每个请求补上调用方声明的超时。"""
+
+    def __init__(self, client: httpx.AsyncClient, timeout: Optional[float]):
+        self._client = client
+        self._timeout = timeout
+
+    def _with_timeout(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self._timeout is not None:
+            kwargs.setdefault("timeout", self._timeout)
+        return kwargs
+
+    async def get(self, url, **kwargs) -> httpx.Response:
+        return await self._client.get(url, **self._with_timeout(kwargs))
+
+    async def post(self, url, **kwargs) -> httpx.Response:
+        return await self._client.post(url, **self._with_timeout(kwargs))
+
+    async def request(self, method: str, url, **kwargs) -> httpx.Response:
+        return await self._client.request(method, url, **self._with_timeout(kwargs))
+
+    def stream(self, method: str, url, **kwargs):
+        return self._client.stream(method, url, **self._with_timeout(kwargs))
+
+
+class HttpClientPool:
+    """应用级 HTTP 连接池"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger("HttpClientPool")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2 = False
+        self._limits: Dict[str, Any] = {}
+        self.requests = 0
+        self.fallback_clients = 0
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    async def start(
+        self,
+        pool_cfg: Optional[Dict[str, Any]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        """
+        创建共享客户端（幂等）
+
+        Args:
+            pool_cfg: {http2, max_connections, max_keepalive_connections,
+                keepalive_expiry, connect_timeout}
+            transport: 自定义传输层（测试用）
+        """
+        if self.started:
+            return
+        cfg = pool_cfg or {}
+        http2 = bool(cfg.get("http2", True))
+        if http2 and importlib.util.find_spec("h2") is None:
+            self.logger.warning("未安装 h2，HTTP 连接池退回 HTTP/1.1（pip install 'httpx[http2]'）")
+            http2 = False
+        self._limits = {
+            "max_connections": int(cfg.get("max_connections", 100)),
+            "max_keepalive_connections": int(cfg.get("max_keepalive_connections", 20)),
+            "keepalive_expiry": float(cfg.get("keepalive_expiry", 30)),
+        }
+        self._http2 = http2
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(**self._limits),
+            timeout=httpx.Timeout(60.0, connect=float(cfg.get("connect_timeout", 10))),
+            event_hooks={"request": [self._on_request]},
+            transport=transport,
+        )
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def client(self, timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        """
+        获取 HTTP 客户端
+
+        已启动时返回共享连接池的代理（退出上下文不关闭连接）；
+        否则创建临时 AsyncClient，退出时关闭。
+        """
+        if self.started:
+            yield _PooledClient(self._client, timeout)
+            return
+        self.fallback_clients += 1
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            yield client
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池统计（连接数来自 httpcore 内部状态，取不到时为 None）"""
+        connections = idle = None
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        if pool is not None and hasattr(pool, "connections"):
+            conns = list(pool.connections)
+            connections = len(conns)
+            idle = sum(1 for conn in conns if conn.is_idle())
+        return {
+            "started": self.started,
+            "http2": self._http2,
+            "limits": dict(self._limits),
+            "requests": self.requests,
+            "connections": connections,
+            "idle_connections": idle,
+            "fallback_clients": self.fallback_clients,
+        }
+
+    async def _on_request(self, _request: httpx.Request) -> None:
+        self.requests += 1
+
+
+http_pool = HttpClientPool()
+
+
+__all__ = ["HttpClientPool", "http_pool"]
@@ -0,0 +1,237 @@
+"""
+文件 I/O 线程池 - 把阻塞的文件系统操作移出事件循环
+
+task.json 读写、日志追加、发布复制、历史目录扫描与角色库 JSON 读写都是同步调用，
+在 /mnt/www 这类网络挂载盘上单次可能耗时数百毫秒，直接在协程中调用会卡住
+所有并发请求。IOExecutor 用有界线程池执行这些操作，并按操作名统计耗时；
+AsyncStorage / AsyncHistory / AsyncCharacters 为对应服务提供同名的 async 方法；
+AsyncStorage 另按任务提供 task.json 写锁，运行器、收尾发布与余额对账的读-改-写互不覆盖。
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class _OpStats:
+    """单个操作的耗时统计"""
+
+    __slots__ = ("calls", "errors", "total_ms", "max_ms", "wait_ms")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.wait_ms = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / calls, 2),
+            "max_ms": round(self.max_ms, 2),
+            "avg_wait_ms": round(self.wait_ms / calls, 2),
+        }
+
+
+class IOExecutor:
+    """有界线程池执行阻塞文件操作，记录每类操作的耗时（含排队等待）"""
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        slow_ms: float = 500.0,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            max_workers: 线程池大小，限制同时访问磁盘的操作数
+            slow_ms: 单次耗时超过该值（毫秒）时记录警告
+        """
+        self.logger = logger or logging.getLogger("IOExecutor")
+        self.max_workers = max(1, int(max_workers))
+        self.slow_ms = float(slow_ms)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._ops: Dict[str, _OpStats] = {}
+        self.in_flight = 0
+
+    def configure(self, cfg: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Args:
+            cfg: runtime.io_executor 配置 {max_workers, slow_ms}；已创建的线程池在下次使用时按新大小重建
+        """
+        cfg = cfg or {}
+        max_workers = max(1, int(cfg.get("max_workers", self.max_workers)))
+        self.slow_ms = float(cfg.get("slow_ms", self.slow_ms))
+        if max_workers != self.max_workers:
+            self.max_workers = max_workers
+            self.shutdown(wait=False)
+
+    async def run(self, op: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        在线程池中执行 func(*args, **kwargs) 并返回结果
+
+        Args:
+            op: 操作名（统计维度），如 "storage.load_metadata"
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="io",
+            )
+        loop = asyncio.get_running_loop()
+        started_at: list[float] = []
+
+        def invoke() -> T:
+            started_at.append(time.perf_counter())
+            return func(*args, **kwargs)
+
+        stats = self._ops.setdefault(op, _OpStats())
+        submitted = time.perf_counter()
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._executor, invoke)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            elapsed_ms = (time.perf_counter() - submitted) * 1000
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            if started_at:
+                stats.wait_ms += (started_at[0] - submitted) * 1000
+            if elapsed_ms > self.slow_ms:
+                self.logger.warning("文件操作 %s 耗时 %.0f ms", op, elapsed_ms)
+        return result
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池；之后的调用会重新创建"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "ops": {op: stats.snapshot() for op, stats in sorted(self._ops.items())},
+        }
+
+
+io_executor = IOExecutor()
+
+
+class _AsyncFacade:
+    """
+    为同步服务提供同名 async 方法：METHODS 中的方法在 IOExecutor 中执行，
+    其余属性直接透传给被包装对象。
+    """
+
+    NAME = ""
+    METHODS: Iterable[str] = ()
+
+    def __init__(self, target: Any, executor: Optional[IOExecutor] = None):
+        self._target = target
+        self._executor = executor
+
+    def __getattr__(self, item: str) -> Any:
+        attr = getattr(self._target, item)
+        if item not in self.METHODS:
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            executor = self._executor or io_executor
+            return await executor.run(f"{self.NAME}.{item}", attr, *args, **kwargs)
+
+        return call
+
+
+# 任务 ID -> task.json 写锁；无人持有时随弱引用回收，跨 AsyncStorage 实例共享
+_metadata_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class AsyncStorage(_AsyncFacade):
+    """StorageService 的异步外观"""
+
+    NAME = "storage"
+    METHODS = frozenset({
+        "save_metadata",
+        "load_metadata",
+        "append_log",
+        "copy_into_task",
+        "publish_video",
+        "publish_task_asset",
+        "list_published_videos",
+        "scan_metadata",
+    })
+
+    @staticmethod
+    def metadata_lock(task_id: str) -> asyncio.Lock:
+        """同一任务 task.json 写入的互斥锁（按获取顺序先到先写）"""
+        lock = _metadata_locks.get(task_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            _metadata_locks[task_id] = lock
+        return lock
+
+    async def update_metadata(
+        self, task_id: str, mutate: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        在任务写锁内读取 task.json、调用 mutate 修改后写回
+
+        Args:
+            mutate: 接收当前记录（不存在时为空 dict）；返回 None 时放弃写入
+        Returns:
+            写回的记录；放弃写入时返回读取到的记录
+        """
+        async with self.metadata_lock(task_id):
+            record = await self.load_metadata(task_id)
+            updated = mutate(record)
+            if updated is None:
+                return record
+            await self.save_metadata(task_id, updated)
+            return updated
+
+
+class AsyncHistory(_AsyncFacade):
+    """HistoryService 的异步外观"""
+
+    NAME = "history"
+    METHODS = frozenset({"list_recent_videos"})
+
+
+class AsyncCharacters(_AsyncFacade):
+    """CharacterRepository 的异步外观"""
+
+    NAME = "characters"
+    METHODS = frozenset({
+        "list_characters",
+        "get_character",
+        "get_internal",
+        "create_character",
+        "update_character",
+        "disable_character",
+        "resolve_asset_path",
+    })
+
+
+__all__ = [
+    "AsyncCharacters",
+    "AsyncHistory",
+    "AsyncStorage",
+    "IOExecutor",
+    "io_executor",
+]
@@ -0,0 +1,184 @@
+"""
+任务结果复用 - 相同请求直接复用已完成任务的产物
+
+对规范化后的请求参数计算指纹（上传头像按文件内容哈希，并带上 API Key 的哈希，
+只在同一账户内复用，不同账户不会拿到彼此的产物与 URL），已完成任务登记 指纹 -> job_id；再次提交相同请求时创建别名任务，
+复制产物与 URL，跳过头像/语音/唇同步全流程。
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+from py.services.storage_service import StorageService
+
+
+# 参与指纹计算的请求字段（与 generate_digital_human 参数一致）
+FINGERPRINT_FIELDS = (
+    "avatar_mode",
+    "avatar_prompt",
+    "avatar_upload_path",
+    "speech_text",
+    "voice_id",
+    "resolution",
+    "speed",
+    "pitch",
+    "emotion",
+    "seed",
+    "mask_image",
+)
+
+
+def _normalize_text(value: Optional[str]) -> str:
+    return " ".join(unicodedata.normalize("NFKC", value or "").split())
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JobMemo:
+    """请求指纹 -> 已完成任务 的索引"""
+
+    def __init__(self, index_path: str = "temp/job_fingerprints.json"):
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        self._index: Dict[str, str] = self._load()
+
+    @staticmethod
+    def fingerprint(params: Dict[str, Any], tenant: Optional[str] = None) -> str:
+        """
+        计算请求指纹
+
+        文本字段做 NFKC + 空白归一；上传头像若为本地文件则使用内容哈希（读取整个文件，
+        在事件循环中应通过 io_executor 调用），角色仅取 id。
+
+        Args:
+            tenant: 调用方身份（WaveSpeed / MiniMax API Key 或租户 ID），仅以哈希参与计算
+        """
+        canonical: Dict[str, Any] = {}
+        for key in FINGERPRINT_FIELDS:
+            value = params.get(key)
+            if key in ("avatar_prompt", "speech_text"):
+                value = _normalize_text(value)
+            elif key == "avatar_upload_path" and value:
+                path = Path(value)
+                value = f"sha256:{_file_digest(path)}" if path.is_file() else str(value)
+            elif key in ("speed",) and value is not None:
+                value = float(value)
+            canonical[key] = value
+        character = params.get("character") or {}
+        canonical["character_id"] = character.get("id") if isinstance(character, dict) else None
+        canonical["tenant"] = hashlib.sha256(tenant.encode("utf-8")).hexdigest() if tenant else None
+        text = json.dumps(canonical, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def lookup(self, fingerprint: str) -> Optional[str]:
+        with self.lock:
+            return self._index.get(fingerprint)
+
+    def record(self, fingerprint: str, job_id: str):
+        """登记已完成任务"""
+        with self.lock:
+            self._index[fingerprint] = job_id
+            self._save()
+
+    def forget(self, fingerprint: str):
+        with self.lock:
+            if self._index.pop(fingerprint, None) is not None:
+                self._save()
+
+    def materialize_alias(
+        self,
+        storage: StorageService,
+        fingerprint: str,
+        source_job_id: str,
+        job_id: str,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        以已完成任务为模板创建别名任务的 task.json 与产物
+
+        源任务已不存在或未完成时清除登记并返回 None，调用方应回退为正常执行。
+        """
+        source_meta = storage.load_metadata(source_job_id)
+        source_paths = storage.prepare_task_paths(source_job_id)
+        video_available = source_paths.video_path.exists() or bool(source_meta.get("video_url"))
+        if source_meta.get("status") != "finished" or not video_available:
+            self.forget(fingerprint)
+            return None
+
+        paths = storage.prepare_task_paths(job_id)
+        replaced: Dict[str, str] = {}
+        for attr in ("avatar_path", "speech_path", "video_path"):
+            source_file: Path = getattr(source_paths, attr)
+            if source_file.exists():
+                target = getattr(paths, attr)
+                storage.copy_into_task(source_file, target)
+                replaced[str(source_file)] = str(target)
+
+        now = datetime.now(timezone.utc).isoformat()
+        message = f"♻️ 请求与任务 {source_job_id} 完全一致，直接复用其结果"
+        record = copy.deepcopy(source_meta)
+        record.pop("billing", None)
+        record.update(
+            job_id=job_id,
+            created_at=now,
+            updated_at=now,
+            trace_id=f"trace-{uuid4().hex[:12]}",
+            cost=0.0,
+            cost_breakdown={name: 0.0 for name in (source_meta.get("cost_breakdown") or {})},
+            alias_of=source_job_id,
+            error=None,
+            logs=[f"[INFO] {message}"],
+        )
+        assets = record.setdefault("assets", {})
+        for key, value in list(assets.items()):
+            if isinstance(value, str) and value in replaced:
+                assets[key] = replaced[value]
+        assets["local_video_url"] = f"/output/{job_id}/{storage.final_video_name}"
+        for stage in (record.get("stages") or {}).values():
+            if isinstance(stage, dict) and stage.get("artifact_path") in replaced:
+                stage["artifact_path"] = replaced[stage["artifact_path"]]
+        if record.get("video_path") in replaced:
+            record["video_path"] = replaced[record["video_path"]]
+
+        storage.save_metadata(job_id, record)
+        storage.append_log(job_id, message, trace_id=record["trace_id"])
+        return record
+
+    def _load(self) -> Dict[str, str]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            data = json.loads(content) if content else {}
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"警告：任务指纹索引加载失败 - {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self):
+        """原子写入索引（调用方持有锁）"""
+        index_dir = os.path.dirname(self.index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+
+__all__ = ["JobMemo", "FINGERPRINT_FIELDS"]
@@ -0,0 +1,275 @@
+"""
+任务调度器 - 有界并发 + 持久化 FIFO 队列
+
+替代每个请求直接 asyncio.create_task 的做法：
+- worker 数量由 workflow.task_runner.max_parallel_tasks 决定，突发提交只会排队
+- 队列（含运行中任务）写入 JSON 文件，服务重启后恢复排队任务；
+  上次运行中被中断的任务交给 on_interrupted，可返回新 payload 优先重新入队（断点续跑）
+- 运行中任务登记在 registry 中并持有强引用，不会被 GC 中途回收
+- 可选 hold 钩子按任务 payload 返回暂缓秒数（如该任务要调用的供应商熔断中），被暂缓的任务
+  留在原位，worker 按 FIFO 取走第一个不需暂缓的任务
+- submit(delay=...) 的任务在 not_before 之前不出队（持久化，重启后仍生效）
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+
+JobHandler = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+InterruptedHandler = Callable[[str, Dict[str, Any]], Optional[Dict[str, Any]]]
+HoldCheck = Callable[[Dict[str, Any]], float]
+
+
+class JobScheduler:
+    """有界并发的任务调度器"""
+
+    def __init__(
+        self,
+        handler: JobHandler,
+        max_parallel: int = 2,
+        queue_path: Optional[str] = None,
+        on_interrupted: Optional[InterruptedHandler] = None,
+        logger: Optional[logging.Logger] = None,
+        hold: Optional[HoldCheck] = None,
+    ):
+        """
+        Args:
+            handler: 执行单个任务的协程函数 handler(job_id, payload)
+            max_parallel: 最大并发任务数
+            queue_path: 持久化队列文件路径；None 表示仅内存
+            on_interrupted: 重启恢复时，对上次运行中被中断的任务调用；
+                返回 payload 时该任务排到队首重新执行，返回 None 则丢弃
+            logger: 日志记录器
+            hold: 出队前以任务 payload 调用，返回大于 0 的秒数时该任务暂缓出队，
+                worker 改取其后第一个无需暂缓的任务；全部暂缓时在最短暂缓时间后重新检查
+        """
+        self.handler = handler
+        self.max_parallel = max(1, int(max_parallel))
+        self.queue_path = queue_path
+        self.on_interrupted = on_interrupted
+        self.logger = logger or logging.getLogger("JobScheduler")
+        self.hold = hold
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._running: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._restored = False
+        self._held = False
+
+    # ------------------------------------------------------------------ #
+    # 生命周期
+    # ------------------------------------------------------------------ #
+    def start(self) -> None:
+        """在当前事件循环中启动 worker（幂等），首次启动时恢复持久化队列。"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        if not self._restored:
+            self._restored = True
+            self._restore()
+        self._workers = [
+            loop.create_task(self._worker(index), name=f"job-worker-{index}")
+            for index in range(self.max_parallel)
+        ]
+        if self._queue:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        """停止 worker；运行中的任务被取消，但仍保留在持久化队列中。"""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    # ------------------------------------------------------------------ #
+    # 提交与查询
+    # ------------------------------------------------------------------ #
+    def submit(self, job_id: str, payload: Dict[str, Any], delay: float = 0.0) -> int:
+        """
+        提交任务到队尾
+
+        Args:
+            delay: 大于 0 时任务至少等待该秒数才出队（如供应商熔断的剩余冷却时间）
+
+        Returns:
+            排队位置，定义同 queue_position
+        """
+        self.start()
+        entry = {
+            'job_id': job_id,
+            'payload': payload,
+            'state': 'queued',
+            'enqueued_at': datetime.now().isoformat(),
+        }
+        if delay > 0:
+            entry['not_before'] = time.time() + delay
+        self._queue.append(entry)
+        self._persist()
+        self._wakeup.set()
+        return self._position(len(self._queue))
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """
+        返回排队位置：前面还需等待多少个任务开始（含自身，1 起算），
+        0 表示空闲 worker 即将取走它；未在队列中（运行中或不存在）返回 None
+
+        队列中所有任务都被暂缓（hold / delay）时不计空闲 worker。
+        """
+        for index, entry in enumerate(self._queue, start=1):
+            if entry['job_id'] == job_id:
+                return self._position(index)
+        return None
+
+    def is_running(self, job_id: str) -> bool:
+        return job_id in self._running
+
+    def running_jobs(self) -> List[Dict[str, Any]]:
+        """运行中任务（job_id / started_at）"""
+        return [
+            {'job_id': job_id, 'started_at': entry.get('started_at')}
+            for job_id, entry in self._running.items()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            'max_parallel': self.max_parallel,
+            'running': len(self._running),
+            'queued': len(self._queue),
+        }
+        if self.hold:
+            stats['held'] = self._held
+        return stats
+
+    # ------------------------------------------------------------------ #
+    # 内部实现
+    # ------------------------------------------------------------------ #
+    def _position(self, index: int) -> int:
+        """队列中第 index 个（1 起算）任务的排队位置：扣除可立即接手的空闲 worker"""
+        idle = 0 if self._held else max(self.max_parallel - len(self._running), 0)
+        return max(index - idle, 0)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            entry, delay = self._next_ready()
+            if entry is None:
+                # 全部暂缓：到最短暂缓时间或有新任务提交时重新检查
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._queue.remove(entry)
+            job_id = entry['job_id']
+            entry['state'] = 'running'
+            entry['started_at'] = datetime.now().isoformat()
+            self._running[job_id] = entry
+            self._persist()
+            try:
+                await self.handler(job_id, entry['payload'])
+            except asyncio.CancelledError:
+                # 服务关闭：保留持久化记录，重启后交给 on_interrupted 处理
+                self._running.pop(job_id, None)
+                raise
+            except Exception as exc:  # noqa: BLE001
+                self.logger.error("任务 %s 执行失败: %s", job_id, exc)
+            self._running.pop(job_id, None)
+            self._persist()
+
+    def _next_ready(self) -> Tuple[Optional[Dict[str, Any]], float]:
+        """按 FIFO 找第一个可出队的任务；全部暂缓时返回 (None, 最短暂缓秒数)"""
+        now = time.time()
+        shortest: Optional[float] = None
+        for entry in self._queue:
+            delay = max(float(entry.get('not_before') or 0.0) - now, 0.0) or self._hold_delay(entry)
+            if delay <= 0:
+                self._held = False
+                return entry, 0.0
+            shortest = delay if shortest is None else min(shortest, delay)
+        if not self._held:
+            self.logger.warning("排队任务全部暂缓出队 %.1f 秒（%d 个任务排队中）", shortest or 0.0, len(self._queue))
+        self._held = True
+        return None, shortest or 0.0
+
+    def _hold_delay(self, entry: Dict[str, Any]) -> float:
+        if not self.hold:
+            return 0.0
+        try:
+            return float(self.hold(entry.get('payload') or {}) or 0.0)
+        except Exception as exc:  # noqa: BLE001
+            self.logger.warning("检查任务 %s 暂缓状态失败: %s", entry.get('job_id'), exc)
+            return 0.0
+
+    def _restore(self) -> None:
+        """恢复持久化队列：排队任务重新入队，运行中任务交给 on_interrupted"""
+        if not self.queue_path or not os.path.exists(self.queue_path):
+            return
+        try:
+            with open(self.queue_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            entries = (json.loads(content) if content else {}).get('entries') or []
+        except (json.JSONDecodeError, IOError, AttributeError) as e:
+            self.logger.warning("任务队列文件加载失败: %s", e)
+            return
+
+        interrupted = []
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get('job_id'):
+                continue
+            if entry.get('state') == 'running':
+                interrupted.append(entry)
+            else:
+                self._queue.append(entry)
+        for entry in reversed(interrupted):
+            if not self.on_interrupted:
+                continue
+            try:
+                payload = self.on_interrupted(entry['job_id'], entry.get('payload') or {})
+            except Exception as exc:  # noqa: BLE001
+                self.logger.error("处理中断任务 %s 失败: %s", entry['job_id'], exc)
+                continue
+            if payload is not None:
+                self._queue.appendleft({
+                    'job_id': entry['job_id'],
+                    'payload': payload,
+                    'state': 'queued',
+                    'enqueued_at': datetime.now().isoformat(),
+                })
+        if interrupted:
+            self._persist()
+
+    def _persist(self) -> None:
+        """原子写入队列文件（含 API Key，权限 0600）"""
+        if not self.queue_path:
+            return
+        entries = list(self._running.values()) + list(self._queue)
+        queue_dir = os.path.dirname(self.queue_path)
+        if queue_dir:
+            os.makedirs(queue_dir, exist_ok=True)
+        tmp_path = f"{self.queue_path}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'entries': entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.queue_path)
+        except OSError as e:
+            self.logger.error("任务队列持久化失败: %s", e)
+
+
+__all__ = ["JobScheduler"]
@@ -4,30 +4,61 @@ MiniMax TTS 服务
 提供 MiniMax speech-02-hd TTS 服务，兼容 WaveSpeed 的轮询式结果格式。
 """
 import asyncio
-import time
+import logging
+import re
+import unicodedata
 from pathlib import Path
 from typing import Optional, Dict, Any, Callable
 
 import httpx
 
 from py.exceptions import ExternalAPIError
+from py.function.rate_limit import get_rate_limiter
+from py.services.artifact_cache import ArtifactCache
+from py.services.downloader import stream_download
+from py.services.http_pool import HttpClientPool, http_pool as default_http_pool
+from py.services.io_executor import AsyncStorage, io_executor
+from py.services.prediction_poller import PredictionPoller
+from py.services.webhook_hub import WebhookHub, webhook_hub as default_webhook_hub
 
 
 class MiniMaxTTSService:
     """MiniMax speech-02-hd TTS 客户端"""
 
-    def __init__(self, api_key: str):
+    SAMPLE_RATE = 32000
+
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[ArtifactCache] = None,
+        http_pool: Optional[HttpClientPool] = None,
+        polling_cfg: Optional[Dict[str, Any]] = None,
+        webhooks: Optional[WebhookHub] = None,
+        rate_limits: Optional[Dict[str, Any]] = None,
+        publisher: Optional[AsyncStorage] = None,
+    ):
         """
         初始化 TTS 服务
 
         Args:
             api_key: MiniMax API 密钥（或 WaveSpeed API 密钥）
+            cache: 语音结果缓存；同文本+音色参数命中时跳过请求、轮询与下载
+            http_pool: 共享 HTTP 连接池，默认使用应用级连接池
+            polling_cfg: runtime.polling 配置（轮询间隔/退避/超时）
+            webhooks: Webhook 回调中心，启用时预测完成由回调唤醒
+            rate_limits: config.yaml rate_limits 配置，按 API Key 限制提交速率
+            publisher: 存储外观；写入缓存时把音频发布到公共目录，命中时返回长期有效的 URL
         """
         self.api_key = api_key
+        self.limiter = get_rate_limiter("minimax", api_key, rate_limits)
+        self.http = http_pool or default_http_pool
+        self.cache = cache
         self.base_url = "https://api.wavespeed.ai/api/v3"
         self.endpoint = f"{self.base_url}/minimax/speech-02-hd"
-        self._poll_interval = 3
-        self._poll_timeout = 180
+        self.poller = PredictionPoller(self.http, polling_cfg)
+        self.webhooks = webhooks or default_webhook_hub
+        self.publisher = publisher
+        self.logger = logging.getLogger("MiniMaxTTSService")
 
     async def generate_voice(
         self,
@@ -36,7 +67,9 @@ class MiniMaxTTSService:
         speed: float = 1.0,
         pitch: int = 0,
         emotion: str = "neutral",
-        output_path: Optional[Path] = None
+        output_path: Optional[Path] = None,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+        resume_prediction: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """
         生成语音
@@ -55,6 +88,9 @@ class MiniMaxTTSService:
             pitch: 音调 -12~12
             emotion: 情绪 neutral/happy/sad/angry
             output_path: 输出路径（可选）
+            on_submitted: 获得预测 ID/轮询地址后立即回调，供调用方持久化；
+                提交响应直接带回音频时以空字典回调，表示供应商已应答
+            resume_prediction: 之前已提交的预测（含 poll_url），直接续接轮询而不重新提交
 
         Returns:
             {
@@ -67,6 +103,13 @@ class MiniMaxTTSService:
         Raises:
             ExternalAPIError: 外部 API 调用错误
         """
+        cache_key = None
+        if self.cache is not None and not resume_prediction:
+            cache_key = self._cache_key(text, voice_id, speed, pitch, emotion)
+            cached = await self._load_cached(cache_key, output_path)
+            if cached:
+                return cached
+
         # 构建请求参数
         payload = {
             "text": text,
@@ -74,7 +117,7 @@ class MiniMaxTTSService:
             "speed": speed,
             "pitch": pitch,
             "emotion": emotion,
-            "sample_rate": 32000,
+            "sample_rate": self.SAMPLE_RATE,
             "channel": 1,
             "english_normalization": True
         }
@@ -84,8 +127,21 @@ class MiniMaxTTSService:
             "Content-Type": "application/json"
         }
 
-        result = await self._with_retry(lambda: self._request_tts(payload, headers))
-        audio_url, duration = await self._resolve_audio_output(result, headers)
+        webhook_token = None
+        if resume_prediction and resume_prediction.get("poll_url"):
+            result = await self._poll_prediction(
+                resume_prediction["poll_url"],
+                headers,
+                task_id=resume_prediction.get("provider_task_id"),
+            )
+        else:
+            webhook_token = self.webhooks.new_token()
+            result = await self._with_retry(
+                lambda: self._request_tts(payload, headers, webhook_token=webhook_token)
+            )
+        audio_url, duration = await self._resolve_audio_output(
+            result, headers, on_submitted=on_submitted, webhook_token=webhook_token
+        )
 
         # 下载音频（如果提供了输出路径）
         audio_path_str = None
@@ -97,6 +153,9 @@ class MiniMaxTTSService:
         duration_value = duration if duration is not None else 0.0
         cost = self._calculate_cost(duration_value)
 
+        if cache_key and audio_path_str:
+            await self._store_cached(cache_key, output_path, audio_url, duration)
+
         response = {
             "audio_url": audio_url,
             "audio_path": audio_path_str,
@@ -105,9 +164,96 @@ class MiniMaxTTSService:
         }
         return response
 
+    def _cache_key(
+        self,
+        text: str,
+        voice_id: str,
+        speed: float,
+        pitch: int,
+        emotion: str,
+    ) -> str:
+        """缓存 key：规范化文本（NFKC、合并空白）+ 音色参数"""
+        normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip()
+        return ArtifactCache.make_key(
+            endpoint=self.endpoint,
+            text=normalized,
+            voice_id=voice_id,
+            speed=float(speed),
+            pitch=int(pitch),
+            emotion=emotion,
+            sample_rate=self.SAMPLE_RATE,
+        )
+
+    async def _load_cached(self, cache_key: str, output_path: Optional[Path]) -> Optional[Dict[str, Any]]:
+        """
+        命中缓存时复制音频并返回结果（成本为 0）
+
+        供应商 audio_url 有有效期：优先返回已发布的公共 URL；未发布过的条目先尝试发布，
+        仍无公共 URL 时检查供应商 URL 是否可访问，已失效则按未命中处理、重新生成。
+        """
+        entry = await io_executor.run("tts_cache.get", self.cache.get, cache_key)
+        if not entry or not entry.meta.get("audio_url"):
+            return None
+        audio_url = entry.meta.get("public_url") or await self._publish_cached(cache_key, entry.path)
+        if not audio_url and await self._url_alive(entry.meta["audio_url"]):
+            audio_url = entry.meta["audio_url"]
+        if not audio_url:
+            self.logger.info("缓存音频的供应商 URL 已失效，重新生成")
+            return None
+        audio_path_str = None
+        if output_path:
+            await io_executor.run("tts_cache.copy_to", self.cache.copy_to, entry, output_path)
+            audio_path_str = str(output_path)
+        return {
+            "audio_url": audio_url,
+            "audio_path": audio_path_str,
+            "duration": entry.meta.get("duration"),
+            "cost": 0.0,
+            "cache_hit": True,
+        }
+
+    async def _store_cached(
+        self, cache_key: str, audio_path: Path, audio_url: str, duration: Optional[float]
+    ) -> None:
+        """写入缓存并发布到公共目录；缓存失败不影响主流程"""
+        public_url = await self._publish_cached(cache_key, audio_path)
+        try:
+            await io_executor.run(
+                "tts_cache.put",
+                self.cache.put,
+                cache_key,
+                audio_path,
+                {"audio_url": audio_url, "public_url": public_url, "duration": duration},
+            )
+        except OSError as exc:
+            self.logger.warning("写入语音缓存失败：%s", exc)
+
+    async def _publish_cached(self, cache_key: str, audio_path: Path) -> Optional[str]:
+        """发布缓存音频（文件名按缓存 key，重复发布覆盖同一文件），返回公共 URL"""
+        if self.publisher is None:
+            return None
+        try:
+            publish_info = await self.publisher.publish_task_asset(
+                "tts-cache", Path(audio_path), asset_dir="cache",
+                filename=f"{cache_key}{Path(audio_path).suffix}",
+            )
+        except OSError as exc:
+            self.logger.warning("发布缓存音频失败：%s", exc)
+            return None
+        return (publish_info or {}).get("url")
+
+    async def _url_alive(self, url: str) -> bool:
+        """HEAD 检查供应商 URL 是否仍可访问（签名过期后返回 4xx）"""
+        try:
+            async with self.http.client(timeout=10) as client:
+                response = await client.request("HEAD", url, follow_redirects=True)
+        except httpx.HTTPError:
+            return False
+        return bool(response.is_success)
+
     async def _download_audio(self, url: str, target: Path):
         """
-        下载音频文件
+        流式下载音频文件（断线按 Range 续传，完成后原子替换）
 
         Args:
             url: 音频文件URL
@@ -116,49 +262,31 @@ class MiniMaxTTSService:
         Raises:
             ExternalAPIError: 下载失败
         """
-        target.parent.mkdir(parents=True, exist_ok=True)
-
-        try:
-            async with httpx.AsyncClient(timeout=120) as client:
-                response = await client.get(url)
-
-                if not response.is_success:
-                    raise ExternalAPIError(
-                        provider="minimax",
-                        message=f"下载音频失败: {url}",
-                        status_code=response.status_code
-                    )
-
-                target.write_bytes(response.content)
-
-        except httpx.TimeoutException as e:
-            raise ExternalAPIError(
-                provider="minimax",
-                message="下载音频超时",
-                status_code=408,
-                original_exception=e
-            )
-        except httpx.RequestError as e:
-            raise ExternalAPIError(
-                provider="minimax",
-                message=f"下载音频错误: {str(e)}",
-                status_code=0,
-                original_exception=e
-            )
-        except ExternalAPIError:
-            raise
-        except Exception as e:
-            raise ExternalAPIError(
-                provider="minimax",
-                message=f"保存音频文件失败: {str(e)}",
-                status_code=0,
-                original_exception=e
-            )
+        await stream_download(
+            self.http,
+            url,
+            target,
+            provider="minimax",
+            label="音频",
+            timeout=120,
+        )
 
-    async def _request_tts(self, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+    async def _request_tts(
+        self,
+        payload: Dict[str, Any],
+        headers: Dict[str, str],
+        webhook_token: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if self.limiter:
+            await self.limiter.acquire()
         try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.post(self.endpoint, json=payload, headers=headers)
+            async with self.http.client(timeout=60) as client:
+                response = await client.post(
+                    self.endpoint,
+                    json=payload,
+                    headers=headers,
+                    params=self.webhooks.submit_params(webhook_token),
+                )
 
                 if not response.is_success:
                     raise ExternalAPIError.from_response(
@@ -197,19 +325,25 @@ class MiniMaxTTSService:
         self,
         response: Dict[str, Any],
         headers: Dict[str, str],
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+        webhook_token: Optional[str] = None,
     ) -> tuple[str, Optional[float]]:
         """
         解析 WaveSpeed 返回的 result/data 结构，并在必要时轮询 result URL。
         """
         data = self._unwrap_response(response)
 
-        # 直接返回 output 结构
+        # 直接返回 output 结构（同步结果：没有预测 ID，只告知调用方供应商已应答）
         output = data.get("output")
         if isinstance(output, dict) and output.get("audio_url"):
+            if on_submitted:
+                on_submitted({})
             return output["audio_url"], output.get("duration")
 
         outputs = data.get("outputs")
         if isinstance(outputs, list) and outputs:
+            if on_submitted:
+                on_submitted({})
             return outputs[0], data.get("duration")
 
         # 需要轮询 result endpoint
@@ -217,7 +351,14 @@ class MiniMaxTTSService:
         poll_url = urls.get("get") or data.get("result_url")
         task_id = data.get("id") or data.get("task_id")
         if poll_url:
-            final_data = await self._poll_prediction(poll_url, headers, task_id=task_id)
+            if on_submitted:
+                on_submitted({"provider_task_id": task_id, "poll_url": poll_url})
+            final_data = await self._poll_prediction(
+                poll_url,
+                headers,
+                task_id=task_id,
+                webhook=self.webhooks.register(task_id, webhook_token),
+            )
             output = final_data.get("output")
             if isinstance(output, dict) and output.get("audio_url"):
                 return output["audio_url"], output.get("duration")
@@ -237,52 +378,19 @@ class MiniMaxTTSService:
         poll_url: str,
         headers: Dict[str, str],
         task_id: Optional[str] = None,
+        webhook: Optional[asyncio.Future] = None,
     ) -> Dict[str, Any]:
         """
         轮询 WaveSpeed 预测结果（类似于 /predictions/{id}/result）。
         """
         auth_headers = {"Authorization": headers["Authorization"]}
-        start = time.time()
-
-        async with httpx.AsyncClient(timeout=30) as client:
-            while time.time() - start < self._poll_timeout:
-                try:
-                    response = await client.get(poll_url, headers=auth_headers)
-                except httpx.TimeoutException:
-                    await asyncio.sleep(self._poll_interval)
-                    continue
-                except httpx.RequestError as exc:
-                    raise ExternalAPIError(
-                        provider="minimax",
-                        message=f"轮询 MiniMax TTS 结果失败: {exc}",
-                        status_code=0
-                    ) from exc
-
-                if not response.is_success:
-                    raise ExternalAPIError.from_response(
-                        provider="minimax",
-                        response=response,
-                        message="轮询 MiniMax TTS 结果失败"
-                    )
-
-                payload = self._unwrap_response(response.json())
-                status = payload.get("status")
-                if status in {"completed", "succeeded"}:
-                    return payload
-                if status == "failed":
-                    raise ExternalAPIError(
-                        provider="minimax",
-                        message=f"MiniMax TTS 任务失败: {payload.get('error', 'unknown error')}",
-                        status_code=200,
-                        response_data=payload
-                    )
-                await asyncio.sleep(self._poll_interval)
-
-        raise ExternalAPIError(
+        return await self.poller.poll(
+            poll_url,
             provider="minimax",
-            message="等待 MiniMax TTS 结果超时",
-            status_code=408,
-            response_data={"task_id": task_id, "url": poll_url}
+            kind="speech",
+            headers=auth_headers,
+            label="MiniMax TTS",
+            webhook=webhook,
         )
 
     @staticmethod
@@ -0,0 +1,538 @@
+"""
+WaveSpeed 预测结果轮询器 - 头像 / 语音 / 唇同步共用
+
+替代三个客户端各自的固定间隔轮询循环：
+- 间隔从 initial_interval_seconds 起按倍数增长，封顶 check_interval_seconds，并加随机抖动，
+  避免大量任务同一时刻打到 WaveSpeed
+- 网络错误 / 429 / 5xx 视为暂时故障，按 backoff_seconds 指数退避（封顶 max_backoff_seconds），
+  连续超过 max_network_retries 次才失败
+- 各类任务的最长等待取 runtime.polling.max_wait_seconds.<kind>
+- 按 provider 统计请求数、网络错误、完成/失败/超时次数与等待耗时
+- 应用内启动 PollMultiplexer 后，所有预测登记到同一个时间轮上集中调度，
+  查询速率受 max_qps 限制，不再是每个任务一个轮询协程
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from py.exceptions import ExternalAPIError
+from py.services.http_pool import HttpClientPool, http_pool as default_http_pool
+
+
+COMPLETED_STATES = {"completed", "succeeded"}
+FAILED_STATES = {"failed"}
+# 未配置 max_wait_seconds 时各类任务的默认最长等待（秒）
+DEFAULT_MAX_WAIT = {"image": 300, "speech": 180, "video": 600}
+
+
+@dataclass
+class PollingPolicy:
+    """单类任务的轮询策略"""
+
+    initial_interval: float = 2.0
+    max_interval: float = 10.0
+    multiplier: float = 1.5
+    jitter: float = 0.1
+    timeout: float = 300.0
+    max_network_retries: int = 10
+    network_backoff: float = 5.0
+    max_network_backoff: float = 30.0
+
+    @classmethod
+    def from_config(cls, polling_cfg: Optional[Dict[str, Any]], kind: str) -> "PollingPolicy":
+        """
+        由 runtime.polling 配置构建策略
+
+        Args:
+            polling_cfg: runtime.polling 配置块
+            kind: 任务类型（image / speech / video），对应 max_wait_seconds 的键
+        """
+        cfg = polling_cfg or {}
+        defaults = cls()
+        max_wait = cfg.get("max_wait_seconds") or {}
+        timeout = max_wait.get(kind) if isinstance(max_wait, dict) else None
+        return cls(
+            initial_interval=float(cfg.get("initial_interval_seconds", defaults.initial_interval)),
+            max_interval=float(cfg.get("check_interval_seconds", defaults.max_interval)),
+            multiplier=float(cfg.get("interval_multiplier", defaults.multiplier)),
+            jitter=float(cfg.get("jitter", defaults.jitter)),
+            timeout=float(timeout or DEFAULT_MAX_WAIT.get(kind, defaults.timeout)),
+            max_network_retries=int(cfg.get("max_network_retries", defaults.max_network_retries)),
+            network_backoff=float(cfg.get("backoff_seconds", defaults.network_backoff)),
+            max_network_backoff=float(cfg.get("max_backoff_seconds", defaults.max_network_backoff)),
+        )
+
+    def interval(self, attempt: int) -> float:
+        """第 attempt 次（0 起算）状态查询后的等待秒数"""
+        base = min(self.initial_interval * (self.multiplier ** attempt), self.max_interval)
+        return self._jittered(base)
+
+    def network_delay(self, failures: int) -> float:
+        """第 failures 次（1 起算）连续网络错误后的等待秒数"""
+        base = min(self.network_backoff * (2 ** (failures - 1)), self.max_network_backoff)
+        return self._jittered(base)
+
+    def _jittered(self, value: float) -> float:
+        if self.jitter <= 0:
+            return value
+        return max(value * random.uniform(1 - self.jitter, 1 + self.jitter), 0.0)
+
+
+class PollStats:
+    """按 provider 汇总的轮询统计（进程内共享）"""
+
+    FIELDS = ("polls", "requests", "network_errors", "webhooks", "completed", "failed", "timeouts")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, provider: str, field: str, value: float = 1) -> None:
+        with self.lock:
+            bucket = self._stats.setdefault(
+                provider, {**{name: 0 for name in self.FIELDS}, "wait_seconds": 0.0}
+            )
+            bucket[field] = bucket.get(field, 0) + value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            result = {}
+            for provider, bucket in self._stats.items():
+                item = dict(bucket)
+                finished = item["completed"] + item["failed"] + item["timeouts"]
+                item["wait_seconds"] = round(item["wait_seconds"], 3)
+                item["avg_wait_seconds"] = round(item["wait_seconds"] / finished, 3) if finished else 0.0
+                result[provider] = item
+            return result
+
+
+poll_stats = PollStats()
+
+
+def unwrap_wavespeed_data(payload: Any) -> Dict[str, Any]:
+    """兼容 WaveSpeed {code,message,data} 响应。"""
+    if isinstance(payload, dict):
+        data = payload.get("data")
+        if isinstance(data, dict):
+            return data
+    return payload if isinstance(payload, dict) else {}
+
+
+@dataclass
+class PollState:
+    """单个预测的轮询状态"""
+
+    url: str
+    provider: str
+    label: str
+    policy: PollingPolicy
+    headers: Optional[Dict[str, str]] = None
+    unwrap: Callable[[Any], Dict[str, Any]] = unwrap_wavespeed_data
+    started_at: float = field(default_factory=time.monotonic)
+    attempt: int = 0
+    network_failures: int = 0
+    future: Optional[asyncio.Future] = None
+
+    @property
+    def deadline(self) -> float:
+        return self.started_at + self.policy.timeout
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+
+class PredictionPoller:
+    """WaveSpeed /predictions/{id}/result 轮询器"""
+
+    def __init__(
+        self,
+        http_pool: Optional[HttpClientPool] = None,
+        polling_cfg: Optional[Dict[str, Any]] = None,
+        stats: Optional[PollStats] = None,
+        logger: Optional[logging.Logger] = None,
+        multiplexer: Optional["PollMultiplexer"] = None,
+    ):
+        """
+        Args:
+            http_pool: 共享 HTTP 连接池
+            polling_cfg: runtime.polling 配置块
+            stats: 统计汇总，默认使用进程级 poll_stats
+            logger: 日志记录器
+            multiplexer: 集中轮询服务，默认使用进程级 poll_multiplexer；
+                其在当前事件循环运行时轮询交给它统一调度，否则本协程自行轮询
+        """
+        self.http = http_pool or default_http_pool
+        self.polling_cfg = polling_cfg or {}
+        self.stats = stats or poll_stats
+        self.logger = logger or logging.getLogger("PredictionPoller")
+        self.multiplexer = multiplexer
+
+    def policy(self, kind: str) -> PollingPolicy:
+        return PollingPolicy.from_config(self.polling_cfg, kind)
+
+    async def poll(
+        self,
+        url: str,
+        *,
+        provider: str,
+        kind: str,
+        headers: Optional[Dict[str, str]] = None,
+        label: Optional[str] = None,
+        policy: Optional[PollingPolicy] = None,
+        unwrap: Callable[[Any], Dict[str, Any]] = unwrap_wavespeed_data,
+        webhook: Optional[asyncio.Future] = None,
+    ) -> Dict[str, Any]:
+        """
+        轮询直至完成，返回完成时的结果数据
+
+        Args:
+            url: 结果查询地址
+            provider: 供应商名（错误与统计用）
+            kind: 任务类型（image / speech / video），决定默认策略
+            headers: 请求头（鉴权）
+            label: 错误信息中的任务名，默认同 provider
+            policy: 覆盖配置中的策略
+            webhook: WebhookHub 登记的回调 future；提供时回调到达即返回，
+                轮询降为 webhook_fallback_interval_seconds 的低频兜底
+
+        Raises:
+            ExternalAPIError: 任务失败、非暂时性 HTTP 错误、网络错误超限或等待超时
+        """
+        state = PollState(
+            url=url,
+            provider=provider,
+            label=label or provider,
+            policy=policy or self.policy(kind),
+            headers=headers,
+            unwrap=unwrap,
+        )
+        self.stats.incr(provider, "polls")
+        if webhook is not None:
+            return await self._wait_webhook(state, webhook)
+        return await self._poll_state(state)
+
+    async def _wait_webhook(self, state: PollState, webhook: asyncio.Future) -> Dict[str, Any]:
+        """等待回调，同时低频轮询兜底；先到者为准"""
+        fallback = float(self.polling_cfg.get("webhook_fallback_interval_seconds", 30))
+        state.policy.initial_interval = max(state.policy.initial_interval, fallback)
+        state.policy.max_interval = max(state.policy.max_interval, fallback)
+        poll_task = asyncio.ensure_future(self._poll_state(state, first_delay=fallback))
+        try:
+            await asyncio.wait({webhook, poll_task}, return_when=asyncio.FIRST_COMPLETED)
+            if webhook.done() and not webhook.cancelled() and not poll_task.done():
+                self.stats.incr(state.provider, "webhooks")
+                done, result = self.evaluate_data(state, state.unwrap(webhook.result()))
+                if done:
+                    return result
+            return await poll_task
+        finally:
+            for pending in (poll_task, webhook):
+                if not pending.done():
+                    pending.cancel()
+            await asyncio.gather(poll_task, return_exceptions=True)
+
+    async def _poll_state(self, state: PollState, first_delay: float = 0.0) -> Dict[str, Any]:
+        multiplexer = self.multiplexer or poll_multiplexer
+        if multiplexer.running:
+            return await multiplexer.track(state, self, delay=first_delay)
+
+        if first_delay > 0:
+            await asyncio.sleep(max(min(first_delay, state.remaining()), 0.0))
+        async with self.http.client(timeout=30) as client:
+            while state.remaining() > 0:
+                response, error = await self.fetch(client, state)
+                done, result = self.evaluate(state, response, error)
+                if done:
+                    return result
+                await asyncio.sleep(max(min(result, state.remaining()), 0.0))
+        raise self.timeout_error(state)
+
+    async def fetch(self, client: Any, state: PollState):
+        """发起一次状态查询，返回 (response, error)"""
+        state.attempt += 1
+        self.stats.incr(state.provider, "requests")
+        try:
+            return await client.get(state.url, headers=state.headers), None
+        except httpx.RequestError as exc:
+            return None, exc
+
+    def evaluate(
+        self,
+        state: PollState,
+        response: Optional[httpx.Response],
+        error: Optional[Exception],
+    ):
+        """
+        处理一次查询结果
+
+        Returns:
+            (True, 结果数据) 表示已完成；(False, 等待秒数) 表示需再次查询
+
+        Raises:
+            ExternalAPIError: 任务失败、非暂时性 HTTP 错误或网络错误超限
+        """
+        if error is not None or response.status_code == 429 or response.status_code >= 500:
+            state.network_failures += 1
+            self.stats.incr(state.provider, "network_errors")
+            if state.network_failures > state.policy.max_network_retries:
+                self._finish(state, "failed")
+                raise ExternalAPIError(
+                    provider=state.provider,
+                    status_code=response.status_code if response is not None else 0,
+                    message=f"轮询 {state.label} 任务失败: {error or f'HTTP {response.status_code}'}",
+                    original_exception=error,
+                )
+            return False, state.policy.network_delay(state.network_failures)
+        state.network_failures = 0
+
+        if not response.is_success:
+            self._finish(state, "failed")
+            raise ExternalAPIError.from_response(
+                provider=state.provider,
+                response=response,
+                message=f"轮询 {state.label} 任务失败",
+            )
+
+        return self.evaluate_data(state, state.unwrap(response.json()))
+
+    def evaluate_data(self, state: PollState, data: Dict[str, Any]):
+        """处理预测结果数据（轮询响应或 webhook 回调），返回值同 evaluate"""
+        status = data.get("status") or data.get("state")
+        if status in COMPLETED_STATES:
+            self._finish(state, "completed")
+            return True, data
+        if status in FAILED_STATES:
+            self._finish(state, "failed")
+            raise ExternalAPIError(
+                provider=state.provider,
+                status_code=200,
+                message=f"{state.label} 任务失败: {data.get('error') or '未知错误'}",
+                response_data=data,
+            )
+        return False, state.policy.interval(state.attempt - 1)
+
+    def timeout_error(self, state: PollState) -> ExternalAPIError:
+        self._finish(state, "timeouts")
+        return ExternalAPIError(
+            provider=state.provider,
+            status_code=408,
+            message=f"等待 {state.label} 任务完成超时 ({int(state.policy.timeout)}秒)",
+            response_data={"url": state.url},
+        )
+
+    def _finish(self, state: PollState, outcome: str) -> None:
+        elapsed = time.monotonic() - state.started_at
+        self.stats.incr(state.provider, outcome)
+        self.stats.incr(state.provider, "wait_seconds", elapsed)
+        self.logger.debug(
+            "%s 轮询结束(%s)：%d 次查询，耗时 %.1fs", state.label, outcome, state.attempt, elapsed
+        )
+
+
+class TimingWheel:
+    """
+    单层时间轮：slots 个槽位，每槽 tick 秒。
+
+    超过一圈的延迟记录目标 tick，在槽位中等到对应圈数才到期；
+    插入与推进均为 O(1)（按槽内条目数摊销）。
+    """
+
+    def __init__(self, tick: float = 0.5, slots: int = 512):
+        self.tick = tick
+        self.slots = max(1, int(slots))
+        self._wheel: List[List[Tuple[int, Any]]] = [[] for _ in range(self.slots)]
+        self._now = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def schedule(self, item: Any, delay: float) -> None:
+        ticks = max(1, math.ceil(max(delay, 0.0) / self.tick))
+        target = self._now + ticks
+        self._wheel[target % self.slots].append((target, item))
+        self._size += 1
+
+    def advance(self) -> List[Any]:
+        """推进一个 tick，返回到期条目"""
+        self._now += 1
+        bucket = self._wheel[self._now % self.slots]
+        if not bucket:
+            return []
+        due = [item for target, item in bucket if target <= self._now]
+        bucket[:] = [(target, item) for target, item in bucket if target > self._now]
+        self._size -= len(due)
+        return due
+
+
+class PollMultiplexer:
+    """
+    集中轮询服务
+
+    所有进行中的预测登记在一个时间轮上，由单个后台协程按 tick 推进；
+    到期的查询进入就绪队列，按令牌桶限制的 QPS 与并发上限发出。
+    轮询流量随 max_qps 而不是任务数增长，各任务协程只需等待自己的 future。
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger("PollMultiplexer")
+        self.tick = 0.5
+        self.max_qps = 20.0
+        self.max_concurrency = 20
+        self._wheel = TimingWheel(self.tick)
+        self._ready: Deque[Tuple[PollState, PredictionPoller]] = deque()
+        self._inflight: Set[asyncio.Task] = set()
+        self._tokens = 0.0
+        self._http: HttpClientPool = default_http_pool
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dispatched = 0
+
+    @property
+    def running(self) -> bool:
+        if self._task is None or self._task.done():
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def start(
+        self,
+        cfg: Optional[Dict[str, Any]] = None,
+        http_pool: Optional[HttpClientPool] = None,
+    ) -> None:
+        """
+        在当前事件循环启动调度协程（幂等）
+
+        Args:
+            cfg: runtime.polling.multiplexer 配置 {enabled, tick_seconds, slots, max_qps, max_concurrency}
+            http_pool: 发起查询使用的连接池
+        """
+        cfg = cfg or {}
+        if not cfg.get("enabled", True) or self.running:
+            return
+        self.tick = float(cfg.get("tick_seconds", 0.5))
+        self.max_qps = float(cfg.get("max_qps", 20))
+        self.max_concurrency = int(cfg.get("max_concurrency", 20))
+        self._wheel = TimingWheel(self.tick, int(cfg.get("slots", 512)))
+        self._ready.clear()
+        self._tokens = self.max_qps
+        self._http = http_pool or default_http_pool
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run(), name="poll-multiplexer")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        inflight, self._inflight = list(self._inflight), set()
+        for pending in inflight:
+            pending.cancel()
+        if inflight:
+            await asyncio.gather(*inflight, return_exceptions=True)
+        for state, _ in self._ready:
+            if state.future and not state.future.done():
+                state.future.cancel()
+        self._ready.clear()
+
+    async def track(
+        self,
+        state: PollState,
+        poller: PredictionPoller,
+        delay: float = 0.0,
+    ) -> Dict[str, Any]:
+        """登记预测并等待结果；首个查询在 delay 秒后（至少下一个 tick）发出"""
+        state.future = self._loop.create_future()
+        self._wheel.schedule((state, poller), delay)
+        return await state.future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "tracked": len(self._wheel) + len(self._ready) + len(self._inflight),
+            "scheduled": len(self._wheel),
+            "ready": len(self._ready),
+            "inflight": len(self._inflight),
+            "max_qps": self.max_qps,
+            "dispatched": self.dispatched,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(next_tick - loop.time(), 0.0))
+            # 事件循环阻塞导致落后时补齐错过的 tick
+            while True:
+                for state, poller in self._wheel.advance():
+                    if state.future is not None and not state.future.done():
+                        self._ready.append((state, poller))
+                if loop.time() < next_tick + self.tick:
+                    break
+                next_tick += self.tick
+            self._tokens = min(self._tokens + self.max_qps * self.tick, max(self.max_qps, 1.0))
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._ready and self._tokens >= 1 and len(self._inflight) < self.max_concurrency:
+            state, poller = self._ready.popleft()
+            if state.future is None or state.future.done():
+                continue
+            self._tokens -= 1
+            self.dispatched += 1
+            task = self._loop.create_task(self._poll_once(state, poller))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _poll_once(self, state: PollState, poller: PredictionPoller) -> None:
+        future = state.future
+        if state.remaining() <= 0:
+            future.set_exception(poller.timeout_error(state))
+            return
+        try:
+            async with self._http.client(timeout=30) as client:
+                response, error = await poller.fetch(client, state)
+            done, result = poller.evaluate(state, response, error)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            if not future.done():
+                future.set_exception(exc)
+            return
+        if future.done():
+            return
+        if done:
+            future.set_result(result)
+        elif state.remaining() <= 0:
+            future.set_exception(poller.timeout_error(state))
+        else:
+            self._wheel.schedule((state, poller), min(result, state.remaining()))
+
+
+poll_multiplexer = PollMultiplexer()
+
+
+__all__ = [
+    "PollingPolicy",
+    "PollMultiplexer",
+    "PollState",
+    "PollStats",
+    "PredictionPoller",
+    "TimingWheel",
+    "poll_multiplexer",
+    "poll_stats",
+    "unwrap_wavespeed_data",
+]
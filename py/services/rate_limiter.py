@@ -7,6 +7,7 @@ API限流管理器
 
 import time
 import threading
+from collections import deque
 from typing import Optional
 
 
@@ -38,7 +39,7 @@ class RateLimiter:
         self.max_requests_per_minute = max_requests_per_minute
         self.max_requests_per_day = max_requests_per_day
         self.name = name
-        self.request_times = []
+        self.request_times = deque()
         self.lock = threading.Lock()
 
         # 计算最小请求间隔（秒）
@@ -52,7 +53,8 @@ class RateLimiter:
         获取API调用权限
 
         如果超过限流阈值，会自动等待直到可以调用
-        线程安全，可在多线程环境中使用
+        线程安全，可在多线程环境中使用；锁内只计算并预约调用时刻，
+        等待在锁外进行，不会让其他线程在锁上空等
         """
         # 如果没有设置任何限制，直接返回
         if not self.max_requests_per_minute and not self.max_requests_per_day:
@@ -60,61 +62,33 @@ class RateLimiter:
 
         with self.lock:
             current_time = time.time()
-
-            # 清理过期的请求记录
-            if self.max_requests_per_day:
-                # 保留最近24小时的记录
-                self.request_times = [t for t in self.request_times if current_time - t < 86400]
-            elif self.max_requests_per_minute:
-                # 只保留最近60秒的记录
-                self.request_times = [t for t in self.request_times if current_time - t < 60]
-
-            # 检查每天限制
-            if self.max_requests_per_day and self.max_requests_per_day > 0:
-                daily_requests = [t for t in self.request_times if current_time - t < 86400]
-
-                if len(daily_requests) >= self.max_requests_per_day:
-                    oldest_request = daily_requests[0]
-                    wait_time = 86400 - (current_time - oldest_request)
-
-                    if wait_time > 0:
-                        hours = wait_time / 3600
-                        print(f"⏰ [{self.name}] 达到每日限制 ({self.max_requests_per_day}次/天)，等待 {hours:.1f} 小时...")
-                        time.sleep(wait_time)
-                        current_time = time.time()
-                        # 重新清理
-                        self.request_times = [t for t in self.request_times if current_time - t < 86400]
-
+            window = 86400 if self.max_requests_per_day else 60
+            while self.request_times and current_time - self.request_times[0] >= window:
+                self.request_times.popleft()
+
+            scheduled = current_time
+            # 检查每天限制：第 N 个之前的预约过期后才能调用
+            if self.max_requests_per_day and len(self.request_times) >= self.max_requests_per_day:
+                scheduled = max(scheduled, self.request_times[-self.max_requests_per_day] + 86400)
             # 检查每分钟限制
             if self.max_requests_per_minute and self.max_requests_per_minute > 0:
-                minute_requests = [t for t in self.request_times if current_time - t < 60]
-
-                if len(minute_requests) >= self.max_requests_per_minute:
-                    oldest_request = minute_requests[0]
-                    wait_time = 60 - (current_time - oldest_request)
-
-                    if wait_time > 0:
-                        print(f"⏰ [{self.name}] 达到每分钟限制 ({self.max_requests_per_minute}次/分)，等待 {wait_time:.1f} 秒...")
-                        time.sleep(wait_time)
-                        current_time = time.time()
-                        # 重新清理
-                        if self.max_requests_per_day:
-                            self.request_times = [t for t in self.request_times if current_time - t < 86400]
-                        else:
-                            self.request_times = [t for t in self.request_times if current_time - t < 60]
-
+                if len(self.request_times) >= self.max_requests_per_minute:
+                    scheduled = max(scheduled, self.request_times[-self.max_requests_per_minute] + 60)
                 # 确保最小请求间隔
                 if self.request_times and self.min_delay > 0:
-                    last_request = self.request_times[-1]
-                    time_since_last = current_time - last_request
+                    scheduled = max(scheduled, self.request_times[-1] + self.min_delay)
 
-                    if time_since_last < self.min_delay:
-                        wait_time = self.min_delay - time_since_last
-                        time.sleep(wait_time)
-                        current_time = time.time()
+            # 记录本次请求（预约时刻）
+            self.request_times.append(scheduled)
 
-            # 记录本次请求
-            self.request_times.append(current_time)
+        wait_time = scheduled - current_time
+        if wait_time <= 0:
+            return
+        if wait_time >= 3600:
+            print(f"⏰ [{self.name}] 达到每日限制 ({self.max_requests_per_day}次/天)，等待 {wait_time / 3600:.1f} 小时...")
+        elif wait_time > self.min_delay:
+            print(f"⏰ [{self.name}] 达到每分钟限制 ({self.max_requests_per_minute}次/分)，等待 {wait_time:.1f} 秒...")
+        time.sleep(wait_time)
 
     def get_stats(self) -> dict:
         """
@@ -0,0 +1,89 @@
+"""
+服务实例缓存 - 按 API Key 复用 DigitalHumanService
+
+同一租户的连续任务共用同一个服务实例（TTS / Infinitetalk 客户端、
+TaskRunner、限流器），避免每个任务重新构建。key 为 API Key 的 SHA-256，
+内存中不以明文 Key 作为索引；按 LRU + 空闲过期淘汰。
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+class ServiceCache(Generic[T]):
+    """按 API Key 缓存服务实例"""
+
+    def __init__(
+        self,
+        factory: Callable[[str], T],
+        max_entries: int = 32,
+        idle_seconds: Optional[float] = 1800,
+    ):
+        """
+        Args:
+            factory: 根据 API Key 创建服务实例
+            max_entries: 最多缓存的实例数
+            idle_seconds: 空闲超过该秒数的实例被淘汰；None 表示不过期
+        """
+        self.factory = factory
+        self.max_entries = max(1, int(max_entries))
+        self.idle_seconds = idle_seconds
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[T, float]]" = OrderedDict()
+
+    @staticmethod
+    def key_for(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def get(self, api_key: str) -> T:
+        """返回缓存实例，不存在或已过期时新建"""
+        key = self.key_for(api_key)
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries[key] = (entry[0], now)
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+        service = self.factory(api_key)
+        with self.lock:
+            self._entries[key] = (service, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return service
+
+    def clear(self) -> None:
+        with self.lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _expire(self, now: float) -> None:
+        """淘汰空闲过期实例（调用方持有锁）"""
+        if not self.idle_seconds:
+            return
+        for key in [k for k, (_, used) in self._entries.items() if now - used > self.idle_seconds]:
+            self._entries.pop(key, None)
+
+
+__all__ = ["ServiceCache"]
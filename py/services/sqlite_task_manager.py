@@ -0,0 +1,370 @@
+"""
+SQLite 任务管理器 - 与 TaskManager 接口一致的 SQLite(WAL) 实现
+
+适用于历史任务量大（10 万级）或多个 uvicorn worker 共享任务状态的部署：
+- status / created_at 建索引，列表与过滤无需全量加载
+- WAL 模式 + busy_timeout，多进程并发读写安全
+- 执行中的任务记录所属进程（owner）与租约到期时间（lease_until），进程存活期间
+  由后台线程定期续约；只有租约过期（所属进程已退出）的任务才会被标记为中断，
+  新启动的 worker 不会误伤其他 worker 正在执行的任务
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from py.function.job_id import UlidJobIdAllocator
+from py.services.task_manager import ACTIVE_STATUSES, INTERRUPTED_MESSAGE, TaskManager
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL DEFAULT '',
+    progress REAL NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at);
+"""
+
+# 旧版数据库缺少的列（启动时补齐）
+_LEASE_COLUMNS = {
+    "owner": "TEXT",
+    "lease_until": "REAL",
+}
+
+
+class SQLiteTaskManager:
+    """任务管理器 - SQLite(WAL) 持久化"""
+
+    def __init__(
+        self,
+        db_path: str = "temp/jobs.db",
+        legacy_json: Optional[str] = None,
+        id_allocator: Optional[Callable[[], str]] = None,
+        lease_seconds: float = 120.0,
+        heartbeat_interval: Optional[float] = 30.0,
+    ):
+        """
+        初始化 SQLite 任务管理器
+
+        Args:
+            db_path: 数据库文件路径
+            legacy_json: 旧版 jobs.json 路径；数据库为空时一次性导入（同目录下的
+                jobs.journal 与 archive/ 归档分段一并导入）
+            id_allocator: 任务 ID 分配函数，默认 UlidJobIdAllocator（aka- 前缀）
+            lease_seconds: 执行中任务的租约时长；所属进程超过该时间未续约即视为已退出
+            heartbeat_interval: 续约间隔（秒），同时回收其他进程遗留的过期任务；None 表示不启动续约线程
+        """
+        self.db_path = db_path
+        self.id_allocator = id_allocator or UlidJobIdAllocator()
+        self.lock = threading.Lock()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.lease_seconds = float(lease_seconds)
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            db_path,
+            timeout=30,
+            isolation_level=None,  # 手动管理事务
+            check_same_thread=False,
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.executescript(_SCHEMA)
+        self._migrate_lease_columns()
+
+        if legacy_json:
+            self._import_legacy_json(legacy_json)
+        self._recover_stale_tasks()
+
+        if heartbeat_interval:
+            self._heartbeat = threading.Thread(
+                target=self._heartbeat_loop,
+                args=(float(heartbeat_interval),),
+                name="sqlite-task-lease",
+                daemon=True,
+            )
+            self._heartbeat.start()
+
+    def create_task(
+        self,
+        preset_name: Optional[str] = None,
+        num_shots: int = 5,
+        resolution: str = "720p",
+        user_yaml: Optional[str] = None,
+        resume_id: Optional[str] = None,
+        no_auto_resume: bool = False
+    ) -> str:
+        """
+        创建新任务
+
+        Returns:
+            job_id: 任务 ID（默认格式：aka-{ulid}，按创建时间有序）
+        """
+        with self.lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                job_id = self._generate_job_id()
+                task = {
+                    'job_id': job_id,
+                    'status': 'queued',
+                    'message': '任务已创建，等待执行',
+                    'progress': 0.0,
+                    'result_path': None,
+                    'log_path': f'output/{job_id}/log.txt',
+                    'created_at': datetime.now().isoformat(),
+                    'preset_name': preset_name,
+                    'num_shots': num_shots,
+                    'resolution': resolution,
+                    'user_yaml': user_yaml,
+                    'resume_id': resume_id,
+                    'no_auto_resume': no_auto_resume,
+                    'eta_profile': None
+                }
+                self._insert(task)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return job_id
+
+    def get_task(self, job_id: str) -> Optional[dict]:
+        """获取任务详情，不存在则返回 None"""
+        with self.lock:
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def update_status(self, job_id: str, status: str, message: str = ""):
+        """更新任务状态"""
+        self._update_fields(job_id, {'status': status, 'message': message})
+
+    def update_progress(self, job_id: str, progress: float, message: str = ""):
+        """更新任务进度"""
+        fields: Dict[str, Any] = {'progress': progress}
+        if message:
+            fields['message'] = message
+        self._update_fields(job_id, fields)
+
+    def set_result_path(self, job_id: str, result_path: str):
+        """设置任务结果路径"""
+        self._update_fields(job_id, {'result_path': result_path})
+
+    def set_eta_profile(self, job_id: str, eta_profile: Optional[dict]):
+        """设置任务的ETA配置"""
+        self._update_fields(job_id, {'eta_profile': eta_profile})
+
+    def list_tasks(
+        self,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        列出任务（按创建时间倒序，走 created_at / status 索引）
+
+        Args:
+            status: 仅返回指定状态的任务
+            limit: 返回条数上限
+        """
+        sql = "SELECT data FROM jobs"
+        params: list = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def close(self):
+        """停止续约线程并关闭数据库连接"""
+        self._stop_heartbeat.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout=5)
+            self._heartbeat = None
+        with self.lock:
+            self._conn.close()
+
+    def renew_leases(self) -> int:
+        """为本进程执行中的任务续约，返回续约条数"""
+        statuses = sorted(ACTIVE_STATUSES)
+        placeholders = ", ".join("?" for _ in statuses)
+        with self.lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN ({placeholders})",
+                [time.time() + self.lease_seconds, self.owner, *statuses],
+            )
+        return cursor.rowcount
+
+    def _update_fields(self, job_id: str, fields: Dict[str, Any]):
+        """在事务内读-改-写单个任务，跨进程安全"""
+        with self.lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                if row:
+                    task = json.loads(row['data'])
+                    task.update(fields)
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, message = ?, progress = ?, data = ?, "
+                        "owner = ?, lease_until = ? WHERE job_id = ?",
+                        (
+                            task.get('status') or '',
+                            task.get('message') or '',
+                            float(task.get('progress') or 0.0),
+                            json.dumps(task, ensure_ascii=False),
+                            *self._lease_for(task),
+                            job_id,
+                        ),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _insert(self, task: dict, lease: bool = True):
+        """写入一条任务记录（调用方负责事务）；lease=False 时不登记所属进程（导入旧数据）"""
+        owner, lease_until = self._lease_for(task) if lease else (None, None)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs "
+            "(job_id, status, message, progress, created_at, data, owner, lease_until) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                task['job_id'],
+                task.get('status') or '',
+                task.get('message') or '',
+                float(task.get('progress') or 0.0),
+                task.get('created_at') or datetime.now().isoformat(),
+                json.dumps(task, ensure_ascii=False),
+                owner,
+                lease_until,
+            ),
+        )
+
+    def _lease_for(self, task: dict) -> tuple:
+        """执行中的任务归本进程所有并获得租约；其他状态不持有租约"""
+        if task.get('status') in ACTIVE_STATUSES:
+            return self.owner, time.time() + self.lease_seconds
+        return None, None
+
+    def _migrate_lease_columns(self):
+        """为旧版数据库补齐 owner / lease_until 列"""
+        with self.lock:
+            existing = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in _LEASE_COLUMNS.items():
+                if column not in existing:
+                    try:
+                        self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+                    except sqlite3.OperationalError as e:
+                        # 其他进程可能同时完成了迁移
+                        if "duplicate column" not in str(e):
+                            raise
+
+    def _heartbeat_loop(self, interval: float):
+        """定期续约本进程的任务，并回收其他进程遗留的过期任务"""
+        while not self._stop_heartbeat.wait(interval):
+            try:
+                self.renew_leases()
+                self._recover_stale_tasks()
+            except sqlite3.Error as e:
+                print(f"警告：任务租约续约失败 - {e}")
+
+    def _generate_job_id(self) -> str:
+        """
+        生成唯一的任务 ID（调用方需处于写事务中）
+
+        分配器本身保证时间有序与跨进程唯一，这里仅做一次主键查重兜底。
+        """
+        job_id = self.id_allocator()
+        while self._conn.execute(
+            "SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone():
+            job_id = self.id_allocator()
+        return job_id
+
+    def _import_legacy_json(self, json_path: str):
+        """
+        数据库为空时导入旧版 JSON 存储
+
+        经 TaskManager.read_store 读取快照、重放 jobs.journal 并合并 archive/ 归档分段，
+        上次压缩之后的变更与已归档的冷任务都不会丢失。
+        """
+        storage_dir = os.path.dirname(json_path) or "."
+        legacy_files = (
+            json_path,
+            os.path.join(storage_dir, "jobs.journal"),
+            os.path.join(storage_dir, "archive", "index.jsonl"),
+        )
+        if not any(os.path.exists(path) for path in legacy_files):
+            return
+        with self.lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+            if count:
+                return
+            try:
+                tasks = TaskManager.read_store(storage_dir)
+            except (TypeError, ValueError) as e:
+                print(f"警告：旧版任务文件导入失败 - {e}")
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for job_id, task in tasks.items():
+                    if isinstance(task, dict):
+                        task.setdefault('job_id', job_id)
+                        # 旧进程已不在运行：不登记租约，随后由中断恢复处理
+                        self._insert(task, lease=False)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _recover_stale_tasks(self):
+        """
+        将所属进程已退出（租约过期或无租约）的执行中任务标记为 failed（task.json 断点保留）
+
+        其他存活 worker 持有未过期租约的任务不受影响。
+        """
+        statuses = sorted(ACTIVE_STATUSES)
+        placeholders = ", ".join("?" for _ in statuses)
+        with self.lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT job_id, data FROM jobs WHERE status IN ({placeholders}) "
+                    "AND (lease_until IS NULL OR lease_until < ?)",
+                    [*statuses, time.time()],
+                ).fetchall()
+                for row in rows:
+                    task = json.loads(row['data'])
+                    task.update({'status': 'failed', 'message': INTERRUPTED_MESSAGE})
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, message = ?, data = ?, owner = NULL, "
+                        "lease_until = NULL WHERE job_id = ?",
+                        ('failed', INTERRUPTED_MESSAGE, json.dumps(task, ensure_ascii=False), row['job_id']),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
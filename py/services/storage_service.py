@@ -9,17 +9,21 @@
 3. 按配置将最终视频复制到对象存储/挂载目录（如 /mnt/www/ren/ren_MMDDHHMM/）
    并返回可访问 URL，便于前端直接播放。
 4. 可选：将最终视频额外拷贝到其他镜像目录（如 /mnt/www/ad），便于兄弟项目复用。
+   发布与镜像优先使用硬链接 / reflink（见 file_linker），同一文件系统内不复制数据。
 """
 from __future__ import annotations
 
 import json
 import logging
 import os
-import shutil
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from py.services.file_linker import DEFAULT_METHODS, link_or_copy
+from py.services.task_log_sink import TaskLogSink
 
 
 @dataclass
@@ -36,6 +40,9 @@ class TaskPaths:
 
 logger = logging.getLogger(__name__)
 
+# 复制进任务目录时的放置方式（写时复制克隆或内核态拷贝，不共享 inode）
+TASK_COPY_METHODS = ("reflink", "copy_file_range", "copy")
+
 
 class StorageService:
     """
@@ -49,6 +56,8 @@ class StorageService:
         final_video_name: 最终视频文件名（默认 `digital_human.mp4`）
         task_dir_pattern: 发布目录命名模板，遵循 `datetime.strftime`
         video_mirror_targets: 额外镜像目录配置列表
+        link_methods: 发布时依次尝试的放置方式（hardlink / reflink / copy_file_range / copy）
+        log_sink: 任务日志批量写入器；未提供时 append_log 逐行同步写入
     """
 
     def __init__(
@@ -60,6 +69,8 @@ class StorageService:
         final_video_name: str = "digital_human.mp4",
         task_dir_pattern: str = "ren_%m%d%H%M",
         video_mirror_targets: Optional[List[Dict[str, str]]] = None,
+        link_methods: Optional[Sequence[str]] = None,
+        log_sink: Optional[TaskLogSink] = None,
     ):
         self.output_root = Path(output_root).expanduser()
         self.output_root.mkdir(parents=True, exist_ok=True)
@@ -93,6 +104,9 @@ class StorageService:
             except PermissionError:
                 self.public_root = None
 
+        self.link_methods = tuple(link_methods) if link_methods else DEFAULT_METHODS
+        self.log_sink = log_sink
+
         self.video_mirror_targets: list[dict] = []
         if video_mirror_targets:
             self._init_video_mirrors(video_mirror_targets)
@@ -120,10 +134,13 @@ class StorageService:
         )
 
     def save_metadata(self, task_id: str, payload: Dict) -> Path:
-        """写入 task.json。"""
+        """写入 task.json（先写临时文件再原子 rename，崩溃时不会留下半个文件）。"""
         paths = self.prepare_task_paths(task_id)
         text = json.dumps(payload, indent=2, ensure_ascii=False)
-        paths.meta_path.write_text(text, encoding="utf-8")
+        # 临时文件名带随机后缀：I/O 线程池中的并发写入互不覆盖对方的临时文件
+        tmp_path = paths.meta_path.with_name(f".{paths.meta_path.name}.{uuid4().hex[:8]}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, paths.meta_path)
         return paths.meta_path
 
     def load_metadata(self, task_id: str) -> Dict:
@@ -133,6 +150,31 @@ class StorageService:
             return {}
         return json.loads(paths.meta_path.read_text(encoding="utf-8"))
 
+    def scan_metadata(
+        self, predicate: Optional[Callable[[Dict], bool]] = None
+    ) -> List[Tuple[str, Dict]]:
+        """
+        遍历 output/<task_id>/task.json，返回满足 predicate 的 (task_id, 元数据) 列表。
+
+        损坏或无法读取的 task.json 直接跳过。
+        """
+        try:
+            candidates = sorted(p for p in self.output_root.iterdir() if p.is_dir())
+        except FileNotFoundError:
+            return []
+        matches: List[Tuple[str, Dict]] = []
+        for task_dir in candidates:
+            meta_path = task_dir / "task.json"
+            if not meta_path.exists():
+                continue
+            try:
+                payload = json.loads(meta_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if isinstance(payload, dict) and (predicate is None or predicate(payload)):
+                matches.append((task_dir.name, payload))
+        return matches
+
     def copy_into_task(self, source: Path, destination: Path) -> Path:
         """
         将外部文件复制进任务目录，若目标与源相同则跳过。
@@ -149,10 +191,12 @@ class StorageService:
             if source.resolve() == destination.resolve():  # type: ignore[attr-defined]
                 return destination
         except FileNotFoundError:
-            # resolve 失败则直接复制（由 shutil 决定是否报错）
+            # resolve 失败则直接复制（由 link_or_copy 决定是否报错）
             pass
 
-        shutil.copy2(source, destination)
+        # 目标可能已硬链接到发布目录：以临时文件 + 原子替换写入，不原地改写；
+        # 任务产物需要独立副本，因此不使用硬链接
+        link_or_copy(source, destination, TASK_COPY_METHODS)
         return destination
 
     def append_log(
@@ -165,18 +209,28 @@ class StorageService:
     ) -> Path:
         """
         追加日志到任务 log.txt，包含时间戳/级别/trace_id。
+
+        配置了 log_sink 时只放入缓冲，由其批量写入。
         """
-        paths = self.prepare_task_paths(task_id)
+        log_path = self.output_root / task_id / "log.txt"
         timestamp = datetime.now(timezone.utc).isoformat()
         safe_message = message.rstrip()
         line_parts = [f"[{timestamp}]", f"[{level.upper()}]"]
         if trace_id:
             line_parts.append(f"[trace={trace_id}]")
         line = " ".join(line_parts) + f" {safe_message}\n"
-        paths.log_path.parent.mkdir(parents=True, exist_ok=True)
-        with paths.log_path.open("a", encoding="utf-8") as fp:
+        if self.log_sink is not None:
+            self.log_sink.write(log_path, line)
+            return log_path
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with log_path.open("a", encoding="utf-8") as fp:
             fp.write(line)
-        return paths.log_path
+        return log_path
+
+    def close_log(self, task_id: str) -> None:
+        """任务结束后关闭 log_sink 中该任务的日志句柄（剩余日志先写出）。"""
+        if self.log_sink is not None:
+            self.log_sink.close(self.output_root / task_id / "log.txt")
 
     def _init_video_mirrors(self, targets: List[Dict[str, str]]) -> None:
         """解析镜像目录配置。"""
@@ -212,7 +266,7 @@ class StorageService:
         local_video_path: Path,
         slug: str,
     ) -> list[Dict[str, str]]:
-        """将视频复制到额外镜像目录。"""
+        """将视频放置到额外镜像目录（优先硬链接）。"""
         if not self.video_mirror_targets:
             return []
 
@@ -240,7 +294,7 @@ class StorageService:
             filename = self._format_template(target["filename_template"], context)
             dest_path = dest_dir / filename
             try:
-                shutil.copy2(local_video_path, dest_path)
+                method = link_or_copy(local_video_path, dest_path, self.link_methods)
             except Exception as exc:  # noqa: BLE001
                 logger.warning("⚠️ 复制视频到镜像失败 (%s → %s): %s", local_video_path, dest_path, exc)
                 continue
@@ -248,6 +302,7 @@ class StorageService:
             entry: Dict[str, str] = {
                 "name": target["name"],
                 "path": str(dest_path),
+                "method": method,
             }
             base_url = target.get("base_url")
             if base_url:
@@ -264,7 +319,8 @@ class StorageService:
     # ------------------------------------------------------------------ #
     def publish_video(self, task_id: str, local_video_path: Path) -> Optional[Dict[str, str]]:
         """
-        将最终视频复制到公共挂载目录并返回 URL；若配置了镜像目录，也会一并复制。
+        将最终视频放置到公共挂载目录并返回 URL；若配置了镜像目录，也会一并放置。
+        返回值与每个镜像条目中的 method 记录实际使用的放置方式（hardlink / reflink / ...）。
         若未配置 public_root / public_base_url 且没有镜像目录，返回 None。
         """
         if not local_video_path.exists():
@@ -283,14 +339,14 @@ class StorageService:
 
             dest_dir.mkdir(parents=True, exist_ok=True)
             dest_path = dest_dir / self.final_video_name
-            shutil.copy2(local_video_path, dest_path)
+            method = link_or_copy(local_video_path, dest_path, self.link_methods)
 
             url_parts = [self.public_base_url.rstrip("/")]
             if self.namespace and not self._base_includes_namespace:
                 url_parts.append(self.namespace.strip("/"))
             url_parts.extend([dest_dir.name, self.final_video_name])
             public_url = "/".join(url_parts)
-            publish_result = {"path": str(dest_path), "url": public_url}
+            publish_result = {"path": str(dest_path), "url": public_url, "method": method}
 
         mirrors = self._mirror_video(task_id, local_video_path, slug)
         if mirrors:
@@ -308,7 +364,7 @@ class StorageService:
         filename: Optional[str] = None,
     ) -> Optional[Dict[str, str]]:
         """
-        将任务产物复制到挂载目录（如 /mnt/www/output/<task_id>/）。
+        将任务产物放置到挂载目录（如 /mnt/www/output/<task_id>/），优先硬链接。
         """
         if not self.public_export_base or not self.public_base_url:
             return None
@@ -325,7 +381,7 @@ class StorageService:
         target_dir.mkdir(parents=True, exist_ok=True)
 
         dest_path = target_dir / (filename or local_path.name)
-        shutil.copy2(local_path, dest_path)
+        method = link_or_copy(local_path, dest_path, self.link_methods)
 
         url_parts = [self.public_base_url.rstrip("/")]
         if self.namespace and not self._base_includes_namespace:
@@ -335,7 +391,7 @@ class StorageService:
         url_parts.extend([task_id, dest_path.name])
         public_url = "/".join(url_parts)
 
-        return {"path": str(dest_path), "url": public_url}
+        return {"path": str(dest_path), "url": public_url, "method": method}
 
     def list_published_videos(self, limit: int = 100) -> List[Dict[str, object]]:
         """
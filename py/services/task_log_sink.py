@@ -0,0 +1,236 @@
+"""
+任务日志写入器 - 批量写入 log.txt 并缓存打开的文件句柄
+
+StorageService.append_log 原本每行都 mkdir + open + write + close，且在事件循环中执行；
+数百个并发任务时日志本身就成了磁盘热点。TaskLogSink 只把格式化好的行放入内存缓冲，
+后台协程按 flush_interval 周期（或积压超过 max_pending 行时立即）在 I/O 线程池中
+成批写入，按任务复用有界 LRU 中的文件句柄，任务结束时关闭句柄。
+
+未启动（测试、脚本、无事件循环）时退回逐行同步写入，行为与原实现一致。
+进程崩溃时最多丢失最近一个 flush_interval 内的日志行。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, TextIO
+
+from py.services.io_executor import IOExecutor, io_executor as default_io_executor
+
+
+class TaskLogSink:
+    """按任务缓冲日志行，周期性批量追加到各自的 log.txt"""
+
+    def __init__(
+        self,
+        max_open_files: int = 64,
+        flush_interval: float = 0.5,
+        max_pending: int = 1000,
+        executor: Optional[IOExecutor] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            max_open_files: 同时保持打开的日志文件数上限（LRU 淘汰）
+            flush_interval: 批量写入间隔（秒）
+            max_pending: 缓冲行数超过该值时立即触发写入
+            executor: 执行文件写入的 I/O 线程池，默认共享 io_executor
+        """
+        self.logger = logger or logging.getLogger("TaskLogSink")
+        self.max_open_files = max(1, int(max_open_files))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.max_pending = max(1, int(max_pending))
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._pending: Dict[Path, List[str]] = {}
+        self._pending_lines = 0
+        self._closing: Set[Path] = set()
+        self._handles: "OrderedDict[Path, TextIO]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        self.lines_written = 0
+        self.batches = 0
+        self.opened = 0
+        self.evicted = 0
+
+    def configure(self, cfg: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Args:
+            cfg: runtime.task_log 配置 {max_open_files, flush_interval, max_pending}
+        """
+        cfg = cfg or {}
+        self.max_open_files = max(1, int(cfg.get("max_open_files", self.max_open_files)))
+        self.flush_interval = max(0.01, float(cfg.get("flush_interval", self.flush_interval)))
+        self.max_pending = max(1, int(cfg.get("max_pending", self.max_pending)))
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    def start(self) -> None:
+        """在事件循环中启动后台写入协程（重复调用无副作用）"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher = self._loop.create_task(self._flush_loop(), name="task-log-sink")
+
+    async def stop(self) -> None:
+        """停止后台协程，写出剩余日志并关闭所有文件句柄"""
+        if self._flusher is not None:
+            # 不取消写入协程：让进行中的批次写完，避免与最后一次 flush 并发操作句柄
+            self._stopping = True
+            self._wake()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for handle in handles:
+            self._close_handle(handle)
+
+    def write(self, log_path: Path, line: str) -> None:
+        """
+        追加一行日志（line 需以换行结尾）；可从事件循环或工作线程调用
+
+        未启动时直接同步写入。
+        """
+        if not self.running:
+            self._append_now(log_path, line)
+            return
+        with self._lock:
+            self._pending.setdefault(log_path, []).append(line)
+            self._pending_lines += 1
+            self._closing.discard(log_path)
+            overflow = self._pending_lines >= self.max_pending
+        if overflow:
+            self._wake()
+
+    def close(self, log_path: Path) -> None:
+        """任务结束：写出该任务剩余日志后关闭其文件句柄"""
+        with self._lock:
+            if not self.running:
+                handle = self._handles.pop(log_path, None)
+                if handle is not None:
+                    self._close_handle(handle)
+                return
+            self._closing.add(log_path)
+
+    async def flush(self) -> None:
+        """立即写出缓冲中的日志行"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            closing, self._closing = self._closing, set()
+            self._pending_lines = 0
+        if not batch and not closing:
+            return
+        executor = self.executor or default_io_executor
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            try:
+                await executor.run("logs.flush", self._write_batch, batch, closing)
+            except OSError as exc:
+                self.logger.error("写入任务日志失败: %s", exc)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "pending_lines": self._pending_lines,
+                "open_files": len(self._handles),
+                "lines_written": self.lines_written,
+                "batches": self.batches,
+                "opened": self.opened,
+                "evicted": self.evicted,
+            }
+
+    def _wake(self) -> None:
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            wakeup.set()
+        else:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def _flush_loop(self) -> None:
+        assert self._wakeup is not None
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _write_batch(self, batch: Dict[Path, List[str]], closing: Set[Path]) -> None:
+        """在 I/O 线程中执行：按任务成批追加，关闭已结束任务的句柄"""
+        for log_path, lines in batch.items():
+            try:
+                handle = self._handle_for(log_path)
+                handle.write("".join(lines))
+                handle.flush()
+            except OSError as exc:
+                self.logger.error("写入 %s 失败: %s", log_path, exc)
+                with self._lock:
+                    stale = self._handles.pop(log_path, None)
+                if stale is not None:
+                    self._close_handle(stale)
+                continue
+            self.lines_written += len(lines)
+        self.batches += 1
+        for log_path in closing:
+            with self._lock:
+                handle = self._handles.pop(log_path, None)
+            if handle is not None:
+                self._close_handle(handle)
+
+    def _handle_for(self, log_path: Path) -> TextIO:
+        with self._lock:
+            handle = self._handles.get(log_path)
+            if handle is not None:
+                self._handles.move_to_end(log_path)
+                return handle
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        handle = log_path.open("a", encoding="utf-8")
+        evicted: List[TextIO] = []
+        with self._lock:
+            self._handles[log_path] = handle
+            self.opened += 1
+            while len(self._handles) > self.max_open_files:
+                _, old = self._handles.popitem(last=False)
+                evicted.append(old)
+                self.evicted += 1
+        for old in evicted:
+            self._close_handle(old)
+        return handle
+
+    def _append_now(self, log_path: Path, line: str) -> None:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with log_path.open("a", encoding="utf-8") as fp:
+            fp.write(line)
+
+    def _close_handle(self, handle: TextIO) -> None:
+        try:
+            handle.close()
+        except OSError as exc:
+            self.logger.warning("关闭日志文件失败: %s", exc)
+
+
+task_log_sink = TaskLogSink()
+
+
+__all__ = ["TaskLogSink", "task_log_sink"]
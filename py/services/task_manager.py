@@ -1,33 +1,94 @@
 """
 任务管理器 - 负责任务的创建、状态跟踪和持久化
+
+持久化采用「快照 + 追加日志」：
+- temp/jobs.json      全量快照（兼容旧版格式）
+- temp/jobs.journal   每次变更追加一行 JSON 记录
+
+启动时先读快照再重放日志；日志条数达到阈值后压缩进快照并清空日志，
+因此单次状态更新只需追加一行，锁内耗时与历史任务数量无关。
+
+内存中只保留有上限的热任务集合（进行中 + 最近访问，LRU）。已结束的任务在被淘汰
+或超过保留期后归档到压缩分段 temp/archive/segment-YYYYMMDD.jsonl.gz，
+快照中不再包含它们；查询冷任务时按 archive/index.jsonl 定位分段并按需加载。
 """
+import gzip
 import os
 import json
 import threading
-from datetime import datetime
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from py.function.job_id import UlidJobIdAllocator
+
+
+# 终态任务可以被淘汰/归档；其余状态视为进行中，始终常驻内存
+TERMINAL_STATUSES = {'finished', 'failed', 'succeeded'}
+# 执行中的状态（含数字人流水线各阶段）；进程重启后这些任务已不在运行
+ACTIVE_STATUSES = {
+    'running',
+    'pending',
+    'assets_generating',
+    'assets_ready',
+    'avatar_generating',
+    'avatar_ready',
+    'speech_generating',
+    'speech_ready',
+    'video_rendering',
+}
+INTERRUPTED_MESSAGE = '服务已重启，任务已中断，可调用 resume 从断点继续'
 
 
 class TaskManager:
-    """任务管理器 - 内存 + JSON 持久化"""
+    """任务管理器 - 内存 + 快照/追加日志持久化"""
 
-    def __init__(self, storage_dir: str = "temp"):
+    def __init__(
+        self,
+        storage_dir: str = "temp",
+        compact_threshold: int = 1000,
+        max_hot_tasks: int = 500,
+        retention_days: Optional[float] = 7,
+        id_allocator: Optional[Callable[[], str]] = None,
+    ):
         """
         初始化任务管理器
 
         Args:
             storage_dir: 存储目录，默认为 temp/
+            compact_threshold: 日志累计多少条记录后压缩进快照
+            max_hot_tasks: 内存热任务上限（进行中的任务不受限制）
+            retention_days: 已结束任务在快照中保留的天数，超过后归档；None 表示仅按上限淘汰
+            id_allocator: 任务 ID 分配函数，默认 UlidJobIdAllocator（aka- 前缀）
         """
         self.storage_dir = storage_dir
         self.storage_file = os.path.join(storage_dir, "jobs.json")
-        self.tasks: Dict[str, dict] = {}
+        self.journal_file = os.path.join(storage_dir, "jobs.journal")
+        self.archive_dir = os.path.join(storage_dir, "archive")
+        self.archive_index_file = os.path.join(self.archive_dir, "index.jsonl")
+        self.compact_threshold = max(1, int(compact_threshold))
+        self.max_hot_tasks = max(1, int(max_hot_tasks))
+        self.retention_days = retention_days
+        self.id_allocator = id_allocator or UlidJobIdAllocator()
+        self.tasks: "OrderedDict[str, dict]" = OrderedDict()
         self.lock = threading.Lock()
+        self._journal_fp = None
+        self._journal_entries = 0
+        # 热集合中与归档内容一致的任务（淘汰时无需再次写归档，也不写入快照）
+        self._archived: set[str] = set()
+        # job_id -> 分段文件名，首次查询冷任务时才加载
+        self._archive_index: Optional[Dict[str, str]] = None
 
         # 确保存储目录存在
         os.makedirs(storage_dir, exist_ok=True)
 
-        # 加载现有任务
+        # 加载现有任务（快照 + 日志重放），重放过的日志立即压缩
         self._load_tasks()
+        self._journal_entries = self._replay_journal()
+        self._archive_expired()
+        self._enforce_hot_limit()
+        if self._journal_entries:
+            self._compact()
         self._recover_stale_tasks()
 
     def create_task(
@@ -51,10 +112,9 @@ class TaskManager:
             no_auto_resume: 禁用自动恢复
 
         Returns:
-            job_id: 任务 ID（格式：aka-{mmddhhmm}）
+            job_id: 任务 ID（默认格式：aka-{ulid}，按创建时间有序）
         """
         with self.lock:
-            # 生成 job_id（格式：aka-{mmddhhmm}）
             job_id = self._generate_job_id()
 
             # 创建任务记录
@@ -76,7 +136,8 @@ class TaskManager:
             }
 
             self.tasks[job_id] = task
-            self._save_tasks()
+            self._append_journal({'op': 'put', 'job_id': job_id, 'task': task})
+            self._enforce_hot_limit()
 
             return job_id
 
@@ -91,7 +152,7 @@ class TaskManager:
             任务详情字典，不存在则返回 None
         """
         with self.lock:
-            return self.tasks.get(job_id)
+            return self._get_hot(job_id)
 
     def update_status(self, job_id: str, status: str, message: str = ""):
         """
@@ -102,11 +163,7 @@ class TaskManager:
             status: 新状态 (queued/running/succeeded/failed)
             message: 状态消息
         """
-        with self.lock:
-            if job_id in self.tasks:
-                self.tasks[job_id]['status'] = status
-                self.tasks[job_id]['message'] = message
-                self._save_tasks()
+        self._update_fields(job_id, {'status': status, 'message': message})
 
     def update_progress(self, job_id: str, progress: float, message: str = ""):
         """
@@ -117,12 +174,10 @@ class TaskManager:
             progress: 进度值 (0.0 - 1.0)
             message: 进度消息
         """
-        with self.lock:
-            if job_id in self.tasks:
-                self.tasks[job_id]['progress'] = progress
-                if message:
-                    self.tasks[job_id]['message'] = message
-                self._save_tasks()
+        fields: Dict[str, Any] = {'progress': progress}
+        if message:
+            fields['message'] = message
+        self._update_fields(job_id, fields)
 
     def set_result_path(self, job_id: str, result_path: str):
         """
@@ -132,10 +187,7 @@ class TaskManager:
             job_id: 任务 ID
             result_path: 结果文件路径
         """
-        with self.lock:
-            if job_id in self.tasks:
-                self.tasks[job_id]['result_path'] = result_path
-                self._save_tasks()
+        self._update_fields(job_id, {'result_path': result_path})
 
     def set_eta_profile(self, job_id: str, eta_profile: Optional[dict]):
         """
@@ -145,46 +197,238 @@ class TaskManager:
             job_id: 任务 ID
             eta_profile: 阶段耗时估计
         """
-        with self.lock:
-            if job_id in self.tasks:
-                self.tasks[job_id]['eta_profile'] = eta_profile
-                self._save_tasks()
+        self._update_fields(job_id, {'eta_profile': eta_profile})
 
-    def list_tasks(self) -> List[dict]:
+    def list_tasks(
+        self,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_archived: bool = False,
+    ) -> List[dict]:
         """
         列出所有任务
 
+        Args:
+            status: 仅返回指定状态的任务
+            limit: 返回条数上限
+            include_archived: 是否包含已归档的冷任务（需要解压全部分段）
+
         Returns:
             任务列表（按创建时间倒序）
         """
         with self.lock:
-            tasks = list(self.tasks.values())
-            # 按创建时间倒序排序
-            tasks.sort(key=lambda x: x['created_at'], reverse=True)
-            return tasks
+            merged = dict(self.tasks)
+            if include_archived:
+                for job_id, task in self._read_all_archived().items():
+                    merged.setdefault(job_id, task)
+        tasks = list(merged.values())
+        if status:
+            tasks = [task for task in tasks if task.get('status') == status]
+        # 按创建时间倒序排序
+        tasks.sort(key=lambda x: x['created_at'], reverse=True)
+        if limit is not None:
+            tasks = tasks[:limit]
+        return tasks
+
+    def close(self):
+        """压缩日志并关闭文件句柄（进程退出前调用）"""
+        with self.lock:
+            self._compact()
+            if self._journal_fp is not None:
+                self._journal_fp.close()
+                self._journal_fp = None
+
+    def _update_fields(self, job_id: str, fields: Dict[str, Any]):
+        """更新任务字段并追加一条日志记录"""
+        with self.lock:
+            task = self._get_hot(job_id)
+            if task is None:
+                return
+            task.update(fields)
+            if job_id in self._archived:
+                # 冷任务被修改：写入完整记录，保证重放时可以还原
+                self._archived.discard(job_id)
+                self._append_journal({'op': 'put', 'job_id': job_id, 'task': task})
+            else:
+                self._append_journal({'op': 'update', 'job_id': job_id, 'fields': fields})
+
+    # ------------------------------------------------------------------ #
+    # 热集合 / 冷任务归档
+    # ------------------------------------------------------------------ #
+    def _get_hot(self, job_id: str) -> Optional[dict]:
+        """返回热任务并标记为最近使用；不在内存时尝试从归档加载（调用方需持有锁）"""
+        task = self.tasks.get(job_id)
+        if task is not None:
+            self.tasks.move_to_end(job_id)
+            return task
+
+        task = self._load_archived(job_id)
+        if task is None:
+            return None
+        self.tasks[job_id] = task
+        self._archived.add(job_id)
+        self._enforce_hot_limit(keep=job_id)
+        return task
+
+    def _enforce_hot_limit(self, keep: Optional[str] = None):
+        """热任务超过上限时，按 LRU 顺序淘汰已结束的任务（调用方需持有锁）"""
+        overflow = len(self.tasks) - self.max_hot_tasks
+        if overflow <= 0:
+            return
+        victims = []
+        for job_id, task in self.tasks.items():
+            if len(victims) >= overflow:
+                break
+            if job_id != keep and task.get('status') in TERMINAL_STATUSES:
+                victims.append(job_id)
+        self._archive_tasks(victims)
+
+    def _archive_expired(self):
+        """将超过保留期的已结束任务归档（调用方需持有锁）"""
+        if self.retention_days is None:
+            return
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        expired = [
+            job_id for job_id, task in self.tasks.items()
+            if task.get('status') in TERMINAL_STATUSES
+            and str(task.get('created_at') or '') < cutoff
+        ]
+        self._archive_tasks(expired)
+
+    def _archive_tasks(self, job_ids: List[str]):
+        """把任务写入压缩分段并移出内存（调用方需持有锁）"""
+        if not job_ids:
+            return
+        pending: Dict[str, List[dict]] = {}
+        for job_id in job_ids:
+            if job_id in self._archived:
+                continue
+            task = self.tasks[job_id]
+            pending.setdefault(self._segment_name(task), []).append(task)
+
+        try:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            index_lines = []
+            for segment, tasks in pending.items():
+                # gzip 支持多 member 拼接，追加写即可
+                with gzip.open(os.path.join(self.archive_dir, segment), 'at', encoding='utf-8') as f:
+                    for task in tasks:
+                        f.write(json.dumps(task, ensure_ascii=False) + '\n')
+                        index_lines.append(
+                            json.dumps({'job_id': task['job_id'], 'segment': segment}, ensure_ascii=False)
+                        )
+            if index_lines:
+                with open(self.archive_index_file, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(index_lines) + '\n')
+        except (IOError, KeyError) as e:
+            print(f"警告：任务归档失败 - {e}")
+            return
+
+        for segment, tasks in pending.items():
+            for task in tasks:
+                if self._archive_index is not None:
+                    self._archive_index[task['job_id']] = segment
+        for job_id in job_ids:
+            self.tasks.pop(job_id, None)
+            self._archived.discard(job_id)
+            self._append_journal({'op': 'archive', 'job_id': job_id}, compact=False)
+
+    @staticmethod
+    def _segment_name(task: dict) -> str:
+        """按任务创建日期划分归档分段"""
+        created = str(task.get('created_at') or '')
+        day = created[:10].replace('-', '') if len(created) >= 10 else datetime.now().strftime('%Y%m%d')
+        return f"segment-{day}.jsonl.gz"
+
+    def _load_archive_index(self) -> Dict[str, str]:
+        """加载 job_id -> 分段 的索引（后写覆盖先写）"""
+        if self._archive_index is not None:
+            return self._archive_index
+        index: Dict[str, str] = {}
+        if os.path.exists(self.archive_index_file):
+            try:
+                with open(self.archive_index_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if isinstance(entry, dict) and entry.get('job_id') and entry.get('segment'):
+                            index[entry['job_id']] = entry['segment']
+            except IOError as e:
+                print(f"警告：归档索引读取失败 - {e}")
+        self._archive_index = index
+        return index
+
+    def _read_segment(self, segment: str) -> Dict[str, dict]:
+        """解压单个分段，返回 job_id -> 最新记录"""
+        records: Dict[str, dict] = {}
+        path = os.path.join(self.archive_dir, segment)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        task = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(task, dict) and task.get('job_id'):
+                        records[task['job_id']] = task
+        except (IOError, EOFError) as e:
+            print(f"警告：归档分段读取失败 {segment} - {e}")
+        return records
+
+    def _load_archived(self, job_id: str) -> Optional[dict]:
+        """从归档分段中按需加载单个冷任务"""
+        segment = self._load_archive_index().get(job_id)
+        if not segment:
+            return None
+        return self._read_segment(segment).get(job_id)
+
+    def _read_all_archived(self) -> Dict[str, dict]:
+        """读取全部归档任务（仅用于全量列表）"""
+        merged: Dict[str, dict] = {}
+        for segment in sorted(set(self._load_archive_index().values())):
+            merged.update(self._read_segment(segment))
+        return merged
 
     def _generate_job_id(self) -> str:
         """
-        生成唯一的任务 ID
+        生成唯一的任务 ID（O(1)，由分配器保证时间有序与跨进程唯一）
 
-        格式：aka-{mmddhhmm}-{seq}
-        例如：aka-12221430-01
+        例如：aka-01k7qg3m5v0c8y2f6t9x4n1r3b
 
         Returns:
             job_id
         """
-        now = datetime.now()
-        base_id = f"aka-{now.strftime('%m%d%H%M')}"
-
-        # 如果同一分钟内有多个任务，添加序号
-        seq = 1
-        job_id = base_id
+        job_id = self.id_allocator()
+        # 自定义分配器可能产生重复，热集合内查重代价为 O(1)
         while job_id in self.tasks:
-            job_id = f"{base_id}-{seq:02d}"
-            seq += 1
-
+            job_id = self.id_allocator()
         return job_id
 
+    @classmethod
+    def read_store(cls, storage_dir: str = "temp") -> Dict[str, dict]:
+        """
+        只读加载存储目录中的全部任务：快照 + 日志重放 + 归档分段
+
+        不压缩、不归档、不恢复中断任务，也不创建任何文件，用于迁移到其他存储后端。
+
+        Returns:
+            job_id -> 任务（热数据覆盖归档中的旧记录）
+        """
+        reader = cls.__new__(cls)
+        reader.storage_dir = storage_dir
+        reader.storage_file = os.path.join(storage_dir, "jobs.json")
+        reader.journal_file = os.path.join(storage_dir, "jobs.journal")
+        reader.archive_dir = os.path.join(storage_dir, "archive")
+        reader.archive_index_file = os.path.join(reader.archive_dir, "index.jsonl")
+        reader._archive_index = None
+        reader._load_tasks()
+        reader._replay_journal()
+        tasks = reader._read_all_archived()
+        tasks.update(reader.tasks)
+        return tasks
+
     def _load_tasks(self):
         """从文件加载任务"""
         if os.path.exists(self.storage_file):
@@ -192,36 +436,162 @@ class TaskManager:
                 with open(self.storage_file, 'r', encoding='utf-8') as f:
                     content = f.read().strip()
                     if content:  # 非空文件
-                        self.tasks = json.loads(content)
+                        self.tasks = OrderedDict(json.loads(content))
                     else:  # 空文件
-                        self.tasks = {}
+                        self.tasks = OrderedDict()
             except (json.JSONDecodeError, IOError):
                 # 文件损坏或无法读取，初始化为空
-                self.tasks = {}
+                self.tasks = OrderedDict()
         else:
-            self.tasks = {}
+            self.tasks = OrderedDict()
 
-    def _save_tasks(self):
-        """保存任务到文件"""
+    def _replay_journal(self) -> int:
+        """
+        将日志中的变更重放到内存任务表
+
+        Returns:
+            成功重放的记录数（损坏/截断的行会被跳过）
+        """
+        if not os.path.exists(self.journal_file):
+            return 0
+
+        applied = 0
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 进程在写入中途退出可能留下半行，忽略即可
+                        continue
+                    if self._apply_entry(entry):
+                        applied += 1
+        except IOError as e:
+            print(f"警告：任务日志读取失败 - {e}")
+        return applied
+
+    def _apply_entry(self, entry: dict) -> bool:
+        """应用单条日志记录，返回是否生效"""
+        if not isinstance(entry, dict):
+            return False
+        job_id = entry.get('job_id')
+        op = entry.get('op')
+        if not job_id:
+            return False
+        if op == 'put' and isinstance(entry.get('task'), dict):
+            self.tasks[job_id] = entry['task']
+            return True
+        if op == 'update' and isinstance(entry.get('fields'), dict):
+            if job_id in self.tasks:
+                self.tasks[job_id].update(entry['fields'])
+                return True
+        if op == 'archive':
+            return self.tasks.pop(job_id, None) is not None
+        return False
+
+    def _append_journal(self, entry: dict, compact: bool = True):
+        """追加一条变更记录（调用方需持有锁），必要时触发压缩"""
+        try:
+            if self._journal_fp is None:
+                self._journal_fp = open(self.journal_file, 'a', encoding='utf-8')
+            self._journal_fp.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._journal_fp.flush()
+        except IOError as e:
+            # 保存失败不应中断程序，记录错误
+            print(f"警告：任务日志写入失败 - {e}")
+            return
+
+        self._journal_entries += 1
+        if compact and self._journal_entries >= self.compact_threshold:
+            self._compact()
+
+    def _compact(self):
+        """将内存任务表写为新快照并清空日志（调用方需持有锁）"""
+        self._archive_expired()
+        if not self._save_tasks():
+            return
+        try:
+            if self._journal_fp is not None:
+                self._journal_fp.close()
+            # 快照已包含全部变更，截断日志
+            self._journal_fp = open(self.journal_file, 'w', encoding='utf-8')
+            self._journal_entries = 0
+        except IOError as e:
+            print(f"警告：任务日志截断失败 - {e}")
+            self._journal_fp = None
+
+    def _save_tasks(self) -> bool:
+        """原子写入快照（先写临时文件再 rename），已归档的任务不再写入"""
+        tmp_file = f"{self.storage_file}.tmp"
+        snapshot = {
+            job_id: task for job_id, task in self.tasks.items()
+            if job_id not in self._archived
+        }
         try:
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.storage_file)
+            return True
         except IOError as e:
             # 保存失败不应中断程序，记录错误
             print(f"警告：任务保存失败 - {e}")
+            return False
 
     def _recover_stale_tasks(self):
         """
-        修复异常退出后仍处于 running 状态的任务
+        修复异常退出后仍处于执行中状态的任务
 
-        FastAPI 重启或进程异常退出后，jobs.json 中的 running 状态无法体现真实情况，
+        FastAPI 重启或进程异常退出后，jobs.json 中的执行中状态无法体现真实情况，
         需要在 TaskManager 初始化时将这些任务标记为 failed，避免前端持续显示进度条。
+        task.json 中的阶段断点保留，可由调度器或 resume 接口继续执行。
         """
-        updated = False
-        for job in self.tasks.values():
-            if job.get('status') == 'running':
-                job['status'] = 'failed'
-                job['message'] = '服务已重启，任务已中断，请重新开始或断点续传'
-                updated = True
-        if updated:
-            self._save_tasks()
+        stale = [
+            job_id for job_id, job in self.tasks.items()
+            if job.get('status') in ACTIVE_STATUSES
+        ]
+        for job_id in stale:
+            self._update_fields(job_id, {
+                'status': 'failed',
+                'message': INTERRUPTED_MESSAGE,
+            })
+
+
+def create_task_manager(task_store_cfg: Optional[Dict[str, Any]] = None):
+    """
+    根据配置创建任务管理器
+
+    Args:
+        task_store_cfg: config.yaml 中 workflow.task_store 配置，
+            backend 可选 json（默认）/ sqlite，可被环境变量 DIGITAL_HUMAN_TASK_BACKEND 覆盖
+
+    Returns:
+        TaskManager 或 SQLiteTaskManager 实例
+    """
+    cfg = task_store_cfg or {}
+    backend = (os.getenv("DIGITAL_HUMAN_TASK_BACKEND") or cfg.get("backend") or "json").lower()
+    storage_dir = cfg.get("storage_dir") or "temp"
+
+    retention_days = cfg.get("retention_days", 7)
+    id_allocator = UlidJobIdAllocator(prefix=cfg.get("job_id_prefix") or "aka-")
+    if backend == "sqlite":
+        from py.services.sqlite_task_manager import SQLiteTaskManager
+
+        return SQLiteTaskManager(
+            db_path=cfg.get("sqlite_path") or os.path.join(storage_dir, "jobs.db"),
+            legacy_json=os.path.join(storage_dir, "jobs.json"),
+            id_allocator=id_allocator,
+            lease_seconds=float(cfg.get("lease_seconds") or 120),
+            heartbeat_interval=float(cfg.get("heartbeat_seconds") or 30),
+        )
+    if backend != "json":
+        print(f"警告：未知任务存储后端 {backend}，改用 json")
+    return TaskManager(
+        storage_dir=storage_dir,
+        compact_threshold=int(cfg.get("compact_threshold") or 1000),
+        max_hot_tasks=int(cfg.get("max_hot_tasks") or 500),
+        retention_days=float(retention_days) if retention_days is not None else None,
+        id_allocator=id_allocator,
+    )
@@ -0,0 +1,149 @@
+"""
+WaveSpeed Webhook 回调中心 - 预测完成时直接唤醒等待中的阶段
+
+提交预测时附带 webhook URL（含一次性 token），拿到预测 ID 后登记 future；
+POST /api/webhooks/wavespeed 收到回调后校验 token（及可选的 HMAC 签名）并唤醒对应 future，
+轮询器只需低频兜底查询。未配置 public_url 时整体禁用，行为与纯轮询一致。
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+
+
+class WebhookHub:
+    """预测 ID -> 等待中的 future"""
+
+    # 回调先于登记到达时暂存的条目上限与有效期
+    MAX_EARLY = 1000
+    EARLY_TTL = 600.0
+    # 签名时间戳允许的偏差（秒）
+    SIGNATURE_TOLERANCE = 300
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger("WebhookHub")
+        self.public_url: Optional[str] = None
+        self.secret: Optional[str] = None
+        self._waiters: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._early: "OrderedDict[str, Tuple[str, Dict[str, Any], float]]" = OrderedDict()
+        self.delivered = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.public_url)
+
+    def configure(self, webhook_cfg: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Args:
+            webhook_cfg: wavespeed.webhook 配置 {enabled, public_url, secret}
+        """
+        cfg = webhook_cfg or {}
+        enabled = cfg.get("enabled", False) and cfg.get("public_url")
+        self.public_url = str(cfg["public_url"]).rstrip("/") if enabled else None
+        self.secret = cfg.get("secret") or None
+
+    def new_token(self) -> Optional[str]:
+        """生成一次性回调 token；未启用时返回 None"""
+        return secrets.token_urlsafe(16) if self.enabled else None
+
+    def submit_params(self, token: Optional[str]) -> Dict[str, str]:
+        """提交预测时附加的查询参数"""
+        if not token:
+            return {}
+        return {"webhook": f"{self.public_url}?{urlencode({'token': token})}"}
+
+    def register(self, prediction_id: Optional[str], token: Optional[str]) -> Optional[asyncio.Future]:
+        """登记等待中的预测；回调已提前到达时直接返回已完成的 future"""
+        if not token or not prediction_id:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        early = self._early.pop(prediction_id, None)
+        if early and hmac.compare_digest(early[0], token):
+            future.set_result(early[1])
+            return future
+        self._waiters[prediction_id] = (token, future)
+        future.add_done_callback(lambda _f: self._drop(prediction_id, future))
+        return future
+
+    def deliver(self, prediction_id: str, token: str, payload: Dict[str, Any]) -> bool:
+        """
+        投递回调
+
+        Returns:
+            True 表示唤醒了等待者或已暂存；token 不匹配时返回 False
+        """
+        waiter = self._waiters.get(prediction_id)
+        if waiter is None:
+            self._stash(prediction_id, token, payload)
+            return True
+        expected, future = waiter
+        if not hmac.compare_digest(expected, token):
+            self.rejected += 1
+            return False
+        self._waiters.pop(prediction_id, None)
+        if not future.done():
+            future.set_result(payload)
+        self.delivered += 1
+        return True
+
+    def verify_signature(self, headers: Mapping[str, str], body: bytes) -> bool:
+        """
+        校验回调签名（未配置 secret 时跳过）
+
+        签名为 HMAC-SHA256(secret, "{webhook-id}.{webhook-timestamp}.{body}") 的十六进制值，
+        webhook-signature 头可带版本前缀（如 "v3,<hex>"），多个签名以空格分隔。
+        """
+        if not self.secret:
+            return True
+        webhook_id = headers.get("webhook-id", "")
+        timestamp = headers.get("webhook-timestamp", "")
+        signatures = headers.get("webhook-signature", "")
+        try:
+            if abs(time.time() - int(timestamp)) > self.SIGNATURE_TOLERANCE:
+                return False
+        except ValueError:
+            return False
+        content = f"{webhook_id}.{timestamp}.".encode("utf-8") + body
+        expected = hmac.new(self.secret.encode("utf-8"), content, hashlib.sha256).hexdigest()
+        for item in signatures.split():
+            candidate = item.split(",", 1)[-1]
+            if hmac.compare_digest(candidate, expected):
+                return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "waiting": len(self._waiters),
+            "early": len(self._early),
+            "delivered": self.delivered,
+            "rejected": self.rejected,
+        }
+
+    def _drop(self, prediction_id: str, future: asyncio.Future) -> None:
+        waiter = self._waiters.get(prediction_id)
+        if waiter and waiter[1] is future:
+            self._waiters.pop(prediction_id, None)
+
+    def _stash(self, prediction_id: str, token: str, payload: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        while self._early:
+            oldest = next(iter(self._early.values()))
+            if len(self._early) < self.MAX_EARLY and now - oldest[2] <= self.EARLY_TTL:
+                break
+            self._early.popitem(last=False)
+        self._early[prediction_id] = (token, payload, now)
+
+
+webhook_hub = WebhookHub()
+
+
+__all__ = ["WebhookHub", "webhook_hub"]
@@ -0,0 +1,63 @@
+"""
+ArtifactCache 测试用例
+"""
+import time
+
+from py.services.artifact_cache import ArtifactCache
+
+
+def _write(path, size):
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_put_get_and_counters(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=1024)
+    key = ArtifactCache.make_key(text="你好", voice_id="v1")
+    assert cache.get(key) is None
+
+    cache.put(key, _write(tmp_path / "a.mp3", 10), {"audio_url": "https://x/a.mp3"})
+    entry = cache.get(key)
+
+    assert entry.meta["audio_url"] == "https://x/a.mp3"
+    assert entry.path.suffix == ".mp3"
+    target = cache.copy_to(entry, tmp_path / "out" / "speech.mp3")
+    assert target.read_bytes() == b"x" * 10
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_make_key_ignores_field_order():
+    assert ArtifactCache.make_key(a=1, b="2") == ArtifactCache.make_key(b="2", a=1)
+    assert ArtifactCache.make_key(a=1) != ArtifactCache.make_key(a=2)
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=250)
+    cache.put("k1", _write(tmp_path / "1.bin", 100))
+    cache.put("k2", _write(tmp_path / "2.bin", 100))
+    assert cache.get("k1") is not None  # k1 变为最近使用
+    cache.put("k3", _write(tmp_path / "3.bin", 100))
+
+    assert cache.get("k2") is None
+    assert cache.get("k1") is not None
+    assert cache.get("k3") is not None
+    assert cache.stats()["bytes"] == 200
+
+
+def test_ttl_expiry(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", ttl_seconds=60)
+    entry = cache.put("k1", _write(tmp_path / "1.bin", 5))
+    entry.created_at = time.time() - 120
+
+    assert cache.get("k1") is None
+    assert not entry.path.exists()
+
+
+def test_index_survives_restart(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache")
+    cache.put("k1", _write(tmp_path / "1.bin", 5), {"duration": 1.5})
+
+    reloaded = ArtifactCache(tmp_path / "cache")
+    assert reloaded.get("k1").meta == {"duration": 1.5}
+    assert reloaded.stats()["entries"] == 1
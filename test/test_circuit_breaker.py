@@ -0,0 +1,322 @@
+"""
+熔断器测试：状态切换、TaskRunner 快速失败与调度器暂缓出队
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from py.exceptions import ExternalAPIError
+from py.function.task_runner import TaskRequest, TaskRunner
+from py.services import circuit_breaker
+from py.services.circuit_breaker import CircuitBreaker, CircuitOpenError, is_breaker_failure
+from py.services.job_scheduler import JobScheduler
+from py.services.storage_service import StorageService
+
+
+def _server_error():
+    return ExternalAPIError(provider="infinitetalk", message="Bad Gateway", status_code=502)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_failure_classification():
+    assert is_breaker_failure(_server_error())
+    assert is_breaker_failure(ExternalAPIError(provider="minimax", message="限流", status_code=429))
+    assert is_breaker_failure(ExternalAPIError(provider="minimax", message="网络错误", status_code=0))
+    assert is_breaker_failure(ExternalAPIError(provider="minimax", message="超时", status_code=408))
+    assert not is_breaker_failure(ExternalAPIError(provider="minimax", message="参数错误", status_code=400))
+    assert not is_breaker_failure(CircuitOpenError("minimax", 10))
+    assert not CircuitOpenError("minimax", 10).is_retryable()
+
+
+@pytest.mark.asyncio
+async def test_trips_after_threshold_and_recovers_via_probe(clock):
+    breaker = CircuitBreaker("infinitetalk", failure_threshold=2, window_seconds=60, recovery_timeout=30)
+    failing = AsyncMock(side_effect=_server_error())
+
+    for _ in range(2):
+        with pytest.raises(ExternalAPIError):
+            await breaker.call(failing)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await breaker.call(failing)
+    assert failing.await_count == 2
+    assert exc_info.value.status_code == 503
+
+    clock[0] += 30
+    assert breaker.state == "half_open"
+    # 半开状态只放行一个探测请求，探测失败立即重新熔断
+    with pytest.raises(ExternalAPIError):
+        await breaker.call(failing)
+    assert breaker.state == "open"
+
+    clock[0] += 30
+    assert await breaker.call(AsyncMock(return_value="ok")) == "ok"
+    assert breaker.state == "closed"
+    stats = breaker.stats()
+    assert stats["trips"] == 2 and stats["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_outside_window_and_client_errors_do_not_trip(clock):
+    breaker = CircuitBreaker("minimax", failure_threshold=2, window_seconds=10)
+
+    with pytest.raises(ExternalAPIError):
+        await breaker.call(AsyncMock(side_effect=_server_error()))
+    clock[0] += 11
+    with pytest.raises(ExternalAPIError):
+        await breaker.call(AsyncMock(side_effect=_server_error()))
+    for _ in range(3):
+        with pytest.raises(ExternalAPIError):
+            await breaker.call(AsyncMock(side_effect=ExternalAPIError(
+                provider="minimax", message="参数错误", status_code=400,
+            )))
+    assert breaker.state == "closed"
+
+
+def test_half_open_limits_concurrent_probes(clock):
+    breaker = CircuitBreaker("seedream", failure_threshold=1, recovery_timeout=5)
+    breaker.record_failure()
+    assert breaker.admission_delay() == 5
+    clock[0] += 5
+    assert breaker.admission_delay() == 0
+
+    breaker.before_call()
+    # 探测在途时调度器继续暂缓，而不是放出排队任务让其快速失败
+    assert breaker.admission_delay() == circuit_breaker.PROBE_RECHECK_SECONDS
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.admission_delay() == 0
+
+
+def test_successes_do_not_reset_failure_window(clock):
+    breaker = CircuitBreaker("minimax", failure_threshold=2, window_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    clock[0] += 10
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_task_runner_fails_fast_while_provider_is_open(tmp_path):
+    avatar = MagicMock()
+    avatar.generate_images = AsyncMock(return_value=[{"url": "https://example.com/avatar.png"}])
+    voice = MagicMock()
+    voice.generate_voice = AsyncMock(return_value={
+        "audio_url": "https://example.com/speech.mp3", "audio_path": None, "duration": 3.0, "cost": 0.0,
+    })
+    video = MagicMock()
+    video.generate_video = AsyncMock(side_effect=_server_error())
+    runner = TaskRunner(
+        avatar_client=avatar,
+        voice_client=voice,
+        video_client=video,
+        storage_service=StorageService(output_root=tmp_path / "output"),
+        task_manager=MagicMock(),
+        circuit_breakers={"video": CircuitBreaker("infinitetalk", failure_threshold=1, recovery_timeout=60)},
+    )
+    request = TaskRequest(
+        avatar_mode="prompt",
+        avatar_prompt="测试头像",
+        avatar_upload_path=None,
+        speech_text="你好",
+        voice_id="female-shaonv",
+        resolution="720p",
+        speed=1.0,
+        pitch=0,
+        emotion="neutral",
+        seed=42,
+    )
+
+    with pytest.raises(ExternalAPIError):
+        await runner.run("aka-circuit-1", request)
+    calls = video.generate_video.await_count
+
+    with pytest.raises(CircuitOpenError):
+        await runner.run("aka-circuit-2", request)
+    assert video.generate_video.await_count == calls
+
+
+@pytest.mark.asyncio
+async def test_only_submission_is_guarded(tmp_path):
+    breaker = CircuitBreaker("infinitetalk", failure_threshold=1, recovery_timeout=60)
+    avatar = MagicMock()
+    avatar.generate_images = AsyncMock(return_value=[{"url": "https://example.com/avatar.png"}])
+    voice = MagicMock()
+    voice.generate_voice = AsyncMock(return_value={
+        "audio_url": "https://example.com/speech.mp3", "audio_path": None, "duration": 3.0, "cost": 0.0,
+    })
+    states = []
+
+    async def generate_video(on_submitted=None, **_kwargs):
+        on_submitted({"provider_task_id": "pred-1", "poll_url": "https://api.example.com/pred-1"})
+        states.append(breaker.stats()["state"])
+        raise ExternalAPIError(provider="infinitetalk", message="轮询超时", status_code=408)
+
+    video = MagicMock()
+    video.generate_video = generate_video
+    runner = TaskRunner(
+        avatar_client=avatar,
+        voice_client=voice,
+        video_client=video,
+        storage_service=StorageService(output_root=tmp_path / "output"),
+        task_manager=MagicMock(),
+        circuit_breakers={"video": breaker},
+    )
+    request = TaskRequest(
+        avatar_mode="prompt",
+        avatar_prompt="测试头像",
+        avatar_upload_path=None,
+        speech_text="你好",
+        voice_id="female-shaonv",
+        resolution="720p",
+        speed=1.0,
+        pitch=0,
+        emotion="neutral",
+        seed=42,
+    )
+
+    with pytest.raises(ExternalAPIError):
+        await runner.run("aka-poll-timeout", request)
+    # 提交成功后的轮询超时不计入熔断失败
+    assert states == ["closed"]
+    assert breaker.state == "closed"
+    assert breaker.stats()["recent_failures"] == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_holds_queue_while_circuit_is_open():
+    delays = [0.05, 0.0]
+    finished = asyncio.Event()
+
+    async def handler(job_id, payload):
+        finished.set()
+
+    scheduler = JobScheduler(handler, max_parallel=1, hold=lambda payload: delays.pop(0) if delays else 0.0)
+    scheduler.submit("job-held", {})
+    await asyncio.sleep(0.01)
+    assert scheduler.queue_position("job-held") == 1
+    assert scheduler.stats()["held"] is True
+
+    await asyncio.wait_for(finished.wait(), timeout=1)
+    await scheduler.stop()
+    assert scheduler.stats()["held"] is False
+
+
+@pytest.mark.asyncio
+async def test_hold_only_delays_jobs_needing_the_tripped_provider(clock):
+    circuit_breaker._BREAKERS.clear()
+    breaker = circuit_breaker.get_circuit_breaker("seedream", {"failure_threshold": 1, "recovery_timeout": 30})
+    breaker.record_failure()
+    started = []
+    done = asyncio.Event()
+
+    async def handler(job_id, payload):
+        started.append(job_id)
+        done.set()
+
+    def hold(payload):
+        providers = {"minimax", "infinitetalk"} | ({"seedream"} if payload.get("avatar_mode") == "prompt" else set())
+        return circuit_breaker.open_circuit_delay(providers)
+
+    scheduler = JobScheduler(handler, max_parallel=1, hold=hold)
+    try:
+        scheduler.submit("job-prompt", {"avatar_mode": "prompt"})
+        scheduler.submit("job-upload", {"avatar_mode": "upload"})
+        await asyncio.wait_for(done.wait(), timeout=1)
+        await asyncio.sleep(0.01)
+        # Seedream 熔断只暂缓 prompt 模式任务，upload 任务越过它先执行
+        assert started == ["job-upload"]
+        assert scheduler.queue_position("job-prompt") == 1
+        assert circuit_breaker.open_circuit_delay() == pytest.approx(30)
+        assert circuit_breaker.open_circuit_delay({"minimax"}) == 0.0
+    finally:
+        await scheduler.stop()
+        circuit_breaker._BREAKERS.clear()
+
+
+@pytest.mark.asyncio
+async def test_delayed_submit_waits_before_dequeue():
+    started = []
+
+    async def handler(job_id, payload):
+        started.append(job_id)
+
+    scheduler = JobScheduler(handler, max_parallel=1)
+    scheduler.submit("job-later", {}, delay=0.1)
+    scheduler.submit("job-now", {})
+    await asyncio.sleep(0.03)
+    assert started == ["job-now"]
+    assert scheduler.stats()["queued"] == 1
+    await asyncio.sleep(0.2)
+    await scheduler.stop()
+    assert started == ["job-now", "job-later"]
+
+
+@pytest.mark.asyncio
+async def test_half_open_breaker_closes_after_inline_seedream_result(tmp_path, clock, api_keys, mock_seedream_response):
+    from py.services.digital_human_service import DigitalHumanService
+
+    breaker = CircuitBreaker("seedream", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock[0] += 31
+    assert breaker.state == "half_open"
+
+    service = DigitalHumanService(
+        wavespeed_key=api_keys["wavespeed"],
+        minimax_key=api_keys["minimax"],
+        storage_service=StorageService(output_root=tmp_path / "output"),
+    )
+    service.avatar_cache = None
+    runner = service.task_runner
+    runner.circuit_breakers = {"avatar": breaker}
+    runner.finalizer = None
+    runner.voice_client = MagicMock()
+    runner.voice_client.generate_voice = AsyncMock(return_value={
+        "audio_url": "https://example.com/speech.mp3", "audio_path": None, "duration": 3.0, "cost": 0.0,
+    })
+
+    async def generate_video(output_path=None, **_kwargs):
+        output_path.write_bytes(b"video")
+        return {"video_url": "https://example.com/v.mp4", "video_path": str(output_path), "cost": 0.0}
+
+    runner.video_client = MagicMock()
+    runner.video_client.generate_video = generate_video
+    request = TaskRequest(
+        avatar_mode="prompt",
+        avatar_prompt="测试头像",
+        avatar_upload_path=None,
+        speech_text="你好",
+        voice_id="female-shaonv",
+        resolution="720p",
+        speed=1.0,
+        pitch=0,
+        emotion="neutral",
+        seed=42,
+    )
+
+    with patch("httpx.AsyncClient") as mock_client:
+        submit_response = MagicMock(is_success=True, status_code=200)
+        submit_response.json.return_value = mock_seedream_response
+        client = AsyncMock()
+        client.__aenter__.return_value = client
+        client.__aexit__.return_value = None
+        client.post = AsyncMock(return_value=submit_response)
+        mock_client.return_value = client
+        result = await runner.run("aka-inline", request)
+
+    # Seedream 在提交响应中直接返回 image_url：探测成功，熔断器恢复闭合
+    assert result["status"] == "finished"
+    client.post.assert_awaited_once()
+    assert breaker.state == "closed"
+    assert breaker.stats()["recent_failures"] == 0
+    assert result["stages"]["avatar"]["provider_task_id"] is None
@@ -9,7 +9,8 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from test.test_helpers import (
     assert_valid_url,
     assert_valid_duration,
-    assert_valid_cost
+    assert_valid_cost,
+    mock_stream_download,
 )
 
 
@@ -313,11 +314,53 @@ class TestDigitalHumanService:
                 speech_text="测试文本"
             )
 
-        billing = result.get("billing") or {}
+        # 余额对账在收尾队列中异步完成，结果回写 task.json
+        assert await service.finalizer.drain(timeout=5)
+        record = service.storage.load_metadata(job_id)
+        assert result["status"] == "finished"
+        billing = record.get("billing") or {}
         assert billing.get("balance_before") == pytest.approx(120.0)
         assert billing.get("balance_after") == pytest.approx(118.4)
         assert billing.get("actual_cost") == pytest.approx(1.6, rel=0.01)
-        assert result["cost"] == pytest.approx(1.6, rel=0.01)
+        assert billing.get("reconcile_state") == "completed"
+        assert record["cost"] == pytest.approx(1.6, rel=0.01)
+
+    @pytest.mark.asyncio
+    @pytest.mark.mock
+    async def test_generate_images_uses_avatar_cache(self, api_keys, tmp_path, mock_seedream_response):
+        from py.services.artifact_cache import ArtifactCache
+        from py.services.digital_human_service import DigitalHumanService
+        from py.services.storage_service import StorageService
+
+        service = DigitalHumanService(
+            wavespeed_key=api_keys['wavespeed'],
+            minimax_key=api_keys['minimax'],
+            storage_service=StorageService(output_root=tmp_path / "output"),
+        )
+        service.avatar_cache = ArtifactCache(tmp_path / "cache")
+
+        with patch('httpx.AsyncClient') as mock_client:
+            submit_response = MagicMock(is_success=True, status_code=200)
+            submit_response.json.return_value = mock_seedream_response
+            image_response = MagicMock(is_success=True, status_code=200, content=b"png-bytes")
+            mock_client_instance = AsyncMock()
+            mock_client_instance.__aenter__.return_value = mock_client_instance
+            mock_client_instance.__aexit__.return_value = None
+            mock_client_instance.post = AsyncMock(return_value=submit_response)
+            mock_client_instance.get = AsyncMock(return_value=image_response)
+            mock_stream_download(mock_client_instance, b"png-bytes")
+            mock_client.return_value = mock_client_instance
+
+            first = await service.generate_images(prompts=["专业  主持人"])
+            second = await service.generate_images(prompts=["专业 主持人"])
+            other = await service.generate_images(prompts=["专业 主持人"], resolution="512x512")
+
+        assert mock_client_instance.post.await_count == 2
+        assert first[0]["url"] == "https://example.com/test-avatar.png"
+        assert second[0]["cache_hit"] is True
+        assert second[0]["url"] == first[0]["url"]
+        assert open(second[0]["path"], "rb").read() == b"png-bytes"
+        assert "cache_hit" not in other[0]
 
     @pytest.mark.asyncio
     async def test_handle_avatar_upload_with_local_file(self, api_keys, tmp_path):
@@ -343,40 +386,40 @@ class TestDigitalHumanService:
 
     @pytest.mark.asyncio
     async def test_handle_avatar_upload_with_remote_url(self, api_keys, tmp_path):
+        import httpx
         from py.services.digital_human_service import DigitalHumanService
+        from py.services.http_pool import HttpClientPool
         from py.services.storage_service import StorageService
 
+        fake_content = b'remote-avatar'
+        requested = []
+
+        def handler(request):
+            requested.append(str(request.url))
+            return httpx.Response(200, content=fake_content)
+
+        pool = HttpClientPool()
+        await pool.start({"http2": False}, transport=httpx.MockTransport(handler))
         storage = StorageService(output_root=tmp_path)
         service = DigitalHumanService(
             wavespeed_key=api_keys['wavespeed'],
             minimax_key=api_keys['minimax'],
             storage_service=storage,
+            http_pool=pool,
         )
 
         target = storage.prepare_task_paths('aka-test-upload-remote').avatar_path
-        fake_content = b'remote-avatar'
-
-        mock_response = MagicMock()
-        mock_response.is_success = True
-        mock_response.content = fake_content
-        mock_response.status_code = 200
-
-        client_mock = AsyncMock()
-        client_mock.get.return_value = mock_response
-
-        ctx_mock = AsyncMock()
-        ctx_mock.__aenter__.return_value = client_mock
-
-        with patch('py.services.digital_human_service.httpx.AsyncClient', return_value=ctx_mock):
+        try:
             url = await service._handle_avatar_upload(
                 'aka-test-upload-remote',
                 'https://cdn.example.com/avatar.png',
                 target,
             )
+        finally:
+            await pool.close()
 
         assert target.read_bytes() == fake_content
-        client_mock.get.assert_called_once()
-        assert client_mock.get.call_args[0][0] == 'https://cdn.example.com/avatar.png'
+        assert requested == ['https://cdn.example.com/avatar.png']
         assert url.endswith('/output/aka-test-upload-remote/avatar.png')
 
 
@@ -435,9 +478,6 @@ class TestDigitalHumanServiceIntegration:
 
             # 验证状态更新顺序
             status_updates = [call[0][1] for call in mock_update_status.call_args_list]
-            assert "avatar_generating" in status_updates
-            assert "avatar_ready" in status_updates
-            assert "speech_generating" in status_updates
-            assert "speech_ready" in status_updates
-            assert "video_rendering" in status_updates
+            assert status_updates.index("assets_generating") < status_updates.index("assets_ready")
+            assert status_updates.index("assets_ready") < status_updates.index("video_rendering")
             assert "finished" in status_updates
@@ -57,9 +57,59 @@ async def test_digital_human_storage_publish(api_keys, tmp_path):
 
     task_paths = storage.prepare_task_paths(job_id)
     assert Path(result["video_path"]) == task_paths.video_path
-    assert result["video_url"].startswith("https://cdn.example.com/case/")
-    assert Path(result["assets"]["public_video_path"]).exists()
+    # 任务先以供应商 URL 完成，发布在收尾队列中异步执行
+    assert result["status"] == "finished"
+    assert result["video_url"] == "https://example.com/raw.mp4"
+    assert result["assets"]["publish_state"] == "pending"
 
+    assert await service.finalizer.drain(timeout=5)
     meta = storage.load_metadata(job_id)
-    assert meta["video_url"] == result["video_url"]
-    assert meta["assets"]["public_video_path"] == result["assets"]["public_video_path"]
+    assert meta["video_url"].startswith("https://cdn.example.com/case/")
+    assert meta["stages"]["video"]["output_url"] == meta["video_url"]
+    assert meta["assets"]["publish_state"] == "completed"
+    assert Path(meta["assets"]["public_video_path"]).exists()
+
+
+@pytest.mark.asyncio
+@pytest.mark.digital_human
+async def test_digital_human_storage_publish_inline_when_background_disabled(api_keys, tmp_path):
+    storage = StorageService(
+        output_root=tmp_path / "output",
+        public_base_url="https://cdn.example.com",
+        public_export_dir=tmp_path / "public",
+        namespace="case",
+    )
+    service = DigitalHumanService(
+        wavespeed_key=api_keys["wavespeed"],
+        minimax_key=api_keys["minimax"],
+        storage_service=storage,
+    )
+    service.finalizer = None
+    service.task_runner.finalizer = None
+    service._safe_fetch_balance = AsyncMock(side_effect=[10.0, 9.5])
+    provider_video = tmp_path / "provider.mp4"
+    provider_video.write_bytes(b"video-bytes")
+
+    with patch.object(service.avatar_client, "generate_images", new_callable=AsyncMock) as mock_avatar, \
+         patch.object(service.voice_client, "generate_voice", new_callable=AsyncMock) as mock_voice, \
+         patch.object(service.infinitetalk_client, "generate_video", new_callable=AsyncMock) as mock_video, \
+         patch.object(service.task_manager, "update_status"):
+        mock_avatar.return_value = [{"url": "https://example.com/avatar.png"}]
+        mock_voice.return_value = {"audio_url": "https://example.com/speech.mp3", "duration": 5.0, "cost": 0.01}
+        mock_video.return_value = {
+            "task_id": "task-456",
+            "video_url": "https://example.com/raw.mp4",
+            "video_path": str(provider_video),
+            "duration": 5.0,
+            "cost": 0.3,
+        }
+        result = await service.generate_digital_human(
+            job_id="aka-storage-002",
+            avatar_mode="prompt",
+            avatar_prompt="测试头像",
+            speech_text="hello world",
+        )
+
+    assert result["video_url"].startswith("https://cdn.example.com/case/")
+    assert "publish_state" not in result["assets"]
+    assert result["billing"]["actual_cost"] == pytest.approx(0.5)
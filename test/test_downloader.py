@@ -0,0 +1,129 @@
+"""
+流式下载测试：Range 续传、校验与原子替换
+"""
+import hashlib
+
+import httpx
+import pytest
+
+from py.exceptions import ExternalAPIError
+from py.services.downloader import stream_download
+from py.services.http_pool import HttpClientPool
+
+
+PAYLOAD = bytes(range(256)) * 64
+
+
+class _BrokenStream(httpx.AsyncByteStream):
+    """先输出部分数据再断开连接"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+        raise httpx.ReadError("connection reset")
+
+
+async def _pool(handler):
+    pool = HttpClientPool()
+    await pool.start({"http2": False}, transport=httpx.MockTransport(handler))
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_resumes_with_range_after_disconnect(tmp_path):
+    ranges = []
+
+    def handler(request):
+        ranges.append(request.headers.get("range"))
+        if len(ranges) == 1:
+            return httpx.Response(
+                200,
+                headers={"content-length": str(len(PAYLOAD))},
+                stream=_BrokenStream(PAYLOAD[:1000]),
+            )
+        start = int(request.headers["range"].split("=")[1].rstrip("-"))
+        return httpx.Response(
+            206,
+            headers={"content-range": f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}"},
+            content=PAYLOAD[start:],
+        )
+
+    pool = await _pool(handler)
+    target = tmp_path / "job" / "digital_human.mp4"
+    try:
+        result = await stream_download(
+            pool, "https://cdn.example.com/v.mp4", target,
+            provider="infinitetalk", backoff_seconds=0,
+            expected_sha256=hashlib.sha256(PAYLOAD).hexdigest(),
+        )
+    finally:
+        await pool.close()
+
+    assert ranges == [None, "bytes=1000-"]
+    assert target.read_bytes() == PAYLOAD
+    assert result["size"] == len(PAYLOAD) and result["resumed"] == 1
+    assert sorted(p.name for p in target.parent.iterdir()) == ["digital_human.mp4"]
+
+
+@pytest.mark.asyncio
+async def test_restarts_when_server_ignores_range(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request.headers.get("range"))
+        if len(calls) == 1:
+            return httpx.Response(200, stream=_BrokenStream(PAYLOAD[:10]))
+        return httpx.Response(200, content=PAYLOAD)
+
+    pool = await _pool(handler)
+    target = tmp_path / "speech.mp3"
+    try:
+        result = await stream_download(pool, "https://cdn.example.com/a.mp3", target, provider="minimax", backoff_seconds=0)
+    finally:
+        await pool.close()
+
+    assert calls == [None, "bytes=10-"]
+    assert target.read_bytes() == PAYLOAD
+    assert result["sha256"] == hashlib.sha256(PAYLOAD).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_checksum_mismatch_keeps_existing_target(tmp_path):
+    pool = await _pool(lambda request: httpx.Response(200, content=PAYLOAD))
+    target = tmp_path / "digital_human.mp4"
+    target.write_bytes(b"previous")
+    try:
+        with pytest.raises(ExternalAPIError) as exc_info:
+            await stream_download(
+                pool, "https://cdn.example.com/v.mp4", target,
+                provider="infinitetalk", expected_sha256="0" * 64,
+            )
+    finally:
+        await pool.close()
+
+    assert "校验失败" in exc_info.value.message
+    assert target.read_bytes() == b"previous"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["digital_human.mp4"]
+
+
+@pytest.mark.asyncio
+async def test_http_error_is_not_retried(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404)
+
+    pool = await _pool(handler)
+    try:
+        with pytest.raises(ExternalAPIError) as exc_info:
+            await stream_download(pool, "https://cdn.example.com/x", tmp_path / "x", provider="minimax", label="音频")
+    finally:
+        await pool.close()
+
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.provider == "minimax"
+    assert len(calls) == 1
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,140 @@
+"""
+收尾队列测试：重试、失败回调、并发上限，以及 TaskRunner 的异步发布
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from py.function.task_runner import TaskRequest, TaskRunner
+from py.services.finalization_queue import FinalizationQueue
+from py.services.storage_service import StorageService
+
+
+@pytest.mark.asyncio
+async def test_step_is_retried_until_success():
+    queue = FinalizationQueue(max_attempts=3, backoff_seconds=0)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise OSError("mount busy")
+
+    queue.submit("aka-1", "publish", flaky)
+    assert await queue.drain(timeout=1)
+
+    assert len(calls) == 3
+    assert queue.stats() == {"pending": 0, "running": 0, "completed": 1, "failed": 0, "retried": 2}
+
+
+@pytest.mark.asyncio
+async def test_on_failure_called_after_last_attempt():
+    queue = FinalizationQueue(max_attempts=2, backoff_seconds=0)
+    failures = []
+
+    async def broken():
+        raise PermissionError("read-only")
+
+    queue.submit("aka-2", "publish", broken, on_failure=failures.append)
+    await queue.drain(timeout=1)
+
+    assert len(failures) == 1 and isinstance(failures[0], PermissionError)
+    assert queue.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_on_failure_is_awaited():
+    queue = FinalizationQueue(max_attempts=1, backoff_seconds=0)
+    failures = []
+
+    async def broken():
+        raise OSError("mount gone")
+
+    async def record_failure(exc):
+        await asyncio.sleep(0)
+        failures.append(exc)
+
+    queue.submit("aka-3", "publish", broken, on_failure=record_failure)
+    await queue.drain(timeout=1)
+
+    assert len(failures) == 1 and isinstance(failures[0], OSError)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_and_stop_cancels_leftovers():
+    queue = FinalizationQueue(max_concurrency=2, backoff_seconds=0)
+    active = 0
+    peak = 0
+    release = asyncio.Event()
+
+    async def step():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            await release.wait()
+        finally:
+            active -= 1
+
+    for index in range(5):
+        queue.submit(f"aka-{index}", "billing", step)
+    await asyncio.sleep(0.01)
+    assert peak == 2 and queue.stats()["pending"] == 5
+
+    await queue.stop(timeout=0.01)
+    assert queue.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_task_runner_finishes_before_publish(tmp_path):
+    storage = StorageService(
+        output_root=tmp_path / "output",
+        public_base_url="https://cdn.example.com",
+        public_export_dir=tmp_path / "public",
+    )
+    avatar = MagicMock()
+    avatar.generate_images = AsyncMock(return_value=[{"url": "https://example.com/avatar.png"}])
+    voice = MagicMock()
+    voice.generate_voice = AsyncMock(return_value={"audio_url": "https://example.com/a.mp3", "duration": 2.0, "cost": 0.0})
+    video = MagicMock()
+
+    async def generate_video(output_path=None, **_kwargs):
+        output_path.write_bytes(b"video")
+        return {"video_url": "https://provider.example.com/v.mp4", "video_path": str(output_path), "cost": 0.1}
+
+    video.generate_video = generate_video
+    queue = FinalizationQueue(backoff_seconds=0)
+    runner = TaskRunner(
+        avatar_client=avatar,
+        voice_client=voice,
+        video_client=video,
+        storage_service=storage,
+        task_manager=MagicMock(),
+        finalizer=queue,
+    )
+    request = TaskRequest(
+        avatar_mode="prompt",
+        avatar_prompt="测试头像",
+        avatar_upload_path=None,
+        speech_text="你好",
+        voice_id="female-shaonv",
+        resolution="720p",
+        speed=1.0,
+        pitch=0,
+        emotion="neutral",
+        seed=42,
+    )
+
+    result = await runner.run("aka-final", request)
+    assert result["status"] == "finished"
+    assert result["video_url"] == "https://provider.example.com/v.mp4"
+    assert result["assets"]["public_video_path"] is None
+
+    assert await queue.drain(timeout=1)
+    meta = storage.load_metadata("aka-final")
+    assert meta["status"] == "finished"
+    assert meta["video_url"].startswith("https://cdn.example.com/ren/")
+    assert meta["assets"]["publish_state"] == "completed"
+    assert meta["assets"]["publish_method"] == "hardlink"
+    assert meta["stages"]["video"]["output_url"] == meta["video_url"]
@@ -32,6 +32,8 @@ def assert_valid_task_status(status: str):
     """验证任务状态"""
     valid_statuses = [
         "pending",
+        "assets_generating",
+        "assets_ready",
         "avatar_generating",
         "avatar_ready",
         "speech_generating",
@@ -184,6 +186,23 @@ def generate_mock_task_params(**overrides) -> Dict[str, Any]:
     return defaults
 
 
+def mock_stream_download(client_instance, content: bytes):
+    """为 mock 的 httpx 客户端补上流式下载（client.stream）"""
+    from unittest.mock import AsyncMock, MagicMock
+
+    response = MagicMock(is_success=True, status_code=200, headers={"content-length": str(len(content))})
+
+    async def aiter_bytes(_chunk_size=None):
+        yield content
+
+    response.aiter_bytes = aiter_bytes
+    stream_ctx = MagicMock()
+    stream_ctx.__aenter__ = AsyncMock(return_value=response)
+    stream_ctx.__aexit__ = AsyncMock(return_value=None)
+    client_instance.stream = MagicMock(return_value=stream_ctx)
+    return client_instance.stream
+
+
 # ============================================================================
 # 错误断言
 # ============================================================================
@@ -0,0 +1,55 @@
+"""
+HttpClientPool 共享连接池测试
+"""
+import httpx
+import pytest
+
+from py.services.http_pool import HttpClientPool
+
+
+@pytest.mark.asyncio
+async def test_shared_client_reused_and_counted():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.extensions.get("timeout"))
+        return httpx.Response(200, json={"ok": True})
+
+    pool = HttpClientPool()
+    await pool.start({"http2": False}, transport=httpx.MockTransport(handler))
+    try:
+        async with pool.client(timeout=5) as first:
+            await first.get("https://api.example.com/a")
+        async with pool.client(timeout=30) as second:
+            response = await second.post("https://api.example.com/b", json={})
+        assert response.json() == {"ok": True}
+        assert first._client is second._client
+        assert seen[0]["read"] == 5 and seen[1]["read"] == 30
+        stats = pool.stats()
+        assert stats["started"] is True
+        assert stats["requests"] == 2
+        assert stats["fallback_clients"] == 0
+    finally:
+        await pool.close()
+    assert pool.started is False
+
+
+@pytest.mark.asyncio
+async def test_fallback_client_when_not_started(monkeypatch):
+    pool = HttpClientPool()
+    async with pool.client(timeout=3) as client:
+        assert isinstance(client, httpx.AsyncClient)
+        assert client.timeout.read == 3
+    assert client.is_closed
+    assert pool.stats()["fallback_clients"] == 1
+
+
+@pytest.mark.asyncio
+async def test_http2_disabled_without_h2(monkeypatch):
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    pool = HttpClientPool()
+    await pool.start({"http2": True})
+    try:
+        assert pool.stats()["http2"] is False
+    finally:
+        await pool.close()
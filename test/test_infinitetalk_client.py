@@ -130,6 +130,38 @@ class TestInfiniteTalkClient:
             assert payload["mask_image"] == "https://example.com/mask.png"
             assert payload["prompt"] == "高质量数字人"
 
+    @pytest.mark.asyncio
+    @pytest.mark.mock
+    async def test_generate_video_reports_and_reattaches_prediction(self, client):
+        """测试提交后回调预测 ID，以及续接已提交的预测而不重新提交"""
+        submitted = []
+        with patch.object(client, 'submit', new_callable=AsyncMock) as mock_submit, \
+             patch.object(client, 'wait_for_result', new_callable=AsyncMock) as mock_wait, \
+             patch.object(client, 'download', new_callable=AsyncMock):
+
+            mock_submit.return_value = "task-456"
+            mock_wait.return_value = {"video_url": "https://example.com/video.mp4", "duration": 5.0}
+
+            await client.generate_video(
+                image_url="https://example.com/avatar.png",
+                audio_url="https://example.com/speech.mp3",
+                on_submitted=submitted.append,
+            )
+            assert submitted == [{
+                "provider_task_id": "task-456",
+                "poll_url": f"{client.base_url}/predictions/task-456/result",
+            }]
+
+            mock_submit.reset_mock()
+            result = await client.generate_video(
+                image_url="https://example.com/avatar.png",
+                audio_url="https://example.com/speech.mp3",
+                resume_prediction={"provider_task_id": "task-old"},
+            )
+            mock_submit.assert_not_called()
+            assert mock_wait.call_args[0][0] == "task-old"
+            assert result["task_id"] == "task-old"
+
     @pytest.mark.asyncio
     @pytest.mark.mock
     async def test_generate_video_timeout(self, client):
@@ -236,11 +268,8 @@ class TestInfiniteTalkClient:
             mock_wait.assert_called_once()
             call_args = mock_wait.call_args
             assert call_args[0][0] == "task-polling"
-            # 验证超时参数
-            assert "max_wait" in call_args[1]
-            assert call_args[1]["max_wait"] == 600  # 10分钟
-            assert "poll_interval" in call_args[1]
-            assert call_args[1]["poll_interval"] == 5  # 5秒
+            # 超时与间隔交由 runtime.polling 策略决定
+            assert client.poller.policy("video").timeout == 600  # 10分钟
 
     @pytest.mark.asyncio
     @pytest.mark.mock
@@ -0,0 +1,109 @@
+"""
+文件 I/O 线程池测试：线程外执行、并发上限、耗时统计与异步外观
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from py.services.io_executor import AsyncStorage, IOExecutor
+from py.services.storage_service import StorageService
+
+
+@pytest.mark.asyncio
+async def test_blocking_calls_do_not_stall_event_loop():
+    executor = IOExecutor(max_workers=2)
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def slow_read():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return threading.current_thread().name
+
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        names = await asyncio.gather(*(executor.run("disk.read", slow_read) for _ in range(5)))
+    finally:
+        beat.cancel()
+        executor.shutdown()
+
+    assert peak == 2
+    assert all(name.startswith("io") for name in names)
+    assert ticks >= 5
+    stats = executor.stats()["ops"]["disk.read"]
+    assert stats["calls"] == 5 and stats["errors"] == 0
+    assert stats["max_ms"] >= 50 and stats["avg_wait_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_raised_and_counted():
+    executor = IOExecutor(max_workers=1)
+
+    def broken():
+        raise PermissionError("read-only")
+
+    with pytest.raises(PermissionError):
+        await executor.run("disk.write", broken)
+    executor.shutdown()
+
+    assert executor.stats()["ops"]["disk.write"]["errors"] == 1
+    assert executor.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_async_storage_facade(tmp_path):
+    storage = StorageService(output_root=tmp_path / "output")
+    executor = IOExecutor(max_workers=2)
+    storage_io = AsyncStorage(storage, executor)
+
+    await asyncio.gather(*(
+        storage_io.save_metadata("aka-io", {"status": "running", "step": index})
+        for index in range(4)
+    ))
+    meta = await storage_io.load_metadata("aka-io")
+    executor.shutdown()
+
+    assert meta["status"] == "running"
+    assert storage_io.final_video_name == "digital_human.mp4"
+    assert sorted(p.name for p in (tmp_path / "output" / "aka-io").iterdir()) == ["task.json"]
+    ops = executor.stats()["ops"]
+    assert ops["storage.save_metadata"]["calls"] == 4
+    assert ops["storage.load_metadata"]["calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_update_metadata_serializes_read_modify_write(tmp_path):
+    storage = StorageService(output_root=tmp_path / "output")
+    executor = IOExecutor(max_workers=4)
+    storage.save_metadata("aka-lock", {"job_id": "aka-lock", "count": 0})
+
+    def bump(record):
+        record["count"] += 1
+        return record
+
+    # 每次调用新建外观（与路由中一致），写锁按任务 ID 共享
+    await asyncio.gather(*(
+        AsyncStorage(storage, executor).update_metadata("aka-lock", bump) for _ in range(10)
+    ))
+    skipped = await AsyncStorage(storage, executor).update_metadata("aka-lock", lambda record: None)
+    executor.shutdown()
+
+    assert storage.load_metadata("aka-lock")["count"] == 10
+    assert skipped["count"] == 10
+    assert executor.stats()["ops"]["storage.save_metadata"]["calls"] == 10
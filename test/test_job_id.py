@@ -0,0 +1,58 @@
+import re
+import threading
+
+from py.function.job_id import UlidJobIdAllocator
+from py.services.task_manager import TaskManager
+
+JOB_ID_PATTERN = re.compile(r"^aka-[0-9a-hjkmnp-tv-z]{26}$")
+
+
+def test_ids_have_prefix_and_fixed_length():
+    job_id = UlidJobIdAllocator().allocate()
+    assert JOB_ID_PATTERN.match(job_id)
+
+
+def test_ids_are_monotonic_within_same_millisecond():
+    allocator = UlidJobIdAllocator(clock=lambda: 1_700_000_000_000)
+    ids = [allocator.allocate() for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_ids_sort_by_creation_time():
+    ticks = iter([1_000, 2_000, 3_000])
+    allocator = UlidJobIdAllocator(clock=lambda: next(ticks))
+    first, second, third = allocator(), allocator(), allocator()
+    assert first < second < third
+
+
+def test_clock_going_backwards_keeps_order():
+    ticks = iter([5_000, 4_000])
+    allocator = UlidJobIdAllocator(clock=lambda: next(ticks))
+    assert allocator() < allocator()
+
+
+def test_separate_allocators_do_not_collide():
+    # 模拟多个进程：各自独立的分配器、相同的时钟
+    allocators = [UlidJobIdAllocator(clock=lambda: 42) for _ in range(8)]
+    ids = set()
+    lock = threading.Lock()
+
+    def _worker(allocator):
+        local = [allocator() for _ in range(500)]
+        with lock:
+            ids.update(local)
+
+    threads = [threading.Thread(target=_worker, args=(a,)) for a in allocators]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(ids) == 8 * 500
+
+
+def test_task_manager_uses_allocator(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path), id_allocator=UlidJobIdAllocator(prefix="job-"))
+    job_id = manager.create_task()
+    assert job_id.startswith("job-")
+    assert manager.get_task(job_id)["log_path"] == f"output/{job_id}/log.txt"
@@ -0,0 +1,61 @@
+"""
+JobMemo 任务结果复用测试
+"""
+from py.services.job_memo import JobMemo
+from py.services.storage_service import StorageService
+
+
+def _params(**overrides):
+    params = {
+        "avatar_mode": "prompt",
+        "avatar_prompt": "主播",
+        "speech_text": "你好，世界",
+        "voice_id": "male-qn-qingse",
+        "resolution": "720p",
+        "speed": 1,
+        "pitch": 0,
+        "emotion": "neutral",
+        "seed": 42,
+    }
+    params.update(overrides)
+    return params
+
+
+def test_fingerprint_normalizes_text_and_numbers():
+    base = JobMemo.fingerprint(_params())
+    assert JobMemo.fingerprint(_params(speech_text=" 你好，世界\n", speed=1.0)) == base
+    assert JobMemo.fingerprint(_params(seed=7)) != base
+    assert JobMemo.fingerprint(_params(character={"id": "c1", "name": "a"})) == \
+        JobMemo.fingerprint(_params(character={"id": "c1", "name": "b"}))
+
+
+def test_fingerprint_is_scoped_to_tenant():
+    base = JobMemo.fingerprint(_params(), tenant="ws-key-a")
+    assert JobMemo.fingerprint(_params(), tenant="ws-key-a") == base
+    assert JobMemo.fingerprint(_params(), tenant="ws-key-b") != base
+    assert JobMemo.fingerprint(_params()) != base
+
+
+def test_fingerprint_hashes_upload_content(tmp_path):
+    first = tmp_path / "a.png"
+    second = tmp_path / "b.png"
+    first.write_bytes(b"same")
+    second.write_bytes(b"same")
+    assert JobMemo.fingerprint(_params(avatar_mode="upload", avatar_upload_path=str(first))) == \
+        JobMemo.fingerprint(_params(avatar_mode="upload", avatar_upload_path=str(second)))
+
+
+def test_record_persists_index(tmp_path):
+    index_path = str(tmp_path / "memo.json")
+    JobMemo(index_path).record("fp", "aka-1")
+    assert JobMemo(index_path).lookup("fp") == "aka-1"
+
+
+def test_materialize_alias_drops_unfinished_source(tmp_path):
+    storage = StorageService(output_root=tmp_path / "output")
+    storage.save_metadata("aka-src", {"job_id": "aka-src", "status": "failed"})
+    memo = JobMemo(str(tmp_path / "memo.json"))
+    memo.record("fp", "aka-src")
+
+    assert memo.materialize_alias(storage, "fp", "aka-src", "aka-new") is None
+    assert memo.lookup("fp") is None
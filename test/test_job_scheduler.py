@@ -0,0 +1,172 @@
+"""
+JobScheduler 测试用例
+"""
+import asyncio
+import json
+import os
+import stat
+
+import pytest
+
+from py.services.job_scheduler import JobScheduler
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(tmp_path):
+    active = 0
+    peak = 0
+    done = asyncio.Event()
+    finished = []
+
+    async def handler(job_id, payload):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        finished.append(job_id)
+        if len(finished) == 6:
+            done.set()
+
+    scheduler = JobScheduler(handler, max_parallel=2, queue_path=str(tmp_path / "queue.json"))
+    for index in range(6):
+        scheduler.submit(f"job-{index}", {})
+
+    await asyncio.wait_for(done.wait(), timeout=2)
+    await scheduler.stop()
+
+    assert peak == 2
+    assert finished == [f"job-{index}" for index in range(6)]
+
+
+@pytest.mark.asyncio
+async def test_queue_position_and_registry(tmp_path):
+    release = asyncio.Event()
+
+    async def handler(job_id, payload):
+        await release.wait()
+
+    scheduler = JobScheduler(handler, max_parallel=1, queue_path=str(tmp_path / "queue.json"))
+    assert scheduler.submit("job-a", {}) == 0
+    assert scheduler.submit("job-b", {}) == 1
+    assert scheduler.submit("job-c", {}) == 2
+    await asyncio.sleep(0)
+
+    assert scheduler.is_running("job-a")
+    assert scheduler.queue_position("job-a") is None
+    assert scheduler.queue_position("job-c") == 2
+    assert [job["job_id"] for job in scheduler.running_jobs()] == ["job-a"]
+    assert scheduler.stats() == {"max_parallel": 1, "running": 1, "queued": 2}
+
+    release.set()
+    await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_submit_and_queue_position_agree():
+    release = asyncio.Event()
+
+    async def handler(job_id, payload):
+        await release.wait()
+
+    scheduler = JobScheduler(handler, max_parallel=2)
+    submitted = {job_id: scheduler.submit(job_id, {}) for job_id in ("job-a", "job-b", "job-c")}
+    assert submitted == {"job-a": 0, "job-b": 0, "job-c": 1}
+    assert {job_id: scheduler.queue_position(job_id) for job_id in submitted} == submitted
+
+    await asyncio.sleep(0)
+    assert scheduler.queue_position("job-a") is None
+    assert scheduler.queue_position("job-c") == 1
+
+    release.set()
+    await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_queue_is_persisted_and_restored(tmp_path):
+    queue_path = tmp_path / "queue.json"
+    blocker = asyncio.Event()
+
+    async def blocking_handler(job_id, payload):
+        await blocker.wait()
+
+    scheduler = JobScheduler(blocking_handler, max_parallel=1, queue_path=str(queue_path))
+    scheduler.submit("job-running", {"wavespeed_api_key": "secret-key"})
+    scheduler.submit("job-queued", {"n": 1})
+    await asyncio.sleep(0)
+    await scheduler.stop()
+
+    assert stat.S_IMODE(os.stat(queue_path).st_mode) == 0o600
+    entries = json.loads(queue_path.read_text(encoding="utf-8"))["entries"]
+    assert [e["job_id"] for e in entries] == ["job-running", "job-queued"]
+
+    interrupted = []
+    ran = []
+    done = asyncio.Event()
+
+    async def handler(job_id, payload):
+        ran.append((job_id, payload))
+        done.set()
+
+    restored = JobScheduler(
+        handler,
+        max_parallel=1,
+        queue_path=str(queue_path),
+        on_interrupted=lambda job_id, payload: interrupted.append(job_id),
+    )
+    restored.start()
+    await asyncio.wait_for(done.wait(), timeout=1)
+    await asyncio.sleep(0)
+    await restored.stop()
+
+    assert interrupted == ["job-running"]
+    assert ran == [("job-queued", {"n": 1})]
+    assert json.loads(queue_path.read_text(encoding="utf-8"))["entries"] == []
+
+
+@pytest.mark.asyncio
+async def test_handler_error_does_not_stop_worker(tmp_path):
+    done = asyncio.Event()
+    ran = []
+
+    async def handler(job_id, payload):
+        ran.append(job_id)
+        if job_id == "bad":
+            raise RuntimeError("boom")
+        done.set()
+
+    scheduler = JobScheduler(handler, max_parallel=1)
+    scheduler.submit("bad", {})
+    scheduler.submit("good", {})
+    await asyncio.wait_for(done.wait(), timeout=1)
+    await scheduler.stop()
+
+    assert ran == ["bad", "good"]
+
+
+@pytest.mark.asyncio
+async def test_interrupted_jobs_can_be_requeued_first(tmp_path):
+    queue_path = tmp_path / "queue.json"
+    queue_path.write_text(json.dumps({"version": 1, "entries": [
+        {"job_id": "job-old", "payload": {"n": 1}, "state": "running"},
+        {"job_id": "job-next", "payload": {"n": 2}, "state": "queued"},
+    ]}), encoding="utf-8")
+    ran = []
+    done = asyncio.Event()
+
+    async def handler(job_id, payload):
+        ran.append((job_id, payload))
+        if len(ran) == 2:
+            done.set()
+
+    scheduler = JobScheduler(
+        handler,
+        max_parallel=1,
+        queue_path=str(queue_path),
+        on_interrupted=lambda job_id, payload: {**payload, "resume": True},
+    )
+    scheduler.start()
+    await asyncio.wait_for(done.wait(), timeout=1)
+    await scheduler.stop()
+
+    assert ran == [("job-old", {"n": 1, "resume": True}), ("job-next", {"n": 2})]
@@ -10,7 +10,8 @@ from test.test_helpers import (
     assert_valid_url,
     assert_valid_duration,
     assert_valid_cost,
-    assert_valid_minimax_response
+    assert_valid_minimax_response,
+    mock_stream_download,
 )
 
 
@@ -59,6 +60,7 @@ class TestMiniMaxTTSService:
             mock_client_instance.post = AsyncMock(return_value=mock_response)
             mock_client_instance.get = AsyncMock(return_value=mock_response)
             mock_client.return_value = mock_client_instance
+            mock_stream_download(mock_client_instance, b"fake audio content")
 
             # 调用生成语音方法
             result = await service.generate_voice(
@@ -109,6 +111,7 @@ class TestMiniMaxTTSService:
             mock_client_instance.post = AsyncMock(return_value=mock_response)
             mock_client_instance.get = AsyncMock(return_value=mock_response)
             mock_client.return_value = mock_client_instance
+            mock_stream_download(mock_client_instance, b"fake audio")
 
             # 调用带所有参数
             result = await service.generate_voice(
@@ -165,6 +168,148 @@ class TestMiniMaxTTSService:
             assert "audio_url" in result
             assert result["audio_path"] is None
 
+    @pytest.mark.asyncio
+    @pytest.mark.mock
+    async def test_generate_voice_reports_and_reattaches_prediction(self, service):
+        """测试拿到轮询地址后回调，以及续接已提交的预测"""
+        submit_response = MagicMock(is_success=True, status_code=200)
+        submit_response.json.return_value = {
+            "data": {"id": "pred-1", "urls": {"get": "https://api.example.com/predictions/pred-1/result"}}
+        }
+        poll_response = MagicMock(is_success=True, status_code=200)
+        poll_response.json.return_value = {
+            "data": {"status": "completed", "outputs": ["https://example.com/a.mp3"], "duration": 2.0}
+        }
+
+        with patch('httpx.AsyncClient') as mock_client:
+            mock_client_instance = AsyncMock()
+            mock_client_instance.__aenter__.return_value = mock_client_instance
+            mock_client_instance.__aexit__.return_value = None
+            mock_client_instance.post = AsyncMock(return_value=submit_response)
+            mock_client_instance.get = AsyncMock(return_value=poll_response)
+            mock_client.return_value = mock_client_instance
+
+            submitted = []
+            result = await service.generate_voice(text="你好", on_submitted=submitted.append)
+            assert submitted == [{
+                "provider_task_id": "pred-1",
+                "poll_url": "https://api.example.com/predictions/pred-1/result",
+            }]
+            assert result["audio_url"] == "https://example.com/a.mp3"
+
+            mock_client_instance.post.reset_mock()
+            result = await service.generate_voice(
+                text="你好",
+                resume_prediction={"provider_task_id": "pred-1", "poll_url": "https://api.example.com/predictions/pred-1/result"},
+            )
+            mock_client_instance.post.assert_not_called()
+            assert result["audio_url"] == "https://example.com/a.mp3"
+
+    @pytest.mark.asyncio
+    @pytest.mark.mock
+    async def test_generate_voice_cache_hit_skips_api(self, api_keys, mock_minimax_response, tmp_path):
+        """测试相同文本与音色参数第二次命中缓存"""
+        from py.services.artifact_cache import ArtifactCache
+        from py.services.minimax_tts_service import MiniMaxTTSService
+
+        cache = ArtifactCache(tmp_path / "cache")
+        service = MiniMaxTTSService(api_key=api_keys["minimax"], cache=cache)
+
+        with patch('httpx.AsyncClient') as mock_client:
+            mock_response = MagicMock(is_success=True, status_code=200)
+            mock_response.json.return_value = mock_minimax_response
+            mock_response.content = b"fake audio content"
+            mock_client_instance = AsyncMock()
+            mock_client_instance.__aenter__.return_value = mock_client_instance
+            mock_client_instance.__aexit__.return_value = None
+            mock_client_instance.post = AsyncMock(return_value=mock_response)
+            mock_client_instance.get = AsyncMock(return_value=mock_response)
+            mock_client.return_value = mock_client_instance
+            mock_stream_download(mock_client_instance, b"fake audio content")
+
+            first = await service.generate_voice(text="欢迎  光临", voice_id="female-shaonv", output_path=tmp_path / "a.mp3")
+            mock_client_instance.post.reset_mock()
+            mock_client_instance.get.reset_mock()
+            second = await service.generate_voice(text="欢迎 光临 ", voice_id="female-shaonv", output_path=tmp_path / "b.mp3")
+
+        mock_client_instance.post.assert_not_called()
+        mock_client_instance.get.assert_not_called()
+        assert second["cache_hit"] is True
+        assert second["cost"] == 0.0
+        assert second["audio_url"] == first["audio_url"]
+        assert (tmp_path / "b.mp3").read_bytes() == b"fake audio content"
+        assert cache.stats()["hits"] == 1
+
+    @staticmethod
+    def _mock_tts_client(mock_client, mock_minimax_response):
+        mock_response = MagicMock(is_success=True, status_code=200)
+        mock_response.json.return_value = mock_minimax_response
+        mock_response.content = b"fake audio content"
+        mock_client_instance = AsyncMock()
+        mock_client_instance.__aenter__.return_value = mock_client_instance
+        mock_client_instance.__aexit__.return_value = None
+        mock_client_instance.post = AsyncMock(return_value=mock_response)
+        mock_client_instance.get = AsyncMock(return_value=mock_response)
+        mock_client.return_value = mock_client_instance
+        mock_stream_download(mock_client_instance, b"fake audio content")
+        return mock_client_instance
+
+    @pytest.mark.asyncio
+    @pytest.mark.mock
+    async def test_cache_hit_returns_published_url(self, api_keys, mock_minimax_response, tmp_path):
+        """测试缓存音频发布到公共目录，命中时返回长期有效的 URL"""
+        from py.services.artifact_cache import ArtifactCache
+        from py.services.io_executor import AsyncStorage
+        from py.services.minimax_tts_service import MiniMaxTTSService
+        from py.services.storage_service import StorageService
+
+        storage = StorageService(
+            output_root=tmp_path / "output",
+            public_base_url="https://cdn.example.com",
+            public_export_dir=tmp_path / "public",
+        )
+        cache = ArtifactCache(tmp_path / "cache")
+        service = MiniMaxTTSService(
+            api_key=api_keys["minimax"], cache=cache, publisher=AsyncStorage(storage)
+        )
+
+        with patch('httpx.AsyncClient') as mock_client:
+            client = self._mock_tts_client(mock_client, mock_minimax_response)
+            first = await service.generate_voice(text="欢迎光临", output_path=tmp_path / "a.mp3")
+            client.post.reset_mock()
+            second = await service.generate_voice(text="欢迎光临", output_path=tmp_path / "b.mp3")
+
+        client.post.assert_not_called()
+        client.request.assert_not_called()
+        assert second["cache_hit"] is True
+        assert second["audio_url"] != first["audio_url"]
+        assert second["audio_url"].startswith("https://cdn.example.com/ren/cache/tts-cache/")
+        published = list((tmp_path / "public" / "ren" / "cache" / "tts-cache").iterdir())
+        assert [path.read_bytes() for path in published] == [b"fake audio content"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.mock
+    async def test_cache_hit_with_expired_url_regenerates(self, api_keys, mock_minimax_response, tmp_path):
+        """测试未发布的缓存条目在供应商 URL 失效后重新生成"""
+        from py.services.artifact_cache import ArtifactCache
+        from py.services.minimax_tts_service import MiniMaxTTSService
+
+        cache = ArtifactCache(tmp_path / "cache")
+        service = MiniMaxTTSService(api_key=api_keys["minimax"], cache=cache)
+
+        with patch('httpx.AsyncClient') as mock_client:
+            client = self._mock_tts_client(mock_client, mock_minimax_response)
+            await service.generate_voice(text="欢迎光临", output_path=tmp_path / "a.mp3")
+            client.post.reset_mock()
+            client.request = AsyncMock(return_value=MagicMock(is_success=False, status_code=403))
+            second = await service.generate_voice(text="欢迎光临", output_path=tmp_path / "b.mp3")
+
+        client.request.assert_awaited_once()
+        assert client.request.call_args.args[0] == "HEAD"
+        client.post.assert_called_once()
+        assert "cache_hit" not in second
+        assert second["cost"] > 0
+
     @pytest.mark.asyncio
     @pytest.mark.mock
     async def test_generate_voice_api_error(self, service, test_output_dir):
@@ -232,6 +377,7 @@ class TestMiniMaxTTSService:
             mock_client_instance.__aexit__.return_value = None
             mock_client_instance.get = AsyncMock(return_value=mock_response)
             mock_client.return_value = mock_client_instance
+            mock_stream_download(mock_client_instance, b"fake audio content data")
 
             # 调用下载方法
             await service._download_audio(audio_url, target_path)
@@ -288,6 +434,7 @@ class TestMiniMaxTTSService:
             mock_client_instance.post = AsyncMock(return_value=mock_response)
             mock_client_instance.get = AsyncMock(return_value=mock_response)
             mock_client.return_value = mock_client_instance
+            mock_stream_download(mock_client_instance, b"fake")
 
             await service.generate_voice(
                 text="测试",
@@ -0,0 +1,177 @@
+"""
+PredictionPoller 统一轮询测试
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from py.exceptions import ExternalAPIError
+from py.services.http_pool import HttpClientPool
+from py.services.prediction_poller import (
+    PollingPolicy,
+    PollMultiplexer,
+    PollStats,
+    PredictionPoller,
+    TimingWheel,
+)
+
+URL = "https://api.example.com/predictions/p1/result"
+
+
+async def _poller(responses, **policy_overrides):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        item = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    pool = HttpClientPool()
+    await pool.start({"http2": False}, transport=httpx.MockTransport(handler))
+    policy = PollingPolicy(
+        initial_interval=0, max_interval=0, jitter=0, network_backoff=0, timeout=5,
+        **policy_overrides,
+    )
+    return PredictionPoller(pool, stats=PollStats()), pool, policy, calls
+
+
+def test_policy_from_config():
+    cfg = {
+        "initial_interval_seconds": 1,
+        "check_interval_seconds": 4,
+        "interval_multiplier": 2,
+        "jitter": 0,
+        "max_wait_seconds": {"image": 120},
+        "backoff_seconds": 5,
+        "max_backoff_seconds": 30,
+    }
+    policy = PollingPolicy.from_config(cfg, "image")
+    assert policy.timeout == 120
+    assert [policy.interval(n) for n in range(4)] == [1, 2, 4, 4]
+    assert [policy.network_delay(n) for n in (1, 2, 3, 4)] == [5, 10, 20, 30]
+    assert PollingPolicy.from_config(cfg, "video").timeout == 600
+
+
+@pytest.mark.asyncio
+async def test_poll_until_completed_with_transient_errors():
+    responses = [
+        httpx.ConnectError("boom"),
+        httpx.Response(503),
+        httpx.Response(200, json={"data": {"status": "processing"}}),
+        httpx.Response(200, json={"data": {"status": "completed", "outputs": ["u"]}}),
+    ]
+    poller, pool, policy, calls = await _poller(responses)
+    try:
+        data = await poller.poll(URL, provider="seedream", kind="image", policy=policy)
+    finally:
+        await pool.close()
+    assert data["outputs"] == ["u"]
+    assert len(calls) == 4
+    stats = poller.stats.snapshot()["seedream"]
+    assert stats["network_errors"] == 2 and stats["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_poll_gives_up_after_network_retries():
+    poller, pool, policy, calls = await _poller([httpx.ConnectError("down")], max_network_retries=2)
+    try:
+        with pytest.raises(ExternalAPIError):
+            await poller.poll(URL, provider="minimax", kind="speech", policy=policy)
+    finally:
+        await pool.close()
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_poll_failed_state_and_client_error():
+    poller, pool, policy, _ = await _poller(
+        [httpx.Response(200, json={"status": "failed", "error": "bad input"})]
+    )
+    try:
+        with pytest.raises(ExternalAPIError) as exc_info:
+            await poller.poll(URL, provider="infinitetalk", kind="video", policy=policy)
+        assert "bad input" in str(exc_info.value)
+    finally:
+        await pool.close()
+
+    poller, pool, policy, calls = await _poller([httpx.Response(404, json={})])
+    try:
+        with pytest.raises(ExternalAPIError):
+            await poller.poll(URL, provider="infinitetalk", kind="video", policy=policy)
+    finally:
+        await pool.close()
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_poll_times_out():
+    poller, pool, policy, _ = await _poller(
+        [httpx.Response(200, json={"status": "processing"})]
+    )
+    policy.timeout = 0.05
+    try:
+        with pytest.raises(ExternalAPIError) as exc_info:
+            await poller.poll(URL, provider="seedream", kind="image", policy=policy)
+    finally:
+        await pool.close()
+    assert exc_info.value.status_code == 408
+    assert poller.stats.snapshot()["seedream"]["timeouts"] == 1
+
+
+def test_timing_wheel_rounds():
+    wheel = TimingWheel(tick=1, slots=4)
+    wheel.schedule("a", 1)
+    wheel.schedule("b", 6)
+    assert wheel.advance() == ["a"]
+    assert [wheel.advance() for _ in range(4)] == [[], [], [], []]
+    assert wheel.advance() == ["b"]
+    assert len(wheel) == 0
+
+
+@pytest.mark.asyncio
+async def test_multiplexer_resolves_many_predictions():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        count = seen[request.url.path] = seen.get(request.url.path, 0) + 1
+        status = "completed" if count >= 2 else "processing"
+        return httpx.Response(200, json={"status": status, "id": request.url.path})
+
+    pool = HttpClientPool()
+    await pool.start({"http2": False}, transport=httpx.MockTransport(handler))
+    multiplexer = PollMultiplexer()
+    multiplexer.start({"tick_seconds": 0.01, "max_qps": 1000, "max_concurrency": 5}, http_pool=pool)
+    poller = PredictionPoller(pool, stats=PollStats(), multiplexer=multiplexer)
+    policy = PollingPolicy(initial_interval=0.01, max_interval=0.01, jitter=0, timeout=5)
+    try:
+        results = await asyncio.gather(*[
+            poller.poll(f"https://api.example.com/p{i}", provider="seedream", kind="image", policy=policy)
+            for i in range(20)
+        ])
+    finally:
+        await multiplexer.stop()
+        await pool.close()
+    assert sorted(r["id"] for r in results) == sorted(f"/p{i}" for i in range(20))
+    assert multiplexer.dispatched == 40
+    assert poller.stats.snapshot()["seedream"]["completed"] == 20
+
+
+@pytest.mark.asyncio
+async def test_multiplexer_propagates_failures():
+    pool = HttpClientPool()
+    await pool.start(
+        {"http2": False},
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"status": "failed"})),
+    )
+    multiplexer = PollMultiplexer()
+    multiplexer.start({"tick_seconds": 0.01}, http_pool=pool)
+    poller = PredictionPoller(pool, stats=PollStats(), multiplexer=multiplexer)
+    try:
+        with pytest.raises(ExternalAPIError):
+            await poller.poll(URL, provider="minimax", kind="speech")
+    finally:
+        await multiplexer.stop()
+        await pool.close()
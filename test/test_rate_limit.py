@@ -0,0 +1,73 @@
+"""
+限流器测试：异步令牌桶与同步限流器
+"""
+import time
+
+import pytest
+
+from py.function import rate_limit
+from py.function.rate_limit import RateLimiter, get_rate_limiter
+from py.services.rate_limiter import RateLimiter as SyncRateLimiter
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_spaces_requests(monkeypatch):
+    clock = [1000.0]
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", fake_sleep)
+    limiter = RateLimiter(max_per_minute=2, name="test")
+
+    assert await limiter.acquire() == 0
+    assert await limiter.acquire() == 0
+    assert await limiter.acquire() == pytest.approx(30.0)
+    assert await limiter.acquire() == pytest.approx(60.0)
+    clock[0] += 120
+    assert await limiter.acquire() == 0
+    assert sleeps == [pytest.approx(30.0), pytest.approx(60.0)]
+    stats = limiter.stats()
+    assert stats["waited"] == 2 and stats["max_wait_seconds"] == pytest.approx(60.0)
+
+
+@pytest.mark.asyncio
+async def test_daily_bucket_limits_independently(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: 50.0)
+
+    async def fake_sleep(_seconds):
+        return None
+
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", fake_sleep)
+    limiter = RateLimiter(max_per_minute=100, max_per_day=1)
+    assert await limiter.acquire() == 0
+    assert await limiter.acquire() == pytest.approx(86400.0)
+
+
+def test_registry_shares_limiter_per_provider_and_key(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_LIMITERS", {})
+    cfg = {"video_generation": {"max_requests_per_minute": 3}}
+    first = get_rate_limiter("infinitetalk", "ws-key-a", cfg)
+    assert get_rate_limiter("infinitetalk", "ws-key-a", cfg) is first
+    assert get_rate_limiter("infinitetalk", "ws-key-b", cfg) is not first
+    assert get_rate_limiter("seedream", "ws-key-a", cfg) is None
+    assert "ws-key-a" not in first.name
+
+
+def test_sync_limiter_does_not_sleep_inside_lock(monkeypatch):
+    limiter = SyncRateLimiter(max_requests_per_minute=600, name="sync")
+    lock_free_during_sleep = []
+
+    def fake_sleep(_seconds):
+        acquired = limiter.lock.acquire(blocking=False)
+        lock_free_during_sleep.append(acquired)
+        if acquired:
+            limiter.lock.release()
+
+    monkeypatch.setattr(time, "sleep", fake_sleep)
+    limiter.acquire()
+    limiter.acquire()
+    assert lock_free_during_sleep == [True]
+    assert limiter.get_stats()["requests_last_minute"] == 2
@@ -1,12 +1,13 @@
 """
 数字人 API 路由测试
 """
+import asyncio
 import io
 import importlib
 import importlib.util
 import sys
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import FastAPI
@@ -43,6 +44,7 @@ routes_module = _import_project_module("py.api.routes_digital_human")
 router = routes_module.router
 register_exception_handlers = routes_module.register_exception_handlers
 resolve_upload_path = routes_module._resolve_upload_file_path
+API_KEY = "ws-test-key-123"
 
 
 @pytest.fixture
@@ -63,45 +65,73 @@ class TestDigitalHumanRoutes:
 
     def test_create_task_prompt_mode(self, client):
         with patch.object(routes_module, "task_manager") as mock_tm, \
-             patch.object(routes_module.asyncio, "create_task", side_effect=_consume_task) as mock_create_task:
+             patch.object(routes_module, "job_memo") as mock_memo, \
+             patch.object(routes_module, "job_scheduler") as mock_scheduler:
             mock_tm.create_task.return_value = "aka-test-001"
+            mock_memo.fingerprint.return_value = "fp-001"
+            mock_memo.lookup.return_value = None
+            mock_scheduler.submit.return_value = 0
             response = client.post("/api/tasks", json={
                 "avatar_mode": "prompt",
                 "avatar_prompt": "专业主持人",
-                "speech_text": "欢迎来到数字人工作室"
+                "speech_text": "欢迎来到数字人工作室",
+                "wavespeed_api_key": API_KEY,
             })
         assert response.status_code == 200
         data = response.json()
         assert data["job_id"] == "aka-test-001"
         assert data["status"] == "pending"
         assert data["links"]["self"] == "/api/tasks/aka-test-001"
-        mock_create_task.assert_called_once()
+        assert data["queue_position"] is None
+        job_id, payload = mock_scheduler.submit.call_args[0]
+        assert job_id == "aka-test-001"
+        assert payload["avatar_mode"] == "prompt"
+        assert payload["avatar_prompt"] == "专业主持人"
+        assert payload["speech_text"] == "欢迎来到数字人工作室"
+        assert payload["wavespeed_api_key"] == API_KEY
+        assert payload["fingerprint"] == "fp-001"
 
     def test_create_task_upload_mode(self, client):
         with patch.object(routes_module, "task_manager") as mock_tm, \
-             patch.object(routes_module.asyncio, "create_task", side_effect=_consume_task):
+             patch.object(routes_module, "job_memo") as mock_memo, \
+             patch.object(routes_module, "job_scheduler") as mock_scheduler:
             mock_tm.create_task.return_value = "aka-test-002"
+            mock_memo.lookup.return_value = None
+            mock_scheduler.submit.return_value = 3
             response = client.post("/api/tasks", json={
                 "avatar_mode": "upload",
                 "avatar_upload_url": "/tmp/avatar.png",
-                "speech_text": "请开始你的表演"
+                "speech_text": "请开始你的表演",
+                "wavespeed_api_key": API_KEY,
             })
         assert response.status_code == 200
+        data = response.json()
+        assert data["queue_position"] == 3
+        assert "排队位置: 3" in data["message"]
+        payload = mock_scheduler.submit.call_args[0][1]
+        assert payload["avatar_mode"] == "upload"
+        assert payload["avatar_upload_path"] == "/tmp/avatar.png"
 
     def test_create_task_missing_avatar_prompt(self, client):
-        response = client.post("/api/tasks", json={
-            "avatar_mode": "prompt",
-            "speech_text": "测试"
-        })
+        with patch.object(routes_module, "job_scheduler") as mock_scheduler:
+            response = client.post("/api/tasks", json={
+                "avatar_mode": "prompt",
+                "speech_text": "测试",
+                "wavespeed_api_key": API_KEY,
+            })
         assert response.status_code == 400
         assert "avatar_prompt" in response.json()["detail"]
+        mock_scheduler.submit.assert_not_called()
 
     def test_create_task_missing_avatar_upload_url(self, client):
-        response = client.post("/api/tasks", json={
-            "avatar_mode": "upload",
-            "speech_text": "测试"
-        })
+        with patch.object(routes_module, "job_scheduler") as mock_scheduler:
+            response = client.post("/api/tasks", json={
+                "avatar_mode": "upload",
+                "speech_text": "测试",
+                "wavespeed_api_key": API_KEY,
+            })
         assert response.status_code == 400
+        mock_scheduler.submit.assert_not_called()
 
     def test_get_task_status(self, client):
         task_meta = {
@@ -145,6 +175,98 @@ class TestDigitalHumanRoutes:
             response = client.get("/api/tasks/aka-missing")
         assert response.status_code == 404
 
+    def test_resume_task_requeues_from_checkpoint(self, client):
+        task_meta = {
+            "job_id": "aka-resume",
+            "status": "video_rendering",
+            "params": {"avatar_mode": "prompt", "avatar_prompt": "主播", "speech_text": "你好"},
+            "stages": {"avatar": {"state": "completed"}, "speech": {"state": "completed"}},
+        }
+        with patch.object(routes_module, "task_manager") as mock_tm, \
+             patch.object(routes_module, "storage_service") as mock_storage, \
+             patch.object(routes_module, "job_scheduler") as mock_scheduler:
+            mock_tm.get_task.return_value = {"status": "failed"}
+            mock_storage.load_metadata.return_value = task_meta
+            mock_scheduler.is_running.return_value = False
+            mock_scheduler.queue_position.return_value = None
+            mock_scheduler.submit.return_value = 0
+
+            response = client.post(
+                "/api/tasks/aka-resume/resume",
+                json={"wavespeed_api_key": "ws-test-key-123"},
+            )
+
+        assert response.status_code == 200
+        job_id, payload = mock_scheduler.submit.call_args[0]
+        assert job_id == "aka-resume"
+        assert payload["resume"] is True
+        assert payload["avatar_prompt"] == "主播"
+        assert payload["wavespeed_api_key"] == "ws-test-key-123"
+
+    def test_resume_task_without_checkpoint(self, client):
+        with patch.object(routes_module, "task_manager") as mock_tm, \
+             patch.object(routes_module, "storage_service") as mock_storage, \
+             patch.object(routes_module, "job_scheduler") as mock_scheduler:
+            mock_tm.get_task.return_value = {"status": "failed"}
+            mock_storage.load_metadata.return_value = {}
+            mock_scheduler.is_running.return_value = False
+            mock_scheduler.queue_position.return_value = None
+
+            response = client.post(
+                "/api/tasks/aka-none/resume",
+                json={"wavespeed_api_key": "ws-test-key-123"},
+            )
+
+        assert response.status_code == 409
+        mock_scheduler.submit.assert_not_called()
+
+    def test_create_task_reuses_finished_job(self, client, tmp_path):
+        storage = routes_module.StorageService(output_root=tmp_path / "output")
+        memo = routes_module.JobMemo(index_path=str(tmp_path / "memo.json"))
+        request_body = {
+            "avatar_mode": "prompt",
+            "avatar_prompt": "主播",
+            "speech_text": "你好 世界",
+            "wavespeed_api_key": "ws-test-key-123",
+        }
+        source_paths = storage.prepare_task_paths("aka-source")
+        source_paths.video_path.write_bytes(b"video")
+        storage.save_metadata("aka-source", {
+            "job_id": "aka-source",
+            "status": "finished",
+            "video_url": "https://cdn.example.com/ren/aka-source/digital_human.mp4",
+            "cost": 1.5,
+            "assets": {"video_path": str(source_paths.video_path)},
+        })
+
+        with patch.object(routes_module, "task_manager") as mock_tm, \
+             patch.object(routes_module, "storage_service", storage), \
+             patch.object(routes_module, "job_memo", memo), \
+             patch.object(routes_module, "job_scheduler") as mock_scheduler:
+            mock_tm.create_task.side_effect = ["aka-first", "aka-alias", "aka-fresh", "aka-tenant"]
+            mock_scheduler.submit.return_value = 0
+
+            first = client.post("/api/tasks", json=request_body)
+            payload = mock_scheduler.submit.call_args[0][1]
+            memo.record(payload["fingerprint"], "aka-source")
+
+            alias = client.post("/api/tasks", json={**request_body, "speech_text": "你好  世界 "})
+            fresh = client.post("/api/tasks", json={**request_body, "reuse_cached": False})
+            other_tenant = client.post("/api/tasks", json={**request_body, "wavespeed_api_key": "ws-other-key-456"})
+
+        assert first.json()["status"] == "pending"
+        data = alias.json()
+        assert data["status"] == "finished"
+        assert data["cost"] == 0.0
+        assert data["video_url"].endswith("aka-source/digital_human.mp4")
+        alias_meta = storage.load_metadata("aka-alias")
+        assert alias_meta["alias_of"] == "aka-source"
+        assert (tmp_path / "output" / "aka-alias" / "digital_human.mp4").read_bytes() == b"video"
+        mock_tm.update_status.assert_called_once()
+        assert fresh.json()["status"] == "pending"
+        assert other_tenant.json()["status"] == "pending"
+        assert mock_scheduler.submit.call_count == 3
+
     def test_upload_avatar(self, client, tmp_path):
         file_path = tmp_path / "avatar.png"
         file_path.write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 64)
@@ -170,8 +292,11 @@ class TestDigitalHumanRoutes:
 
     def test_create_task_with_optional_params(self, client):
         with patch.object(routes_module, "task_manager") as mock_tm, \
-             patch.object(routes_module.asyncio, "create_task", side_effect=_consume_task):
+             patch.object(routes_module, "job_memo") as mock_memo, \
+             patch.object(routes_module, "job_scheduler") as mock_scheduler:
             mock_tm.create_task.return_value = "aka-full"
+            mock_memo.lookup.return_value = None
+            mock_scheduler.submit.return_value = 0
             response = client.post("/api/tasks", json={
                 "avatar_mode": "prompt",
                 "avatar_prompt": "主播",
@@ -182,9 +307,82 @@ class TestDigitalHumanRoutes:
                 "pitch": 1,
                 "emotion": "happy",
                 "seed": 99,
-                "mask_image": "https://example.com/mask.png"
+                "mask_image": "https://example.com/mask.png",
+                "wavespeed_api_key": API_KEY,
             })
         assert response.status_code == 200
+        payload = mock_scheduler.submit.call_args[0][1]
+        assert payload["voice_id"] == "female-yujie"
+        assert payload["resolution"] == "1080p"
+        assert payload["speed"] == 1.2
+        assert payload["emotion"] == "happy"
+        assert payload["seed"] == 99
+        assert payload["mask_image"] == "https://example.com/mask.png"
+
+    def test_job_hitting_open_circuit_is_requeued(self):
+        payload = {"wavespeed_api_key": API_KEY, "fingerprint": "fp-1", "avatar_mode": "prompt"}
+        service = MagicMock()
+        service.generate_digital_human = AsyncMock(side_effect=routes_module.CircuitOpenError("infinitetalk", 20))
+        with patch.object(routes_module, "get_digital_human_service", return_value=service), \
+             patch.object(routes_module, "task_manager") as mock_tm, \
+             patch.object(routes_module, "job_scheduler") as mock_scheduler:
+            asyncio.run(routes_module._run_digital_human_job("aka-held", payload))
+
+        # 重新入队至少等到冷却结束，不会在熔断期间反复出队、快速失败
+        mock_scheduler.submit.assert_called_once_with("aka-held", {**payload, "resume": True}, delay=20)
+        status = mock_tm.update_status.call_args[0]
+        assert status[:2] == ("aka-held", "queued")
+
+    def test_startup_resumes_pending_finalization(self, tmp_path):
+        storage = routes_module.StorageService(
+            output_root=tmp_path / "output",
+            public_base_url="https://cdn.example.com",
+            public_export_dir=tmp_path / "public",
+        )
+        video_path = storage.prepare_task_paths("aka-pending").video_path
+        video_path.write_bytes(b"video")
+        storage.save_metadata("aka-pending", {
+            "job_id": "aka-pending",
+            "status": "finished",
+            "assets": {
+                "publish_state": "pending",
+                "video_path": str(video_path),
+                "wave_video_url": "https://provider.example.com/v.mp4",
+            },
+            "billing": {"balance_before": 10.0, "reconcile_state": "pending"},
+        })
+        storage.save_metadata("aka-done", {"job_id": "aka-done", "status": "finished", "assets": {"publish_state": "completed"}})
+        queue = type(routes_module.finalization_queue)(backoff_seconds=0)
+
+        async def recover():
+            await routes_module._recover_pending_finalization()
+            assert queue.stats()["pending"] == 1
+            assert await queue.drain(timeout=5)
+
+        with patch.object(routes_module, "storage_service", storage), \
+             patch.object(routes_module, "finalization_queue", queue):
+            asyncio.run(recover())
+
+        meta = storage.load_metadata("aka-pending")
+        assert meta["assets"]["publish_state"] == "completed"
+        assert meta["video_url"].startswith("https://cdn.example.com/ren/")
+        assert meta["billing"]["reconcile_state"] == "interrupted"
+        assert meta["billing"]["balance_before"] == 10.0
+
+    def test_interrupted_job_already_finished_is_not_requeued(self):
+        with patch.object(routes_module, "storage_service") as mock_storage, \
+             patch.object(routes_module, "task_manager") as mock_tm:
+            mock_storage.load_metadata.return_value = {
+                "status": "finished",
+                "assets": {"video_path": "output/aka-done/digital_human.mp4"},
+            }
+            assert routes_module._resume_interrupted_job("aka-done", {"speech_text": "你好"}) is None
+            mock_storage.load_metadata.return_value = {"status": "video_rendering"}
+            payload = routes_module._resume_interrupted_job("aka-half", {"speech_text": "你好"})
+
+        assert payload == {"speech_text": "你好", "resume": True}
+        assert mock_tm.update_status.call_args_list[0].args[:2] == ("aka-done", "finished")
+        mock_tm.set_result_path.assert_called_once_with("aka-done", "output/aka-done/digital_human.mp4")
 
     def test_create_task_parameter_validation(self, client):
         response = client.post("/api/tasks", json={
@@ -201,7 +399,8 @@ class TestDigitalHumanRoutes:
             response = client.post("/api/tasks", json={
                 "avatar_mode": "upload",
                 "speech_text": "测试",
-                "character_id": "char-unknown"
+                "character_id": "char-unknown",
+                "wavespeed_api_key": API_KEY,
             })
         assert response.status_code == 404
 
@@ -338,8 +537,3 @@ class TestDigitalHumanRoutes:
             response = client.delete("/api/characters/char-user")
         assert response.status_code == 200
         assert response.json()["character"]["status"] == "disabled"
-
-def _consume_task(coro, *args, **kwargs):
-    """帮助函数：立即关闭协程，避免未 awaited 警告。"""
-    coro.close()
-    return MagicMock()
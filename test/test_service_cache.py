@@ -0,0 +1,36 @@
+"""
+ServiceCache 服务实例缓存测试
+"""
+from py.services.service_cache import ServiceCache
+
+
+def test_reuses_instance_per_api_key():
+    built = []
+    cache = ServiceCache(lambda key: built.append(key) or object(), max_entries=4)
+
+    first = cache.get("ws-key-a")
+    assert cache.get("ws-key-a") is first
+    assert cache.get("ws-key-b") is not first
+    assert built == ["ws-key-a", "ws-key-b"]
+    assert cache.stats()["hits"] == 1
+    assert "ws-key-a" not in cache._entries
+
+
+def test_evicts_least_recently_used():
+    cache = ServiceCache(lambda key: object(), max_entries=2)
+    a = cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+    assert cache.get("a") is a
+    assert cache.stats()["entries"] == 2
+    assert ServiceCache.key_for("b") not in cache._entries
+
+
+def test_idle_entries_expire(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("py.services.service_cache.time.monotonic", lambda: clock[0])
+    cache = ServiceCache(lambda key: object(), idle_seconds=10)
+    first = cache.get("a")
+    clock[0] += 11
+    assert cache.get("a") is not first
@@ -0,0 +1,127 @@
+import json
+import sqlite3
+import time
+
+from py.services.sqlite_task_manager import SQLiteTaskManager
+from py.services.task_manager import TaskManager, create_task_manager
+
+
+def test_create_update_and_get(tmp_path):
+    manager = SQLiteTaskManager(db_path=str(tmp_path / "jobs.db"))
+    job_id = manager.create_task(preset_name="digital_human", resolution="1080p")
+    manager.update_status(job_id, "speech_ready", "✅ 语音生成完成")
+    manager.update_progress(job_id, 0.6)
+    manager.set_result_path(job_id, "output/demo.mp4")
+
+    task = manager.get_task(job_id)
+    assert task["status"] == "speech_ready"
+    assert task["message"] == "✅ 语音生成完成"
+    assert task["progress"] == 0.6
+    assert task["result_path"] == "output/demo.mp4"
+    assert task["resolution"] == "1080p"
+    assert manager.get_task("missing") is None
+
+
+def test_job_ids_are_unique_within_same_minute(tmp_path):
+    manager = SQLiteTaskManager(db_path=str(tmp_path / "jobs.db"))
+    ids = {manager.create_task() for _ in range(5)}
+    assert len(ids) == 5
+
+
+def test_list_tasks_filters_by_status(tmp_path):
+    manager = SQLiteTaskManager(db_path=str(tmp_path / "jobs.db"))
+    first = manager.create_task()
+    second = manager.create_task()
+    manager.update_status(second, "finished", "done")
+
+    finished = manager.list_tasks(status="finished")
+    assert [task["job_id"] for task in finished] == [second]
+    assert {task["job_id"] for task in manager.list_tasks()} == {first, second}
+    assert len(manager.list_tasks(limit=1)) == 1
+
+
+def test_uses_wal_and_indexes(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    SQLiteTaskManager(db_path=str(db_path)).close()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(jobs)")}
+    assert {"idx_jobs_status", "idx_jobs_created_at"} <= indexes
+
+
+def test_state_is_shared_between_instances(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    writer = SQLiteTaskManager(db_path=db_path)
+    reader = SQLiteTaskManager(db_path=db_path)
+
+    job_id = writer.create_task()
+    writer.update_status(job_id, "video_rendering", "渲染中")
+    assert reader.get_task(job_id)["status"] == "video_rendering"
+
+
+def test_imports_legacy_json_when_empty(tmp_path):
+    legacy = tmp_path / "jobs.json"
+    legacy.write_text(
+        json.dumps({"aka-01010101": {"job_id": "aka-01010101", "status": "finished",
+                                     "message": "ok", "created_at": "2026-01-01T01:01:00"}}),
+        encoding="utf-8",
+    )
+    manager = SQLiteTaskManager(db_path=str(tmp_path / "jobs.db"), legacy_json=str(legacy))
+    assert manager.get_task("aka-01010101")["status"] == "finished"
+
+
+def test_create_task_manager_selects_backend(tmp_path):
+    sqlite_manager = create_task_manager(
+        {"backend": "sqlite", "storage_dir": str(tmp_path), "sqlite_path": str(tmp_path / "a.db")}
+    )
+    assert isinstance(sqlite_manager, SQLiteTaskManager)
+
+    json_manager = create_task_manager({"backend": "json", "storage_dir": str(tmp_path / "json")})
+    assert isinstance(json_manager, TaskManager)
+
+
+def test_imports_journal_and_archived_jobs(tmp_path):
+    legacy = TaskManager(storage_dir=str(tmp_path), compact_threshold=1000, max_hot_tasks=1)
+    archived = legacy.create_task()
+    legacy.update_status(archived, "finished", "done")
+    journaled = legacy.create_task()
+    legacy.update_status(journaled, "finished", "journaled only")
+    legacy.close()
+    assert (tmp_path / "archive" / "index.jsonl").exists()
+
+    manager = SQLiteTaskManager(
+        db_path=str(tmp_path / "jobs.db"),
+        legacy_json=str(tmp_path / "jobs.json"),
+        heartbeat_interval=None,
+    )
+    assert manager.get_task(archived)["status"] == "finished"
+    assert manager.get_task(journaled)["message"] == "journaled only"
+
+
+def test_recovery_only_fails_jobs_with_expired_lease(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    live = SQLiteTaskManager(db_path=db_path, heartbeat_interval=None)
+    crashed = SQLiteTaskManager(db_path=db_path, lease_seconds=0.05, heartbeat_interval=None)
+    live_job = live.create_task()
+    live.update_status(live_job, "video_rendering", "渲染中")
+    dead_job = crashed.create_task()
+    crashed.update_status(dead_job, "speech_generating", "生成语音")
+    time.sleep(0.1)
+
+    SQLiteTaskManager(db_path=db_path, heartbeat_interval=None)
+    assert live.get_task(live_job)["status"] == "video_rendering"
+    assert live.get_task(dead_job)["status"] == "failed"
+
+
+def test_renew_leases_keeps_long_running_jobs_alive(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    worker = SQLiteTaskManager(db_path=db_path, lease_seconds=0.2, heartbeat_interval=None)
+    job_id = worker.create_task()
+    worker.update_status(job_id, "video_rendering", "渲染中")
+    time.sleep(0.1)
+    assert worker.renew_leases() == 1
+    time.sleep(0.15)
+
+    SQLiteTaskManager(db_path=db_path, heartbeat_interval=None)
+    assert worker.get_task(job_id)["status"] == "video_rendering"
@@ -0,0 +1,129 @@
+"""
+StageGraph 测试用例
+"""
+import asyncio
+
+import pytest
+
+from py.function.stage_graph import StageGraph, StageSpec
+
+
+def _recorder(events, name, delay=0.0, result=None):
+    async def _run(ctx):
+        events.append(f"{name}:start")
+        await asyncio.sleep(delay)
+        events.append(f"{name}:end")
+        return result
+    return _run
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_concurrently():
+    events = []
+    graph = StageGraph([
+        StageSpec("a", _recorder(events, "a", 0.05)),
+        StageSpec("b", _recorder(events, "b", 0.05)),
+        StageSpec("c", _recorder(events, "c"), depends_on=("a", "b")),
+    ])
+
+    report = await graph.execute(None)
+
+    assert events[:2] == ["a:start", "b:start"]
+    assert events[-2:] == ["c:start", "c:end"]
+    assert report.critical_path[-1] == "c"
+    assert set(report.as_dict()["stages"]) == {"a", "b", "c"}
+
+
+@pytest.mark.asyncio
+async def test_critical_path_follows_slowest_dependency():
+    events = []
+    graph = StageGraph([
+        StageSpec("fast", _recorder(events, "fast", 0.0)),
+        StageSpec("slow", _recorder(events, "slow", 0.05)),
+        StageSpec("join", _recorder(events, "join"), depends_on=("fast", "slow")),
+    ])
+
+    report = await graph.execute(None)
+
+    assert report.critical_path == ["slow", "join"]
+
+
+@pytest.mark.asyncio
+async def test_retry_then_success():
+    attempts = []
+    retried = []
+
+    async def _flaky(ctx):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("temporary")
+
+    graph = StageGraph([StageSpec("flaky", _flaky, retries=2)])
+    report = await graph.execute(None, on_retry=lambda name, n, exc: retried.append(n))
+
+    assert len(attempts) == 3
+    assert retried == [1, 2]
+    assert report.timings["flaky"].attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_timeout_fails_stage():
+    graph = StageGraph([StageSpec("slow", _recorder([], "slow", 1.0), timeout=0.01)])
+
+    with pytest.raises(asyncio.TimeoutError):
+        await graph.execute(None)
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_running_and_skips_dependents():
+    events = []
+    cancelled = asyncio.Event()
+
+    async def _boom(ctx):
+        raise ValueError("boom")
+
+    async def _slow(ctx):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    graph = StageGraph([
+        StageSpec("boom", _boom),
+        StageSpec("slow", _slow),
+        StageSpec("after", _recorder(events, "after"), depends_on=("boom",)),
+    ])
+
+    with pytest.raises(ValueError, match="boom"):
+        await graph.execute(None)
+
+    assert cancelled.is_set()
+    assert events == []
+
+
+@pytest.mark.asyncio
+async def test_skip_marks_stages_completed():
+    events = []
+    graph = StageGraph([
+        StageSpec("a", _recorder(events, "a")),
+        StageSpec("b", _recorder(events, "b"), depends_on=("a",)),
+    ])
+
+    await graph.execute(None, skip=["a"])
+
+    assert events == ["b:start", "b:end"]
+
+
+def test_validate_rejects_unknown_dependency_and_cycles():
+    async def _noop(ctx):
+        return None
+
+    with pytest.raises(ValueError, match="未知阶段"):
+        StageGraph([StageSpec("a", _noop, depends_on=("missing",))]).validate()
+
+    with pytest.raises(ValueError, match="环"):
+        StageGraph([
+            StageSpec("a", _noop, depends_on=("b",)),
+            StageSpec("b", _noop, depends_on=("a",)),
+        ]).validate()
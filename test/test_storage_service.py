@@ -1,4 +1,6 @@
+import errno
 import json
+import os
 from pathlib import Path
 
 import pytest
@@ -124,3 +126,68 @@ def test_publish_task_asset_respects_namespace(tmp_path):
     assert Path(publish_info["path"]) == expected_path
     assert expected_path.read_bytes() == b"avatar"
     assert publish_info["url"] == "https://cdn.example.com/ren/output/aka-asset-1/avatar.png"
+
+
+def test_publish_video_hardlinks_on_same_filesystem(tmp_path):
+    storage = StorageService(
+        output_root=tmp_path / "output",
+        public_base_url="https://cdn.example.com",
+        public_export_dir=tmp_path / "public",
+        video_mirror_targets=[{"name": "wave-ad", "dir": str(tmp_path / "mirror")}],
+    )
+    video_file = storage.prepare_task_paths("aka-link").video_path
+    video_file.write_bytes(b"video")
+
+    publish_info = storage.publish_video("aka-link", video_file)
+
+    assert publish_info["method"] == "hardlink"
+    assert publish_info["mirrors"][0]["method"] == "hardlink"
+    assert os.path.samefile(publish_info["path"], video_file)
+    assert os.path.samefile(publish_info["mirrors"][0]["path"], video_file)
+
+
+def test_link_methods_fall_back_to_copy(tmp_path, monkeypatch):
+    from py.services import file_linker
+
+    def no_link(source, destination):
+        raise OSError(errno.EXDEV, "cross-device link")
+
+    monkeypatch.setitem(file_linker._METHODS, "hardlink", no_link)
+    monkeypatch.setitem(file_linker._METHODS, "reflink", no_link)
+    monkeypatch.setitem(file_linker._METHODS, "copy_file_range", no_link)
+    storage = StorageService(
+        output_root=tmp_path / "output",
+        public_base_url="https://cdn.example.com",
+        public_export_dir=tmp_path / "public",
+    )
+    local_file = tmp_path / "avatar.png"
+    local_file.write_bytes(b"avatar")
+    existing = tmp_path / "public" / "ren" / "output" / "aka-copy" / "avatar.png"
+    existing.parent.mkdir(parents=True)
+    existing.write_bytes(b"old")
+
+    publish_info = storage.publish_task_asset("aka-copy", local_file, filename="avatar.png")
+
+    assert publish_info["method"] == "copy"
+    assert existing.read_bytes() == b"avatar"
+    assert not os.path.samefile(existing, local_file)
+    assert sorted(p.name for p in existing.parent.iterdir()) == ["avatar.png"]
+
+
+def test_copy_into_task_does_not_write_through_published_link(tmp_path):
+    storage = StorageService(
+        output_root=tmp_path / "output",
+        public_base_url="https://cdn.example.com",
+        public_export_dir=tmp_path / "public",
+    )
+    video_file = storage.prepare_task_paths("aka-relink").video_path
+    video_file.write_bytes(b"first")
+    publish_info = storage.publish_video("aka-relink", video_file)
+
+    replacement = tmp_path / "replacement.mp4"
+    replacement.write_bytes(b"second")
+    storage.copy_into_task(replacement, video_file)
+
+    assert video_file.read_bytes() == b"second"
+    assert Path(publish_info["path"]).read_bytes() == b"first"
+    assert not os.path.samefile(video_file, replacement)
@@ -0,0 +1,83 @@
+"""
+任务日志写入器测试：批量写入、句柄 LRU、任务结束关闭与未启动时的同步写入
+"""
+import asyncio
+
+import pytest
+
+from py.services.io_executor import IOExecutor
+from py.services.storage_service import StorageService
+from py.services.task_log_sink import TaskLogSink
+
+
+@pytest.mark.asyncio
+async def test_lines_are_buffered_and_flushed_in_batches(tmp_path):
+    executor = IOExecutor(max_workers=1)
+    sink = TaskLogSink(flush_interval=60, executor=executor)
+    storage = StorageService(output_root=tmp_path, log_sink=sink)
+    sink.start()
+    try:
+        for index in range(3):
+            storage.append_log("aka-a", f"第 {index} 行", trace_id="trace-a")
+        storage.append_log("aka-b", "另一个任务", level="warning")
+        log_a = tmp_path / "aka-a" / "log.txt"
+        assert not log_a.exists()
+
+        await sink.flush()
+        lines = log_a.read_text(encoding="utf-8").splitlines()
+        assert [line.split("] ")[-1] for line in lines] == ["第 0 行", "第 1 行", "第 2 行"]
+        assert "[trace=trace-a]" in lines[0]
+        assert "[WARNING]" in (tmp_path / "aka-b" / "log.txt").read_text(encoding="utf-8")
+        stats = sink.stats()
+        assert stats["lines_written"] == 4 and stats["batches"] == 1 and stats["open_files"] == 2
+
+        storage.close_log("aka-a")
+        storage.append_log("aka-b", "继续")
+        await sink.flush()
+        assert sink.stats()["open_files"] == 1
+    finally:
+        await sink.stop()
+        executor.shutdown()
+
+    assert sink.stats()["open_files"] == 0
+    assert (tmp_path / "aka-b" / "log.txt").read_text(encoding="utf-8").count("\n") == 2
+
+
+@pytest.mark.asyncio
+async def test_open_handles_are_bounded_and_stop_flushes(tmp_path):
+    executor = IOExecutor(max_workers=1)
+    sink = TaskLogSink(max_open_files=2, flush_interval=60, executor=executor)
+    sink.start()
+    for index in range(4):
+        sink.write(tmp_path / f"aka-{index}" / "log.txt", f"line {index}\n")
+    await sink.stop()
+    executor.shutdown()
+
+    assert sink.stats()["evicted"] == 2
+    assert (tmp_path / "aka-3" / "log.txt").read_text(encoding="utf-8") == "line 3\n"
+
+
+@pytest.mark.asyncio
+async def test_max_pending_triggers_immediate_flush(tmp_path):
+    executor = IOExecutor(max_workers=1)
+    sink = TaskLogSink(flush_interval=60, max_pending=2, executor=executor)
+    sink.start()
+    log_path = tmp_path / "aka-x" / "log.txt"
+    try:
+        sink.write(log_path, "a\n")
+        sink.write(log_path, "b\n")
+        for _ in range(100):
+            if log_path.exists() and log_path.read_text(encoding="utf-8") == "a\nb\n":
+                break
+            await asyncio.sleep(0.01)
+        assert log_path.read_text(encoding="utf-8") == "a\nb\n"
+    finally:
+        await sink.stop()
+        executor.shutdown()
+
+
+def test_writes_synchronously_when_not_started(tmp_path):
+    sink = TaskLogSink()
+    storage = StorageService(output_root=tmp_path, log_sink=sink)
+    log_path = storage.append_log("aka-sync", "开始生成头像")
+    assert "开始生成头像" in log_path.read_text(encoding="utf-8")
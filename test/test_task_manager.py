@@ -0,0 +1,137 @@
+import json
+
+from py.services.task_manager import TaskManager
+
+
+def test_updates_are_appended_to_journal(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path))
+    job_id = manager.create_task(preset_name="digital_human")
+    manager.update_status(job_id, "avatar_generating", "正在生成头像...")
+    manager.update_progress(job_id, 0.5)
+
+    lines = (tmp_path / "jobs.journal").read_text(encoding="utf-8").splitlines()
+    ops = [json.loads(line)["op"] for line in lines]
+    assert ops == ["put", "update", "update"]
+    # 快照尚未重写
+    assert not (tmp_path / "jobs.json").exists()
+
+
+def test_reload_replays_journal_and_compacts(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path))
+    job_id = manager.create_task(preset_name="digital_human")
+    manager.update_status(job_id, "finished", "done")
+    manager.set_result_path(job_id, "output/demo.mp4")
+
+    reloaded = TaskManager(storage_dir=str(tmp_path))
+    task = reloaded.get_task(job_id)
+    assert task["status"] == "finished"
+    assert task["result_path"] == "output/demo.mp4"
+
+    snapshot = json.loads((tmp_path / "jobs.json").read_text(encoding="utf-8"))
+    assert snapshot[job_id]["status"] == "finished"
+    assert (tmp_path / "jobs.journal").read_text(encoding="utf-8") == ""
+
+
+def test_compaction_threshold_rewrites_snapshot(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path), compact_threshold=3)
+    job_id = manager.create_task()
+    manager.update_progress(job_id, 0.1)
+    manager.update_progress(job_id, 0.2)
+
+    snapshot = json.loads((tmp_path / "jobs.json").read_text(encoding="utf-8"))
+    assert snapshot[job_id]["progress"] == 0.2
+    assert (tmp_path / "jobs.journal").read_text(encoding="utf-8") == ""
+
+
+def test_truncated_journal_line_is_ignored(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path))
+    job_id = manager.create_task()
+    manager.update_status(job_id, "speech_ready", "ok")
+    manager.close()
+
+    (tmp_path / "jobs.journal").write_text(
+        json.dumps({"op": "update", "job_id": job_id, "fields": {"status": "finished"}})
+        + '\n{"op": "upd',
+        encoding="utf-8",
+    )
+
+    reloaded = TaskManager(storage_dir=str(tmp_path))
+    assert reloaded.get_task(job_id)["status"] == "finished"
+    assert len(reloaded.list_tasks()) == 1
+
+
+def test_stale_running_tasks_are_marked_failed(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path))
+    job_id = manager.create_task()
+    manager.update_status(job_id, "running", "执行中")
+
+    reloaded = TaskManager(storage_dir=str(tmp_path))
+    assert reloaded.get_task(job_id)["status"] == "failed"
+
+
+def test_hot_set_is_bounded_and_cold_tasks_load_lazily(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path), max_hot_tasks=2, retention_days=None)
+    first = manager.create_task()
+    manager.update_status(first, "finished", "done")
+    second = manager.create_task()
+    manager.update_status(second, "finished", "done")
+    third = manager.create_task()
+
+    # 超出上限时最久未访问的已结束任务被归档
+    assert first not in manager.tasks
+    assert (tmp_path / "archive" / "index.jsonl").exists()
+
+    task = manager.get_task(first)
+    assert task["status"] == "finished"
+    assert first in manager.tasks
+    assert third in manager.tasks
+
+
+def test_active_tasks_are_never_evicted(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path), max_hot_tasks=1, retention_days=None)
+    ids = [manager.create_task() for _ in range(3)]
+    assert all(job_id in manager.tasks for job_id in ids)
+
+
+def test_expired_tasks_are_archived_at_startup(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path), retention_days=7)
+    old_id = manager.create_task()
+    manager.update_status(old_id, "finished", "done")
+    manager.tasks[old_id]["created_at"] = "2020-01-01T00:00:00"
+    active_id = manager.create_task()
+    manager.close()
+
+    reloaded = TaskManager(storage_dir=str(tmp_path), retention_days=7)
+    assert list(reloaded.tasks) == [active_id]
+    snapshot = json.loads((tmp_path / "jobs.json").read_text(encoding="utf-8"))
+    assert old_id not in snapshot
+    assert (tmp_path / "archive" / "segment-20200101.jsonl.gz").exists()
+
+    assert reloaded.get_task(old_id)["status"] == "finished"
+    all_ids = {task["job_id"] for task in reloaded.list_tasks(include_archived=True)}
+    assert all_ids == {old_id, active_id}
+
+
+def test_updating_archived_task_persists_after_restart(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path), max_hot_tasks=1, retention_days=None)
+    first = manager.create_task()
+    manager.update_status(first, "failed", "boom")
+    manager.create_task()
+    assert first not in manager.tasks
+
+    manager.set_result_path(first, "output/retry.mp4")
+
+    reloaded = TaskManager(storage_dir=str(tmp_path), max_hot_tasks=1, retention_days=None)
+    assert reloaded.get_task(first)["result_path"] == "output/retry.mp4"
+
+
+def test_in_flight_pipeline_statuses_are_recovered(tmp_path):
+    manager = TaskManager(storage_dir=str(tmp_path))
+    in_flight = manager.create_task()
+    manager.update_status(in_flight, "assets_generating", "正在并行生成头像与语音...")
+    queued = manager.create_task()
+
+    reloaded = TaskManager(storage_dir=str(tmp_path))
+    assert reloaded.get_task(in_flight)["status"] == "failed"
+    assert "resume" in reloaded.get_task(in_flight)["message"]
+    assert reloaded.get_task(queued)["status"] == "queued"
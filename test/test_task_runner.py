@@ -0,0 +1,319 @@
+"""
+TaskRunner 测试用例
+"""
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from py.function.task_runner import TaskRequest, TaskRunner
+from py.services.storage_service import StorageService
+
+
+def _build_request(**overrides):
+    params = dict(
+        avatar_mode="prompt",
+        avatar_prompt="测试头像",
+        avatar_upload_path=None,
+        speech_text="你好",
+        voice_id="female-shaonv",
+        resolution="720p",
+        speed=1.0,
+        pitch=0,
+        emotion="neutral",
+        seed=42,
+    )
+    params.update(overrides)
+    return TaskRequest(**params)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return StorageService(output_root=tmp_path / "output")
+
+
+@pytest.fixture
+def clients():
+    avatar = MagicMock()
+    avatar.generate_images = AsyncMock(return_value=[{"url": "https://example.com/avatar.png"}])
+    voice = MagicMock()
+    voice.generate_voice = AsyncMock(return_value={
+        "audio_url": "https://example.com/speech.mp3",
+        "audio_path": None,
+        "duration": 3.0,
+        "cost": 0.001,
+    })
+    video = MagicMock()
+    video.generate_video = AsyncMock(return_value={
+        "task_id": "video-task",
+        "video_url": "https://example.com/video.mp4",
+        "video_path": None,
+        "duration": 3.0,
+        "cost": 0.18,
+    })
+    return avatar, voice, video
+
+
+def _build_runner(storage, clients, **kwargs):
+    avatar, voice, video = clients
+    return TaskRunner(
+        avatar_client=avatar,
+        voice_client=voice,
+        video_client=video,
+        storage_service=storage,
+        task_manager=MagicMock(),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_persistence_is_coalesced(storage, clients):
+    runner = _build_runner(storage, clients, persist_interval=60)
+
+    with patch.object(storage, "save_metadata", wraps=storage.save_metadata) as mock_save:
+        result = await runner.run("aka-coalesce", _build_request())
+
+    # 每个阶段完成 + 终态各写一次，而不是每次状态/成本变化都写
+    assert mock_save.call_count <= 6
+    meta = storage.load_metadata("aka-coalesce")
+    assert meta["status"] == "finished"
+    assert meta == json.loads(json.dumps(result))
+
+
+@pytest.mark.asyncio
+async def test_failure_is_always_flushed(storage, clients):
+    avatar, _, _ = clients
+    avatar.generate_images.side_effect = RuntimeError("boom")
+    runner = _build_runner(storage, clients, persist_interval=60)
+
+    with pytest.raises(RuntimeError):
+        await runner.run("aka-failed", _build_request())
+
+    meta = storage.load_metadata("aka-failed")
+    assert meta["status"] == "failed"
+    assert meta["error"]["message"] == "boom"
+
+
+@pytest.mark.asyncio
+async def test_zero_interval_writes_every_change(storage, clients):
+    runner = _build_runner(storage, clients, persist_interval=0)
+
+    with patch.object(storage, "save_metadata", wraps=storage.save_metadata) as mock_save:
+        await runner.run("aka-eager", _build_request())
+
+    assert mock_save.call_count > 10
+
+
+def test_save_metadata_is_atomic(storage):
+    storage.save_metadata("aka-atomic", {"status": "pending"})
+    storage.save_metadata("aka-atomic", {"status": "finished"})
+
+    task_dir = storage.prepare_task_paths("aka-atomic").task_dir
+    assert sorted(p.name for p in task_dir.iterdir()) == ["task.json"]
+    assert storage.load_metadata("aka-atomic") == {"status": "finished"}
+
+
+@pytest.mark.asyncio
+async def test_avatar_and_speech_run_concurrently(storage, clients):
+    avatar, voice, _ = clients
+    started = []
+    both_started = asyncio.Event()
+
+    def _gate(name, result):
+        async def _call(*args, **kwargs):
+            started.append(name)
+            if len(started) == 2:
+                both_started.set()
+            await asyncio.wait_for(both_started.wait(), timeout=1)
+            return result
+        return _call
+
+    avatar.generate_images.side_effect = _gate("avatar", [{"url": "https://example.com/avatar.png"}])
+    voice.generate_voice.side_effect = _gate("speech", {"audio_url": "https://example.com/speech.mp3", "duration": 3.0})
+    runner = _build_runner(storage, clients)
+
+    result = await runner.run("aka-parallel", _build_request())
+
+    assert sorted(started) == ["avatar", "speech"]
+    statuses = [c.args[1] for c in runner.task_manager.update_status.call_args_list]
+    assert statuses == ["pending", "assets_generating", "assets_ready", "video_rendering", "finished"]
+    assert result["stages"]["avatar"]["state"] == "completed"
+    assert result["stages"]["speech"]["state"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_failed_stage_cancels_sibling(storage, clients):
+    avatar, voice, video = clients
+    cancelled = asyncio.Event()
+
+    async def _slow_voice(*args, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    voice.generate_voice.side_effect = _slow_voice
+    avatar.generate_images.side_effect = RuntimeError("avatar boom")
+    runner = _build_runner(storage, clients)
+
+    with pytest.raises(RuntimeError, match="avatar boom"):
+        await runner.run("aka-cancel", _build_request())
+
+    assert cancelled.is_set()
+    video.generate_video.assert_not_called()
+    assert storage.load_metadata("aka-cancel")["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_serial_mode_keeps_stage_statuses(storage, clients):
+    runner = _build_runner(storage, clients, parallel_assets=False)
+
+    await runner.run("aka-serial", _build_request())
+
+    statuses = [c.args[1] for c in runner.task_manager.update_status.call_args_list]
+    assert statuses == [
+        "pending",
+        "avatar_generating",
+        "avatar_ready",
+        "speech_generating",
+        "speech_ready",
+        "video_rendering",
+        "finished",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_extra_stage_and_timings(storage, clients):
+    runner = _build_runner(storage, clients)
+    seen = {}
+
+    async def _thumbnail(ctx):
+        seen["avatar_url"] = ctx.record.assets.get("avatar_url")
+
+    runner.add_stage("thumbnail", _thumbnail, depends_on=("avatar",))
+    result = await runner.run("aka-extra", _build_request())
+
+    assert seen["avatar_url"] == "https://example.com/avatar.png"
+    timings = result["assets"]["stage_timings"]
+    assert set(timings["stages"]) == {"avatar", "speech", "video", "publish", "thumbnail"}
+    assert timings["critical_path"][-2:] == ["video", "publish"]
+
+
+def test_add_stage_rejects_unknown_dependency(storage, clients):
+    runner = _build_runner(storage, clients)
+
+    async def _noop(ctx):
+        return None
+
+    with pytest.raises(ValueError):
+        runner.add_stage("broken", _noop, depends_on=("missing",))
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_completed_stages(storage, clients):
+    avatar, voice, video = clients
+    video.generate_video.side_effect = RuntimeError("render crashed")
+    runner = _build_runner(storage, clients)
+
+    with pytest.raises(RuntimeError):
+        await runner.run("aka-resume", _build_request())
+
+    video.generate_video.side_effect = None
+    resumed = _build_runner(storage, clients)
+    result = await resumed.run("aka-resume", _build_request(), resume=True)
+
+    assert result["status"] == "finished"
+    assert result["error"] is None
+    avatar.generate_images.assert_awaited_once()
+    voice.generate_voice.assert_awaited_once()
+    assert video.generate_video.await_count == 2
+    assert result["cost_breakdown"] == {"avatar": 0.03, "speech": 0.001, "video": 0.18}
+    statuses = [c.args[1] for c in resumed.task_manager.update_status.call_args_list]
+    assert statuses == ["pending", "assets_ready", "video_rendering", "finished"]
+
+
+@pytest.mark.asyncio
+async def test_resume_without_checkpoint_runs_from_start(storage, clients):
+    avatar, _, _ = clients
+    runner = _build_runner(storage, clients)
+
+    result = await runner.run("aka-fresh", _build_request(), resume=True)
+
+    assert result["status"] == "finished"
+    avatar.generate_images.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_resume_of_finished_job_does_not_rerun(storage, clients):
+    avatar, voice, video = clients
+    await _build_runner(storage, clients).run("aka-done", _build_request())
+    avatar.generate_images.reset_mock()
+
+    runner = _build_runner(storage, clients)
+    result = await runner.run("aka-done", _build_request(), resume=True)
+
+    assert result["status"] == "finished"
+    avatar.generate_images.assert_not_awaited()
+    video.generate_video.assert_awaited_once()
+    runner.task_manager.update_status.assert_called_once_with("aka-done", "finished", "✅ 数字人视频生成完成")
+
+
+@pytest.mark.asyncio
+async def test_resume_reattaches_to_submitted_prediction(storage, clients):
+    _, _, video = clients
+    persisted = {}
+
+    async def _crash_after_submit(**kwargs):
+        kwargs["on_submitted"]({"provider_task_id": "pred-video", "poll_url": "https://api.example.com/p/pred-video"})
+        # 断点写入在 I/O 线程池中进行：等它落盘后再模拟崩溃
+        for _ in range(100):
+            stage = (storage.load_metadata("aka-reattach").get("stages") or {}).get("video") or {}
+            if stage.get("provider_task_id"):
+                break
+            await asyncio.sleep(0.01)
+        persisted.update(stage)
+        raise asyncio.CancelledError()
+
+    video.generate_video.side_effect = _crash_after_submit
+    runner = _build_runner(storage, clients)
+    with pytest.raises(asyncio.CancelledError):
+        await runner.run("aka-reattach", _build_request())
+
+    assert persisted["provider_task_id"] == "pred-video"
+
+    video.generate_video.side_effect = None
+    result = await _build_runner(storage, clients).run("aka-reattach", _build_request(), resume=True)
+
+    assert result["status"] == "finished"
+    assert video.generate_video.call_args.kwargs["resume_prediction"] == {
+        "provider_task_id": "pred-video",
+        "poll_url": "https://api.example.com/p/pred-video",
+    }
+
+
+@pytest.mark.asyncio
+async def test_failed_reattach_resubmits(storage, clients):
+    _, voice, _ = clients
+    runner = _build_runner(storage, clients)
+    await runner.run("aka-resubmit", _build_request())
+    meta = storage.load_metadata("aka-resubmit")
+    meta["status"] = "speech_generating"
+    meta["stages"]["speech"].update(state="running", provider_task_id="pred-gone", poll_url="https://x/p")
+    meta["stages"]["video"]["state"] = "pending"
+    storage.save_metadata("aka-resubmit", meta)
+
+    calls = []
+
+    async def _voice(**kwargs):
+        calls.append(kwargs["resume_prediction"])
+        if kwargs["resume_prediction"]:
+            raise RuntimeError("prediction expired")
+        return {"audio_url": "https://example.com/new.mp3", "duration": 3.0, "cost": 0.001}
+
+    voice.generate_voice.side_effect = _voice
+    result = await _build_runner(storage, clients).run("aka-resubmit", _build_request(), resume=True)
+
+    assert calls == [{"provider_task_id": "pred-gone", "poll_url": "https://x/p"}, None]
+    assert result["assets"]["audio_url"] == "https://example.com/new.mp3"
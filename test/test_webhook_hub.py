@@ -0,0 +1,116 @@
+"""
+WebhookHub 回调中心与 /api/webhooks/wavespeed 端到端测试
+"""
+import asyncio
+import hashlib
+import hmac
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from py.api import routes_digital_human as routes_module
+from py.function.infinitetalk_client import InfiniteTalkClient
+from py.services.http_pool import HttpClientPool
+from py.services.webhook_hub import WebhookHub
+
+
+def _hub(secret=None):
+    hub = WebhookHub()
+    hub.configure({"enabled": True, "public_url": "https://ren.example.com/api/webhooks/wavespeed", "secret": secret})
+    return hub
+
+
+def test_disabled_hub_adds_nothing():
+    hub = WebhookHub()
+    hub.configure({"enabled": True})
+    assert hub.new_token() is None
+    assert hub.submit_params(None) == {}
+
+
+@pytest.mark.asyncio
+async def test_deliver_wakes_waiter_and_checks_token():
+    hub = _hub()
+    token = hub.new_token()
+    future = hub.register("pred-1", token)
+
+    assert hub.deliver("pred-1", "wrong", {"status": "completed"}) is False
+    assert not future.done()
+    assert hub.deliver("pred-1", token, {"status": "completed"}) is True
+    assert (await future) == {"status": "completed"}
+    assert hub.stats()["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_early_callback_is_kept_until_register():
+    hub = _hub()
+    token = hub.new_token()
+    hub.deliver("pred-2", token, {"status": "completed"})
+    future = hub.register("pred-2", token)
+    assert future.done() and future.result()["status"] == "completed"
+
+
+def test_signature_verification():
+    hub = _hub(secret="s3cret")
+    body = b'{"id": "pred-1"}'
+    timestamp = str(int(time.time()))
+    signature = hmac.new(b"s3cret", f"msg-1.{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    headers = {"webhook-id": "msg-1", "webhook-timestamp": timestamp, "webhook-signature": f"v3,{signature}"}
+    assert hub.verify_signature(headers, body)
+    assert not hub.verify_signature({**headers, "webhook-signature": "v3,deadbeef"}, body)
+    assert not hub.verify_signature({**headers, "webhook-timestamp": "1"}, body)
+
+
+@pytest.mark.asyncio
+async def test_fake_wavespeed_callback_wakes_infinitetalk_wait():
+    """本地假 WaveSpeed：提交时记录 webhook 地址，回调到达后等待立即返回，不依赖轮询。"""
+    hub = _hub()
+    fake_state = {"webhook": None, "polls": 0}
+
+    def fake_wavespeed(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            fake_state["webhook"] = request.url.params.get("webhook")
+            return httpx.Response(200, json={"code": 200, "data": {"id": "pred-1", "status": "created"}})
+        fake_state["polls"] += 1
+        return httpx.Response(200, json={"data": {"id": "pred-1", "status": "processing"}})
+
+    pool = HttpClientPool()
+    await pool.start({"http2": False}, transport=httpx.MockTransport(fake_wavespeed))
+    client = InfiniteTalkClient(
+        "ws-test-key-123",
+        http_pool=pool,
+        polling_cfg={"webhook_fallback_interval_seconds": 30},
+        webhooks=hub,
+    )
+    app = FastAPI()
+    app.include_router(routes_module.router)
+
+    try:
+        token = hub.new_token()
+        task_id = await client.submit(client.endpoint, {"image": "a"}, webhook_token=token)
+        waiting = asyncio.ensure_future(
+            client.wait_for_result(task_id, webhook=hub.register(task_id, token))
+        )
+        callback = httpx.URL(fake_state["webhook"])
+        with patch.object(routes_module, "webhook_hub", hub):
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="https://ren.example.com"
+            ) as app_client:
+                forged = await app_client.post(
+                    callback.path, params={"token": "forged"}, json={"id": "pred-1", "status": "completed"}
+                )
+                response = await app_client.post(
+                    callback.path,
+                    params=dict(callback.params),
+                    json={"id": "pred-1", "status": "completed", "outputs": ["https://cdn.example.com/v.mp4"]},
+                )
+        result = await asyncio.wait_for(waiting, timeout=2)
+    finally:
+        await pool.close()
+
+    assert forged.status_code == 403
+    assert response.status_code == 200
+    assert result["video_url"] == "https://cdn.example.com/v.mp4"
+    assert fake_state["polls"] == 0